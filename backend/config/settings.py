@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 import os
 from pathlib import Path
+from typing import Any, Dict
 from decouple import config, Csv
 import dj_database_url
 
@@ -52,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "letters.timing.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -86,13 +88,41 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    "default": dj_database_url.config(
+# Plain dicts: the pooled backends add a POOL key dj-database-url doesn't know.
+DATABASES: Dict[str, Dict[str, Any]] = {
+    "default": dict(dj_database_url.config(
         default=config('DATABASE_URL', default=f'sqlite:///{BASE_DIR / "db.sqlite3"}'),
         conn_max_age=600,
-    )
+        conn_health_checks=True,
+    ))
 }
 
+# Give up on an unreachable PostgreSQL server instead of hanging the request
+# (or readiness probe) that opens the connection.
+if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":
+    DATABASES["default"]["OPTIONS"] = {
+        "connect_timeout": config('DATABASE_CONNECT_TIMEOUT', default=5, cast=int),
+        **(DATABASES["default"].get("OPTIONS") or {}),
+    }
+
+# Pooled connections (see letters/db/base.py): each process keeps at most
+# DATABASE_POOL_MAX_SIZE connections, and requests return theirs to the pool.
+if config('DATABASE_POOL', default=False, cast=bool):
+    DATABASES["default"].update({
+        "ENGINE": {
+            "django.db.backends.postgresql": "letters.db.postgresql",
+            "django.db.backends.sqlite3": "letters.db.sqlite3",
+        }[DATABASES["default"]["ENGINE"]],
+        "CONN_MAX_AGE": 0,
+        "POOL": {
+            "MAX_SIZE": config('DATABASE_POOL_MAX_SIZE', default=10, cast=int),
+            "TIMEOUT": config('DATABASE_POOL_TIMEOUT', default=30, cast=float),
+            "MAX_IDLE": config('DATABASE_POOL_MAX_IDLE', default=300, cast=float),
+            "MAX_LIFETIME": config('DATABASE_POOL_MAX_LIFETIME', default=3600, cast=float),
+            "PRE_PING": config('DATABASE_POOL_PRE_PING', default=True, cast=bool),
+        },
+    })
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -153,10 +183,71 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        "letters.renderers.TimedJSONRenderer",
     ],
 }
 
+# Letter read endpoints: "pydantic" (fast, schemas.py) or "drf" (serializers.py).
+# Both render byte-identical JSON: each is encoded by pydantic-core.
+LETTERS_SERIALIZATION_ENGINE = config('LETTERS_SERIALIZATION_ENGINE', default='pydantic')
+
+# Route the public letter and health endpoints to the async views in
+# letters/async_views.py. Enable when serving config.asgi with uvicorn workers.
+LETTERS_ASYNC_VIEWS = config('LETTERS_ASYNC_VIEWS', default=False, cast=bool)
+
+# Seconds /api/health/ready/ reuses its last result before querying again,
+# and the longest its queries may run on PostgreSQL.
+LETTERS_HEALTH_READY_TTL = config('LETTERS_HEALTH_READY_TTL', default=2, cast=float)
+LETTERS_HEALTH_DB_TIMEOUT = config('LETTERS_HEALTH_DB_TIMEOUT', default=2, cast=float)
+
+# Image uploads (letters/images.py): spawned variant encoding processes per
+# server process and the largest accepted upload.
+LETTERS_IMAGE_WORKERS = config('LETTERS_IMAGE_WORKERS', default=2, cast=int)
+LETTERS_IMAGE_MAX_UPLOAD_BYTES = config('LETTERS_IMAGE_MAX_UPLOAD_BYTES', default=10 * 1024 * 1024, cast=int)
+
+# Pre-generated public letter files served by nginx (letters/static_letters.py).
+# Empty disables them; LETTERS_STATIC_WORKERS is the build_static_letters
+# process count (default: CPU count).
+LETTERS_STATIC_ROOT = config('LETTERS_STATIC_ROOT', default='')
+LETTERS_STATIC_WORKERS = config('LETTERS_STATIC_WORKERS', default=0, cast=int)
+
+# Per-request timings (letters/timing.py): a Server-Timing header on every
+# response and a JSON log record for this share of requests (0 to 1).
+LETTERS_TIMING_ENABLED = config('LETTERS_TIMING_ENABLED', default=True, cast=bool)
+LETTERS_TIMING_HEADER = config('LETTERS_TIMING_HEADER', default=True, cast=bool)
+LETTERS_TIMING_LOG_SAMPLE_RATE = config('LETTERS_TIMING_LOG_SAMPLE_RATE', default=0.01, cast=float)
+
+# Write-behind public letter open counts (letters/analytics.py): each process
+# flushes its counts every INTERVAL seconds, or sooner once THRESHOLD opens wait.
+LETTERS_OPEN_COUNTS_FLUSH_INTERVAL = config('LETTERS_OPEN_COUNTS_FLUSH_INTERVAL', default=10.0, cast=float)
+LETTERS_OPEN_COUNTS_FLUSH_THRESHOLD = config('LETTERS_OPEN_COUNTS_FLUSH_THRESHOLD', default=1000, cast=int)
+# Shared secret nginx sends with the opens it mirrors to /internal/letter-opens/;
+# requests without it are refused (all of them while it is empty).
+LETTERS_OPEN_TOKEN = config('LETTERS_OPEN_TOKEN', default='')
+
+# Public letter response cache (see letters/cache.py)
+# BACKEND is "lru" (per-process) or "django" (uses the CACHES alias in ALIAS).
+# The lru backend only drops entries in the process that saved the letter, so
+# with several workers set LETTERS_PUBLIC_CACHE_DIR: it adds a file cache shared
+# by every process on the host and makes it the default backend.
+LETTERS_PUBLIC_CACHE_DIR = config('LETTERS_PUBLIC_CACHE_DIR', default='')
+CACHES: Dict[str, Dict[str, Any]] = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+if LETTERS_PUBLIC_CACHE_DIR:
+    CACHES["letters_public"] = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": LETTERS_PUBLIC_CACHE_DIR,
+        "OPTIONS": {"MAX_ENTRIES": config('LETTERS_PUBLIC_CACHE_MAX_ENTRIES', default=1024, cast=int)},
+    }
+LETTERS_PUBLIC_CACHE = {
+    "BACKEND": config('LETTERS_PUBLIC_CACHE_BACKEND', default='django' if LETTERS_PUBLIC_CACHE_DIR else 'lru'),
+    "ALIAS": config('LETTERS_PUBLIC_CACHE_ALIAS', default='letters_public' if LETTERS_PUBLIC_CACHE_DIR else 'default'),
+    "MAX_ENTRIES": config('LETTERS_PUBLIC_CACHE_MAX_ENTRIES', default=1024, cast=int),
+    "TIMEOUT": config('LETTERS_PUBLIC_CACHE_TIMEOUT', default=60, cast=int),
+    "NOT_FOUND_TIMEOUT": config('LETTERS_PUBLIC_CACHE_NOT_FOUND_TIMEOUT', default=5, cast=int),
+}
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = config(
     'CORS_ALLOWED_ORIGINS',
@@ -177,3 +268,18 @@ SESSION_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_DOMAIN = None  # Allow cookies for localhost
+
+# Logging: sampled request timings go to stdout as one JSON line each.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "timing": {"class": "logging.StreamHandler", "formatter": "message"},
+    },
+    "loggers": {
+        "letters.timing": {"handlers": ["timing"], "level": "INFO", "propagate": False},
+    },
+}
@@ -19,11 +19,20 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from letters.views import health_check
+from letters import async_views, views
+from letters.views import letter_open_view, metrics_view
+
+# The health views come from async_views when serving under ASGI.
+health_views = async_views if settings.LETTERS_ASYNC_VIEWS else views
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("api/health/", health_check, name="health-check"),
+    path("api/health/", health_views.health_check, name="health-check"),
+    path("api/health/live/", health_views.health_live, name="health-live"),
+    path("api/health/ready/", health_views.health_ready, name="health-ready"),
+    path("api/metrics", metrics_view, name="metrics"),
+    # Reached only by nginx's mirror requests; not proxied from outside.
+    path("internal/letter-opens/<slug:slug>/", letter_open_view, name="letter-open"),
     path("api/auth/", include("accounts.urls")),
     path("api/", include("letters.urls")),
 ]
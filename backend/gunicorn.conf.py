@@ -0,0 +1,33 @@
+"""Gunicorn server hooks (gunicorn loads this file from the working directory).
+
+With ``PROMETHEUS_MULTIPROC_DIR`` set, workers share metrics through files in
+that directory (see ``letters/metrics.py``). Exiting workers flush their
+buffered letter open counts (see ``letters/analytics.py``).
+"""
+import os
+import shutil
+from typing import Any
+
+
+def on_starting(server: Any) -> None:
+    """Start from an empty metrics directory; old files would be summed in."""
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server: Any, worker: Any) -> None:
+    """Let the metrics of a dead worker stop counting towards live gauges."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)  # type: ignore[no-untyped-call]  # unannotated upstream
+
+
+def worker_exit(server: Any, worker: Any) -> None:
+    """Write the open counts still buffered in an exiting worker."""
+    from letters import analytics
+    try:
+        analytics.flush()
+    except Exception:
+        server.log.exception('Could not flush letter open counts of worker %s', worker.pid)
@@ -1,7 +1,21 @@
-from django.contrib import admin
+from typing import Any, Dict, Optional, Tuple, Type, cast
+
+from django import forms
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from django.utils.html import format_html
+from django.db.models import QuerySet
+from django.forms.models import BaseInlineFormSet
+from django.http import HttpRequest
+from django.utils.html import format_html, format_html_join
 from .models import User, LetterType, Letter, ContentBlock
+from . import properties, search, snapshots
+from .pagination import EstimatedCountPaginator
+from .validation import compile_errors, validate_custom_properties
+
+
+# Letter columns the admin never displays; deferring keeps list rows narrow.
+WIDE_LETTER_FIELDS = ['public_snapshot', 'custom_properties', 'description']
+BLOCKS_PAGE_PARAM = 'blocks_page'
 
 
 @admin.register(User)
@@ -13,31 +27,161 @@ class UserAdmin(BaseUserAdmin):
     ordering = ['-created_at']
 
 
+class PaginatedBlockFormSet(BaseInlineFormSet):  # type: ignore[type-arg]
+    """Inline formset holding one page of a letter's blocks, by ``order``."""
+
+    per_page = 50
+    page = 1
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None and self.queryset is not None:
+            start = (self.page - 1) * self.per_page
+            page_ids = (
+                ContentBlock.objects.filter(letter=self.instance)
+                .order_by('order').values('pk')[start:start + self.per_page]
+            )
+            self.queryset = self.queryset.filter(pk__in=page_ids)
+
+    def add_fields(self, form: Any, index: Optional[int]) -> None:
+        super().add_fields(form, index)
+        # Django only sets letter_id; ContentBlock.__str__ would fetch the letter per row.
+        setattr(form.instance, self.fk.name, self.instance)
+
+
 class ContentBlockInline(admin.TabularInline):
-    """Inline editor for content blocks."""
+    """Inline editor for content blocks, ``PaginatedBlockFormSet.per_page`` at a time.
+
+    ``?blocks_page=N`` on the change page selects the page; the letter's
+    "Content blocks" field links to each one.
+    """
     model = ContentBlock
+    formset = PaginatedBlockFormSet
     extra = 1
     fields = ['block_type', 'order', 'content']
+    show_change_link = True
+
+    def get_formset(self, request: HttpRequest, obj: Optional[Letter] = None, **kwargs: Any) -> Type[PaginatedBlockFormSet]:
+        formset = cast(Type[PaginatedBlockFormSet], super().get_formset(request, obj, **kwargs))
+        try:
+            formset.page = max(1, int(request.GET.get(BLOCKS_PAGE_PARAM, 1)))
+        except ValueError:
+            formset.page = 1
+        return formset
+
+
+class LetterTypeAdminForm(forms.ModelForm):  # type: ignore[type-arg]
+    """Letter type form rejecting meta schemas letters can't be validated against."""
+
+    class Meta:
+        model = LetterType
+        fields = '__all__'
+
+    def clean_meta_schema(self) -> Any:
+        meta_schema = self.cleaned_data['meta_schema']
+        errors = compile_errors(meta_schema) + properties.meta_schema_errors(meta_schema)
+        if errors:
+            raise forms.ValidationError(errors)
+        return meta_schema
 
 
 @admin.register(LetterType)
 class LetterTypeAdmin(admin.ModelAdmin):
     """Admin for letter types."""
+    form = LetterTypeAdminForm
     list_display = ['name', 'slug', 'created_at']
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
     readonly_fields = ['created_at', 'updated_at']
 
 
+class LetterAdminForm(forms.ModelForm):  # type: ignore[type-arg]
+    """Letter form validating custom properties against the letter type.
+
+    ``is_published`` only changes when the checkbox is toggled.
+    """
+
+    class Meta:
+        model = Letter
+        fields = '__all__'
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # Post is_published as rendered too, to tell an edit from a stale value.
+        if 'is_published' in self.fields:
+            self.fields['is_published'].show_hidden_initial = True
+
+    def clean(self) -> Dict[str, Any]:
+        super().clean()
+        cleaned_data = self.cleaned_data
+        # A form opened before run_publisher published the letter still shows
+        # it as a draft; unless the box was toggled, keep the stored state.
+        if 'is_published' in self.fields and 'is_published' not in self.changed_data and not self.instance._state.adding:
+            cleaned_data['is_published'] = self.instance.is_published
+        letter_type = cleaned_data.get('letter_type')
+        if letter_type is not None and 'custom_properties' in cleaned_data:
+            validate_custom_properties(letter_type, cleaned_data['custom_properties'])
+        return cleaned_data
+
+
 @admin.register(Letter)
 class LetterAdmin(admin.ModelAdmin):
     """Admin for letters with inline content blocks."""
+    form = LetterAdminForm
     list_display = ['title', 'recipient_name', 'letter_type', 'is_published', 'created_by', 'copy_url_button', 'created_at']
     list_filter = ['is_published', 'letter_type', 'created_at']
+    list_select_related = ['letter_type', 'created_by']
     search_fields = ['title', 'recipient_name', 'description']
     prepopulated_fields = {'slug': ('title',)}
-    readonly_fields = ['created_at', 'updated_at', 'get_public_url']
+    readonly_fields = ['created_at', 'updated_at', 'get_public_url', 'content_block_pages']
+    autocomplete_fields = ['letter_type', 'created_by']
     inlines = [ContentBlockInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Full-text matches listed for a search, best first.
+    search_result_limit = 1000
+
+    def get_queryset(self, request: HttpRequest) -> QuerySet[Letter]:
+        queryset = super().get_queryset(request).defer('public_snapshot')
+        match = request.resolver_match
+        if match is not None and match.url_name == f'{self.opts.app_label}_{self.opts.model_name}_changelist':
+            queryset = queryset.defer(*WIDE_LETTER_FIELDS)
+        return queryset
+
+    @admin.display(description='Content blocks')
+    def content_block_pages(self, obj: Optional[Letter]) -> str:
+        """Links to each page of the block inline."""
+        if obj is None or obj.pk is None:
+            return '-'
+        total = obj.content_blocks.count()
+        per_page = PaginatedBlockFormSet.per_page
+        pages = range(1, (total + per_page - 1) // per_page + 1)
+        if len(pages) <= 1:
+            return f'{total} blocks'
+        links = format_html_join(
+            ' ', '<a href="?{}={}">{}–{}</a>',
+            ((BLOCKS_PAGE_PARAM, page, (page - 1) * per_page + 1, min(page * per_page, total)) for page in pages),
+        )
+        return format_html('{} blocks, edited {} at a time: {}', total, per_page, links)
+
+    def get_search_results(
+        self, request: HttpRequest, queryset: QuerySet[Letter], search_term: str,
+    ) -> Tuple[QuerySet[Letter], bool]:
+        """Search through the full-text index, which also covers block text.
+
+        Only the best ``search_result_limit`` matches are listed, with a
+        warning when there may be more.
+        """
+        if not search_term.strip():
+            return queryset, False
+        matches = search.search_ids(search_term, limit=self.search_result_limit)
+        if len(matches) >= self.search_result_limit:
+            self.message_user(
+                request,
+                f'Only the best {self.search_result_limit} matches are listed; refine the search to find others.',
+                messages.WARNING,
+            )
+        return queryset.filter(pk__in=[letter_id for letter_id, _, _ in matches]), False
 
     def copy_url_button(self, obj):  # type: ignore
         """Display a button to copy the public URL."""
@@ -56,7 +200,7 @@ class LetterAdmin(admin.ModelAdmin):
             'fields': ('title', 'slug', 'recipient_name', 'description')
         }),
         ('Letter Configuration', {
-            'fields': ('letter_type', 'custom_properties')
+            'fields': ('letter_type', 'custom_properties', 'content_block_pages')
         }),
         ('Publishing', {
             'fields': ('is_published', 'published_at')
@@ -73,11 +217,24 @@ class LetterAdmin(admin.ModelAdmin):
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
 
+    def save_related(self, request: HttpRequest, form: Any, formsets: Any, change: bool) -> None:
+        """Regenerate the public snapshot once after all inline blocks are saved."""
+        with snapshots.deferred():
+            super().save_related(request, form, formsets, change)
+
 
 @admin.register(ContentBlock)
 class ContentBlockAdmin(admin.ModelAdmin):
     """Admin for content blocks."""
     list_display = ['letter', 'block_type', 'order', 'created_at']
     list_filter = ['block_type', 'created_at']
+    list_select_related = ['letter']
     search_fields = ['letter__title']
     ordering = ['letter', 'order']
+    raw_id_fields = ['letter']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request: HttpRequest) -> QuerySet[ContentBlock]:
+        # __str__ and the letter column only need the letter's title and recipient.
+        return super().get_queryset(request).defer(*(f'letter__{name}' for name in WIDE_LETTER_FIELDS))
@@ -0,0 +1,196 @@
+"""Write-behind counts of public letter opens.
+
+The public view calls ``record(slug)``, which only bumps an in-process
+counter keyed by slug and hour. A background thread per process flushes the
+counters every ``LETTERS_OPEN_COUNTS_FLUSH_INTERVAL`` seconds. It also
+flushes sooner once ``LETTERS_OPEN_COUNTS_FLUSH_THRESHOLD`` opens are
+pending. Each flush resolves the slugs of published letters in one query.
+It then adds the counts to the ``LetterOpenCount`` rows of their hours with
+one ``INSERT ... ON CONFLICT DO UPDATE SET count = count + excluded.count``
+per batch. The addition happens in the database, so gunicorn workers flushing
+at the same time never overwrite each other's counts, and a spike costs one
+upsert per letter and hour rather than one UPDATE per open.
+
+Counts lag by up to one flush interval. ``gunicorn.conf.py`` flushes a worker
+on exit, and counts of a failed flush are kept for the next one. When nginx
+serves the static letter files it reports each open through a mirror request
+to ``/internal/letter-opens/<slug>/``, and the public view doesn't count.
+Those requests must carry the shared ``LETTERS_OPEN_TOKEN`` in the
+``X-Letters-Open-Token`` header; without a token set, none are accepted.
+"""
+import hmac
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F, Max, Q, Sum
+from django.http import HttpRequest
+from django.utils import timezone
+
+from . import static_letters
+from .models import Letter, LetterOpenCount
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+MIRROR_TOKEN_HEADER = 'X-Letters-Open-Token'
+
+_counts: 'Counter[Tuple[str, datetime]]' = Counter()
+_pending = 0
+_lock = threading.Lock()
+_wake = threading.Event()
+_flusher: Optional[threading.Thread] = None
+
+
+def current_hour(now: Optional[datetime] = None) -> datetime:
+    """The start of the UTC hour containing ``now``."""
+    now = (now or timezone.now()).astimezone(dt_timezone.utc)
+    return now.replace(minute=0, second=0, microsecond=0)
+
+
+def record(slug: str, now: Optional[datetime] = None) -> None:
+    """Count one open of a public letter page (no database access)."""
+    global _pending
+    with _lock:
+        _counts[(slug, current_hour(now))] += 1
+        _pending += 1
+        full = _pending >= getattr(settings, 'LETTERS_OPEN_COUNTS_FLUSH_THRESHOLD', 1000)
+    _start_flusher()
+    if full:
+        _wake.set()
+
+
+def is_mirrored(request: HttpRequest) -> bool:
+    """Whether a request carries the ``LETTERS_OPEN_TOKEN`` that nginx's open mirror sends."""
+    token = getattr(settings, 'LETTERS_OPEN_TOKEN', '')
+    sent = request.headers.get(MIRROR_TOKEN_HEADER, '')
+    return bool(token) and hmac.compare_digest(sent.encode(), token.encode())
+
+
+def record_view(slug: str, status: int) -> None:
+    """Count a public view's response, unless nginx reports opens (static files are on)."""
+    if status == 200 and static_letters.get_root() is None:
+        record(slug)
+
+
+def pending() -> int:
+    """Opens recorded in this process and not flushed yet."""
+    return _pending
+
+
+def _drain() -> 'Counter[Tuple[str, datetime]]':
+    global _counts, _pending
+    with _lock:
+        counts, _counts, _pending = _counts, Counter(), 0
+    return counts
+
+
+def _restore(counts: 'Counter[Tuple[str, datetime]]') -> None:
+    global _pending
+    with _lock:
+        _counts.update(counts)
+        _pending += sum(counts.values())
+
+
+def flush() -> int:
+    """Write the pending counts to the database; return the opens written."""
+    counts = _drain()
+    if not counts:
+        return 0
+    try:
+        with transaction.atomic():
+            letter_ids = dict(
+                Letter.objects.filter(slug__in={slug for slug, _ in counts}, is_published=True)
+                .order_by().values_list('slug', 'pk')
+            )
+            # Opens of unknown or unpublished slugs (404s) are dropped here. Rows
+            # go in key order so concurrent flushes lock them in the same order.
+            rows = sorted(
+                (letter_ids[slug], hour, count)
+                for (slug, hour), count in counts.items()
+                if slug in letter_ids
+            )
+            for start in range(0, len(rows), BATCH_SIZE):
+                _add_counts(rows[start:start + BATCH_SIZE])
+    except DatabaseError:
+        _restore(counts)
+        raise
+    return sum(count for _, _, count in rows)
+
+
+def _add_counts(rows: List[Tuple[Any, datetime, int]]) -> None:
+    """Add ``(letter_id, hour, count)`` rows to the stored counts."""
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        for letter_id, hour, count in rows:
+            updated = LetterOpenCount.objects.filter(letter_id=letter_id, hour=hour).update(count=F('count') + count)
+            if not updated:
+                LetterOpenCount.objects.create(letter_id=letter_id, hour=hour, count=count)
+        return
+    letter_field = LetterOpenCount._meta.get_field('letter')
+    hour_field = LetterOpenCount._meta.get_field('hour')
+    table = connection.ops.quote_name(LetterOpenCount._meta.db_table)
+    params: List[Any] = []
+    for letter_id, hour, count in rows:
+        params += [
+            letter_field.get_db_prep_value(letter_id, connection),
+            hour_field.get_db_prep_value(hour, connection),
+            count,
+        ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (letter_id, hour, count) VALUES {', '.join(['(%s, %s, %s)'] * len(rows))} "
+            f"ON CONFLICT (letter_id, hour) DO UPDATE SET count = {table}.count + excluded.count",
+            params,
+        )
+
+
+def _run_flusher() -> None:
+    while True:
+        _wake.wait(getattr(settings, 'LETTERS_OPEN_COUNTS_FLUSH_INTERVAL', 10.0))
+        _wake.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception('Could not flush letter open counts; keeping them for the next flush')
+        finally:
+            close_old_connections()
+
+
+def _start_flusher() -> None:
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_run_flusher, name='letter-open-counts', daemon=True)
+            _flusher.start()
+
+
+def _after_fork() -> None:
+    # The parent's counts are its own to flush, and threads don't survive a fork.
+    global _counts, _pending, _lock, _wake, _flusher
+    _counts, _pending, _lock, _wake, _flusher = Counter(), 0, threading.Lock(), threading.Event(), None
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def open_stats(letter_id: Any, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Total opens, opens in the last 24 hours and the hour of the last open, in one query."""
+    since = current_hour(now) - timedelta(hours=23)
+    stats = LetterOpenCount.objects.filter(letter_id=letter_id).aggregate(
+        total=Sum('count'),
+        last_24_hours=Sum('count', filter=Q(hour__gte=since)),
+        last_opened_at=Max('hour'),
+    )
+    return {
+        'total': stats['total'] or 0,
+        'last_24_hours': stats['last_24_hours'] or 0,
+        'last_opened_at': stats['last_opened_at'],
+    }
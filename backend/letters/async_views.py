@@ -0,0 +1,78 @@
+"""Async variants of the public read endpoints, for serving under ASGI.
+
+Under uvicorn a worker keeps accepting connections while these views wait on
+the database, so a burst of link opens no longer ties up one worker per
+request. They are plain Django async views (DRF 3.14 has no async support)
+and return the same bodies as their sync counterparts in ``views.py``.
+URLs route to them when ``LETTERS_ASYNC_VIEWS`` is enabled.
+"""
+import functools
+from typing import Any, Awaitable, Callable
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.http import HttpRequest, HttpResponse, HttpResponseNotAllowed, JsonResponse
+from rest_framework import status
+
+from . import cache as public_cache
+from . import analytics, conditional, health, snapshots
+from .views import public_http_response, public_letter_row, public_response
+
+
+AsyncView = Callable[..., Awaitable[HttpResponse]]
+
+
+def require_get(view: AsyncView) -> AsyncView:
+    """Async-aware ``require_GET`` (Django 4.2's decorator only wraps sync views)."""
+    @functools.wraps(view)
+    async def wrapper(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def arender_public_letter(slug: str) -> public_cache.CachedResponse:
+    """Async counterpart of ``views.render_public_letter``."""
+    row = await public_letter_row(slug).afirst()
+    if row is None:
+        return public_response(None)
+    letter_id, snapshot, *columns = row
+    if snapshot is None:
+        snapshot = await sync_to_async(snapshots.refresh_snapshot)(letter_id)
+    return public_response(snapshot, conditional.validators_from_row(letter_id, *columns))
+
+
+@require_get
+async def letter_public_view(request: HttpRequest, slug: str) -> HttpResponse:
+    """Public view for a letter by slug, served from the public response cache."""
+    rendered = await public_cache.aget_or_render(slug, lambda: arender_public_letter(slug))
+    analytics.record_view(slug, rendered.status)
+    return public_http_response(request, rendered)
+
+
+@require_get
+async def health_check(request: HttpRequest) -> JsonResponse:
+    """Health check endpoint for monitoring service status."""
+    try:
+        await sync_to_async(connection.ensure_connection)()
+    except Exception as e:
+        return JsonResponse(
+            {'status': 'unhealthy', 'database': f"unhealthy: {str(e)}"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    return JsonResponse({'status': 'healthy', 'database': 'healthy'})
+
+
+@require_get
+async def health_live(request: HttpRequest) -> JsonResponse:
+    """Liveness probe: the process is up and serving requests (no I/O)."""
+    return JsonResponse(health.liveness())
+
+
+@require_get
+async def health_ready(request: HttpRequest) -> JsonResponse:
+    """Readiness probe: database round trip, migration state and cache backend."""
+    report = await sync_to_async(health.readiness)()
+    ready = report['status'] == 'ready'
+    return JsonResponse(report, status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -0,0 +1,235 @@
+"""Read-through cache for rendered public letter responses.
+
+Responses are cached by slug as already-rendered JSON bytes, so a hit skips
+the ORM and the serializer entirely. Two backends are available:
+
+* ``lru``: an in-process LRU with per-entry TTL (the default).
+* ``django``: any alias from ``CACHES``, shared between workers.
+
+The ``lru`` backend only sees invalidations made in its own process, so a
+deployment running several workers should use ``django`` with a shared cache
+(setting ``LETTERS_PUBLIC_CACHE_DIR`` configures both, see settings).
+
+Entries are invalidated from model signals (see ``letters.signals``).
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Protocol, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from . import metrics
+
+
+DEFAULTS: Dict[str, Any] = {
+    'BACKEND': 'lru',
+    'ALIAS': 'default',
+    'MAX_ENTRIES': 1024,
+    'TIMEOUT': 60,
+    'NOT_FOUND_TIMEOUT': 5,
+    'KEY_PREFIX': 'letters:public',
+}
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """A rendered response body along with its status code and validators."""
+    status: int
+    body: bytes
+    etag: str = ''
+    last_modified: Optional[int] = None
+
+
+class CacheBackend(Protocol):
+    """Minimal interface shared by the cache backends."""
+
+    def get(self, key: str) -> Optional[CachedResponse]: ...
+
+    def set(self, key: str, value: CachedResponse, timeout: float) -> None: ...
+
+    def delete_many(self, keys: Iterable[str]) -> None: ...
+
+    def clear(self) -> None: ...
+
+    async def aget(self, key: str) -> Optional[CachedResponse]: ...
+
+    async def aset(self, key: str, value: CachedResponse, timeout: float) -> None: ...
+
+
+class LRUCacheBackend:
+    """Thread-safe in-process LRU cache with per-entry expiry."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._data: 'OrderedDict[str, Tuple[float, CachedResponse]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: CachedResponse, timeout: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    # The lock is only held for dict operations, so these never block the loop.
+    async def aget(self, key: str) -> Optional[CachedResponse]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: CachedResponse, timeout: float) -> None:
+        self.set(key, value, timeout)
+
+
+class DjangoCacheBackend:
+    """Adapter storing entries in a configured Django cache alias."""
+
+    def __init__(self, alias: str) -> None:
+        self.alias = alias
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        value = caches[self.alias].get(key)
+        if value is None:
+            return None
+        # Entries written before validators were added hold (status, body).
+        return CachedResponse(*value)
+
+    def set(self, key: str, value: CachedResponse, timeout: float) -> None:
+        caches[self.alias].set(key, (value.status, value.body, value.etag, value.last_modified), timeout)
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        caches[self.alias].delete_many(list(keys))
+
+    def clear(self) -> None:
+        caches[self.alias].clear()
+
+    async def aget(self, key: str) -> Optional[CachedResponse]:
+        value = await caches[self.alias].aget(key)
+        if value is None:
+            return None
+        return CachedResponse(*value)
+
+    async def aset(self, key: str, value: CachedResponse, timeout: float) -> None:
+        await caches[self.alias].aset(key, (value.status, value.body, value.etag, value.last_modified), timeout)
+
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_config() -> Dict[str, Any]:
+    """Return the cache configuration merged over the defaults."""
+    return {**DEFAULTS, **getattr(settings, 'LETTERS_PUBLIC_CACHE', {})}
+
+
+def get_backend() -> CacheBackend:
+    """Return the process-wide backend, building it on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = get_config()
+                if config['BACKEND'] == 'django':
+                    _backend = DjangoCacheBackend(config['ALIAS'])
+                elif config['BACKEND'] == 'lru':
+                    _backend = LRUCacheBackend(int(config['MAX_ENTRIES']))
+                else:
+                    raise ValueError(f"Unknown public cache backend: {config['BACKEND']!r}")
+    return _backend
+
+
+@receiver(setting_changed)
+def _reset_backend(setting: str, **kwargs: Any) -> None:
+    global _backend
+    if setting == 'LETTERS_PUBLIC_CACHE':
+        _backend = None
+
+
+def cache_key(slug: str) -> str:
+    """Build the cache key for a public letter slug."""
+    return f"{get_config()['KEY_PREFIX']}:{slug}"
+
+
+def get_or_render(slug: str, render: Callable[[], CachedResponse]) -> CachedResponse:
+    """Return the cached response for ``slug``, rendering and storing it on a miss."""
+    backend = get_backend()
+    key = cache_key(slug)
+    cached = backend.get(key)
+    metrics.cache_lookup(cached is not None)
+    if cached is not None:
+        return cached
+
+    response = render()
+    timeout = _timeout(response)
+    if timeout:
+        backend.set(key, response, timeout)
+    return response
+
+
+async def aget_or_render(slug: str, render: Callable[[], Awaitable[CachedResponse]]) -> CachedResponse:
+    """Async counterpart of ``get_or_render`` for async views."""
+    backend = get_backend()
+    key = cache_key(slug)
+    cached = await backend.aget(key)
+    metrics.cache_lookup(cached is not None)
+    if cached is not None:
+        return cached
+
+    response = await render()
+    timeout = _timeout(response)
+    if timeout:
+        await backend.aset(key, response, timeout)
+    return response
+
+
+def _timeout(response: CachedResponse) -> float:
+    config = get_config()
+    return float(config['TIMEOUT'] if response.status < 400 else config['NOT_FOUND_TIMEOUT'])
+
+
+def invalidate(slugs: Iterable[str]) -> None:
+    """Drop cached responses for the given slugs."""
+    keys = [cache_key(slug) for slug in slugs if slug]
+    if keys:
+        get_backend().delete_many(keys)
+
+
+def prime(responses: Dict[str, CachedResponse]) -> None:
+    """Store freshly rendered responses by slug, replacing cached ones."""
+    backend = get_backend()
+    for slug, response in responses.items():
+        timeout = _timeout(response)
+        if timeout:
+            backend.set(cache_key(slug), response, timeout)
+
+
+def clear() -> None:
+    """Drop every cached public response."""
+    get_backend().clear()
@@ -0,0 +1,127 @@
+"""Conditional GET (``ETag``/``Last-Modified``, 304) for letter responses.
+
+A letter's validators come from timestamps: its ``updated_at``, its letter
+type's and the newest of its blocks', plus the block count so that a removed
+block changes them too. ``letter_validators()`` reads them all in one query,
+with subqueries in place of joins, so a client's copy can be checked before
+any prefetching or serializing. The ETag is a digest of those values and of
+anything else that shapes the body (such as ``?fields=`` or, for the admin
+detail, the author's fields).
+
+Public responses keep their validators in the public cache next to the body,
+so a cache hit answers ``If-None-Match`` without a query.
+"""
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery, Sum
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import ContentBlock, Letter, LetterOpenCount
+
+
+# Public letters: anyone may store them, but must revalidate (edits show at once).
+PUBLIC_CACHE_CONTROL = {'public': True, 'no_cache': True}
+# Admin responses: the browser only, revalidated every time.
+ADMIN_CACHE_CONTROL = {'private': True, 'no_cache': True}
+# The author fields rendered by the admin detail (see UserSerializer).
+AUTHOR_COLUMNS = ['created_by__username', 'created_by__email', 'created_by__is_staff', 'created_by__is_superuser']
+
+
+@dataclass(frozen=True)
+class Validators:
+    """A strong ETag (quoted) and the Last-Modified time as a Unix timestamp."""
+    etag: str
+    last_modified: int
+
+
+def make_validators(last_modified: datetime, parts: Iterable[Any]) -> Validators:
+    """Build validators from the newest timestamp and the values the ETag covers."""
+    digest = hashlib.blake2b('|'.join(str(part) for part in parts).encode('utf-8'), digest_size=16)
+    return Validators(etag=f'"{digest.hexdigest()}"', last_modified=int(last_modified.timestamp()))
+
+
+def _block_aggregate(function: Any) -> Subquery:
+    return Subquery(
+        ContentBlock.objects.filter(letter=OuterRef('pk'))
+        .order_by().values('letter').annotate(value=function).values('value')
+    )
+
+
+def annotate_validators(queryset: Any, with_opens: bool = False) -> Any:
+    """Add the block and (optionally) open count columns the validators need."""
+    queryset = queryset.annotate(
+        blocks_updated_at=_block_aggregate(Max('updated_at')),
+        block_count=_block_aggregate(Count('pk')),
+    )
+    if with_opens:
+        opens = (
+            LetterOpenCount.objects.filter(letter=OuterRef('pk'))
+            .order_by().values('letter').annotate(total=Sum('count')).values('total')
+        )
+        queryset = queryset.annotate(open_count=Subquery(opens, output_field=IntegerField()))
+    return queryset
+
+
+def validators_from_row(
+    letter_id: Any,
+    updated_at: datetime,
+    letter_type_updated_at: datetime,
+    blocks_updated_at: Optional[datetime],
+    block_count: Optional[int],
+    *extra: Any,
+) -> Validators:
+    """Validators of a letter from its ``annotate_validators`` columns."""
+    timestamps = [updated_at, letter_type_updated_at] + ([blocks_updated_at] if blocks_updated_at else [])
+    return make_validators(max(timestamps), [
+        letter_id, updated_at.isoformat(), letter_type_updated_at.isoformat(),
+        blocks_updated_at.isoformat() if blocks_updated_at else '', block_count or 0, *extra,
+    ])
+
+
+def letter_validators(
+    letter_id: Any, with_opens: bool = False, with_author: bool = False, extra: Iterable[Any] = (),
+) -> Optional[Validators]:
+    """Validators of a letter in one query, or ``None`` if it doesn't exist.
+
+    ``with_author`` covers the fields of ``created_by`` that the admin detail
+    embeds. Users have no modification time, so their values go into the
+    ETag only.
+    """
+    columns = ['updated_at', 'letter_type__updated_at', 'blocks_updated_at', 'block_count']
+    if with_opens:
+        columns.append('open_count')
+    if with_author:
+        columns += AUTHOR_COLUMNS
+    try:
+        row = annotate_validators(Letter.objects.filter(pk=letter_id), with_opens).values_list(*columns).first()
+    except (TypeError, ValueError, ValidationError):
+        # Not a valid id; the view's own lookup answers 404.
+        return None
+    if row is None:
+        return None
+    updated_at, type_updated_at, blocks_updated_at, block_count, *rest = row
+    return validators_from_row(
+        letter_id, updated_at, type_updated_at, blocks_updated_at, block_count, *rest, *extra,
+    )
+
+
+def not_modified(request: HttpRequest, validators: Optional[Validators]) -> Optional[HttpResponse]:
+    """The 304 (or 412) response ``request``'s conditional headers call for, if any."""
+    if validators is None:
+        return None
+    return get_conditional_response(request, etag=validators.etag, last_modified=validators.last_modified)
+
+
+def set_validators(response: HttpResponse, validators: Optional[Validators], cache_control: Dict[str, Any]) -> HttpResponse:
+    """Add ``ETag``, ``Last-Modified`` and ``Cache-Control`` to a response."""
+    if validators is not None:
+        response['ETag'] = validators.etag
+        response['Last-Modified'] = http_date(validators.last_modified)
+        patch_cache_control(response, **cache_control)
+    return response
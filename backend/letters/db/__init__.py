@@ -0,0 +1 @@
+"""Pooled database backends (see ``letters.db.base``)."""
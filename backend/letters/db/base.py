@@ -0,0 +1,106 @@
+"""Connection pooling for Django database backends.
+
+Django 4.2 opens one connection per thread and keeps it for ``CONN_MAX_AGE``
+seconds, so open connections grow with worker threads, and a connection
+broken by a database restart fails its first query. The pooled backends
+instead check a connection out of a per-process pool when a request first
+touches the database and hand it back when Django closes it at the end of
+the request (use ``CONN_MAX_AGE=0``). Settings go in the database's ``POOL``
+dict::
+
+    DATABASES['default'] = {
+        'ENGINE': 'letters.db.postgresql',  # or 'letters.db.sqlite3'
+        ...,
+        'CONN_MAX_AGE': 0,
+        'POOL': {'MAX_SIZE': 10, 'TIMEOUT': 30, 'MAX_IDLE': 300, 'MAX_LIFETIME': 3600, 'PRE_PING': True},
+    }
+
+``MAX_SIZE`` bounds connections per process however many threads it runs, so
+Postgres sees at most ``processes * MAX_SIZE``. A thread that exits without
+closing its connection (e.g. a worker thread outside the request cycle)
+doesn't leak it: the pool reclaims it once it runs out of connections.
+"""
+import abc
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from .pool import ConnectionPool, PoolTimeout
+
+
+POOL_DEFAULTS: Dict[str, Any] = {
+    'MAX_SIZE': 10,
+    'TIMEOUT': 30.0,
+    'MAX_IDLE': 300.0,
+    'MAX_LIFETIME': 3600.0,
+    'PRE_PING': True,
+}
+
+_pools: Dict[Tuple[int, str, str], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pools() -> Dict[str, ConnectionPool]:
+    """Return this process's pools by database alias."""
+    pid = os.getpid()
+    with _pools_lock:
+        return {alias: pool for (owner, alias, _), pool in _pools.items() if owner == pid}
+
+
+class PooledDatabaseWrapperMixin(abc.ABC):
+    """Mixin for a ``DatabaseWrapper`` that borrows connections from a pool."""
+
+    alias: str
+    settings_dict: Dict[str, Any]
+    connection: Any
+    in_atomic_block: bool
+    errors_occurred: bool
+
+    @staticmethod
+    @abc.abstractmethod
+    def ping(raw: Any) -> bool:
+        """Return whether an idle raw connection still answers; see ``PRE_PING``."""
+
+    @property
+    def pool(self) -> ConnectionPool:
+        # Pools aren't shared across fork() or between the test and real databases.
+        key = (os.getpid(), self.alias, str(self.settings_dict['NAME']))
+        pool = _pools.get(key)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(key)
+                if pool is None:
+                    options = {**POOL_DEFAULTS, **(self.settings_dict.get('POOL') or {})}
+                    pool = ConnectionPool(
+                        check=type(self).ping,
+                        max_size=int(options['MAX_SIZE']),
+                        timeout=float(options['TIMEOUT']),
+                        max_idle=options['MAX_IDLE'],
+                        max_lifetime=options['MAX_LIFETIME'],
+                        pre_ping=bool(options['PRE_PING']),
+                    )
+                    _pools[key] = pool
+        return pool
+
+    def get_new_connection(self, conn_params: Dict[str, Any]) -> Any:
+        try:
+            return self.pool.acquire(lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params)).raw  # type: ignore[misc]
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc  # type: ignore[attr-defined]
+
+    def connection_age(self) -> Optional[float]:
+        """Seconds since the current raw connection was opened, if pooled."""
+        entry = self.pool.get(self.connection) if self.connection is not None else None
+        return entry.age if entry is not None else None
+
+    def _close(self) -> None:
+        if self.connection is None:
+            return
+        # A connection closed mid-transaction or after errors isn't reused.
+        discard = self.in_atomic_block or self.errors_occurred
+        if not discard:
+            try:
+                self.connection.rollback()
+            except Exception:
+                discard = True
+        self.pool.release(self.connection, discard=discard)
@@ -0,0 +1,231 @@
+"""A small thread-safe pool of DB-API connections.
+
+Connections are handed out most-recently-used first, so a quiet process keeps
+a few warm connections and lets the rest age out. Each checkout can be
+validated first (``pre_ping``), connections idle longer than ``max_idle`` or
+older than ``max_lifetime`` are closed, and at most ``max_size`` connections
+are open at once; callers beyond that wait up to ``timeout`` seconds.
+
+Each checkout remembers the thread that took it. A thread that exits without
+releasing its connection can't use it again, so when the pool is full its
+connection is closed and the slot reclaimed.
+"""
+import threading
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+
+ORPHAN_CHECK_INTERVAL = 1.0
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the pool timeout."""
+
+
+@dataclass
+class PooledConnection:
+    """A raw connection with the timestamps the pool evicts by."""
+    raw: Any
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    owner: Optional['weakref.ref[threading.Thread]'] = None
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+    @property
+    def orphaned(self) -> bool:
+        """Whether the thread that checked this connection out has exited."""
+        thread = self.owner() if self.owner is not None else None
+        return thread is None or not thread.is_alive()
+
+
+@dataclass
+class PoolStats:
+    """Counters describing a pool's lifetime activity."""
+    created: int = 0
+    closed: int = 0
+    checkouts: int = 0
+    waits: int = 0
+    timeouts: int = 0
+    failed_checks: int = 0
+    reclaimed: int = 0
+
+
+class ConnectionPool:
+    """Bounded pool of connections produced by ``connect``."""
+
+    def __init__(
+        self,
+        connect: Optional[Callable[[], Any]] = None,
+        check: Optional[Callable[[Any], bool]] = None,
+        max_size: int = 10,
+        timeout: float = 30.0,
+        max_idle: Optional[float] = 300.0,
+        max_lifetime: Optional[float] = 3600.0,
+        pre_ping: bool = True,
+    ) -> None:
+        self.connect = connect
+        self.check = check
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.pre_ping = pre_ping
+        self.stats = PoolStats()
+        self._idle: Deque[PooledConnection] = deque()
+        self._in_use: Dict[int, PooledConnection] = {}
+        self._size = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, connect: Optional[Callable[[], Any]] = None) -> PooledConnection:
+        """Check out a connection, opening one with ``connect`` if the pool isn't full."""
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            orphans: List[PooledConnection] = []
+            with self._condition:
+                self._evict_idle()
+                entry = self._idle.pop() if self._idle else None
+                if entry is None and self._size >= self.max_size:
+                    orphans = self._reclaim_orphans()
+                if entry is None:
+                    if self._size < self.max_size:
+                        # Reserve the slot; the connection opens outside the lock.
+                        self._size += 1
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.stats.timeouts += 1
+                            raise PoolTimeout(
+                                f"No database connection available within {self.timeout}s "
+                                f"(pool size {self.max_size})"
+                            )
+                        if not waited:
+                            waited = True
+                            self.stats.waits += 1
+                        # Wake up now and then: an exiting thread doesn't notify.
+                        self._condition.wait(min(remaining, ORPHAN_CHECK_INTERVAL))
+                        continue
+            for orphan in orphans:
+                _close_quietly(orphan.raw)
+
+            if entry is None:
+                entry = self._open(connect or self.connect)
+            elif self.pre_ping and self.check is not None and not self._healthy(entry):
+                with self._condition:
+                    self.stats.failed_checks += 1
+                self._discard(entry)
+                continue
+
+            entry.last_used = time.monotonic()
+            entry.owner = weakref.ref(threading.current_thread())
+            with self._condition:
+                self._in_use[id(entry.raw)] = entry
+                self.stats.checkouts += 1
+            return entry
+
+    def release(self, raw: Any, discard: bool = False) -> None:
+        """Return a checked-out connection, closing it if it shouldn't be reused."""
+        with self._condition:
+            entry = self._in_use.pop(id(raw), None)
+        if entry is None:
+            # Not ours (e.g. opened before the pool existed); just close it.
+            _close_quietly(raw)
+            return
+        if discard or (self.max_lifetime is not None and entry.age >= self.max_lifetime):
+            self._discard(entry)
+            return
+        entry.last_used = time.monotonic()
+        with self._condition:
+            self._idle.append(entry)
+            self._condition.notify()
+
+    def get(self, raw: Any) -> Optional[PooledConnection]:
+        """Return the pool entry for a checked-out raw connection."""
+        with self._condition:
+            return self._in_use.get(id(raw))
+
+    def close_all(self) -> None:
+        """Close every idle connection; checked-out ones close on release."""
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self.stats.closed += len(idle)
+            self._condition.notify_all()
+        for entry in idle:
+            _close_quietly(entry.raw)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return current occupancy and lifetime counters."""
+        with self._condition:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                **self.stats.__dict__,
+            }
+
+    def _open(self, connect: Optional[Callable[[], Any]]) -> PooledConnection:
+        try:
+            if connect is None:
+                raise ValueError('ConnectionPool needs a connect callable')
+            raw = connect()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self.stats.created += 1
+        return PooledConnection(raw)
+
+    def _healthy(self, entry: PooledConnection) -> bool:
+        try:
+            return bool(self.check(entry.raw))  # type: ignore[misc]
+        except Exception:
+            return False
+
+    def _discard(self, entry: PooledConnection) -> None:
+        _close_quietly(entry.raw)
+        with self._condition:
+            self._size -= 1
+            self.stats.closed += 1
+            self._condition.notify()
+
+    def _reclaim_orphans(self) -> List[PooledConnection]:
+        """Free the slots of connections whose threads exited; the caller holds the lock.
+
+        The connections are returned for the caller to close outside the lock.
+        """
+        orphans = [entry for entry in self._in_use.values() if entry.orphaned]
+        for entry in orphans:
+            del self._in_use[id(entry.raw)]
+        self._size -= len(orphans)
+        self.stats.closed += len(orphans)
+        self.stats.reclaimed += len(orphans)
+        return orphans
+
+    def _evict_idle(self) -> None:
+        """Close connections idle past ``max_idle``; the caller holds the lock."""
+        if self.max_idle is None:
+            return
+        cutoff = time.monotonic() - self.max_idle
+        # The oldest idle connections sit at the left end.
+        while self._idle and self._idle[0].last_used < cutoff:
+            entry = self._idle.popleft()
+            self._size -= 1
+            self.stats.closed += 1
+            _close_quietly(entry.raw)
+
+
+def _close_quietly(raw: Any) -> None:
+    try:
+        raw.close()
+    except Exception:
+        pass
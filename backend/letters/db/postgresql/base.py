@@ -0,0 +1,27 @@
+"""PostgreSQL backend borrowing connections from a per-process pool."""
+from typing import Any, Dict
+
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from ..base import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, PostgresDatabaseWrapper):
+    """``django.db.backends.postgresql`` with pooled connections."""
+
+    @staticmethod
+    def ping(raw: Any) -> bool:
+        if raw.closed:
+            return False
+        with raw.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not raw.autocommit:
+            raw.rollback()
+        return True
+
+    def get_new_connection(self, conn_params: Dict[str, Any]) -> Any:
+        # Postgres sets isolation_level while connecting; reused connections skip that.
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = IsolationLevel(options.get('isolation_level', IsolationLevel.READ_COMMITTED))
+        return super().get_new_connection(conn_params)
@@ -0,0 +1,24 @@
+"""SQLite backend borrowing connections from a per-process pool.
+
+Mostly a local stand-in for the PostgreSQL pool. In-memory databases (as used
+by the test runner) live only as long as their connection, so they aren't pooled.
+"""
+from typing import Any, Dict
+
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+
+from ..base import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, SQLiteDatabaseWrapper):
+    """``django.db.backends.sqlite3`` with pooled connections."""
+
+    @staticmethod
+    def ping(raw: Any) -> bool:
+        raw.execute('SELECT 1').fetchone()
+        return True
+
+    def get_new_connection(self, conn_params: Dict[str, Any]) -> Any:
+        if self.is_in_memory_db():
+            return SQLiteDatabaseWrapper.get_new_connection(self, conn_params)
+        return super().get_new_connection(conn_params)
@@ -0,0 +1,179 @@
+"""Liveness and readiness probes.
+
+Liveness touches nothing outside the process. Readiness runs a timed
+``SELECT 1``, checks for unapplied migrations and probes the public cache
+backend; its result is reused for ``LETTERS_HEALTH_READY_TTL`` seconds so
+frequent probes from several orchestrators don't each hit the database.
+One thread runs the checks at a time, outside the lock, while the others
+answer with the previous report. Their queries are bounded by
+``LETTERS_HEALTH_DB_TIMEOUT`` on PostgreSQL, and migrations are no longer
+checked once they have all been applied.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+
+from . import cache as public_cache
+from .db.base import PooledDatabaseWrapperMixin
+
+
+STARTED_AT = time.monotonic()
+
+_ready: Optional[Tuple[float, Dict[str, Any]]] = None
+_checking = False
+_ready_changed = threading.Condition()
+# Aliases whose migrations were all applied; that can't change while we run.
+_migrated: Set[str] = set()
+
+
+def liveness() -> Dict[str, Any]:
+    """Report that the process is up; performs no I/O."""
+    return {
+        'status': 'alive',
+        'pid': os.getpid(),
+        'uptime_s': round(time.monotonic() - STARTED_AT, 3),
+    }
+
+
+def check_database(alias: str = DEFAULT_DB_ALIAS) -> Dict[str, Any]:
+    """Time a ``SELECT 1`` round trip and describe the connection it ran on."""
+    connection = connections[alias]
+    result: Dict[str, Any] = {
+        'vendor': connection.vendor,
+        'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE'),
+        'conn_health_checks': connection.settings_dict.get('CONN_HEALTH_CHECKS', False),
+    }
+    reused = connection.connection is not None
+    started = time.perf_counter()
+    try:
+        with statement_timeout(alias), connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Exception as exc:
+        return {**result, 'status': 'error', 'error': str(exc)}
+    latency = time.perf_counter() - started
+    if isinstance(connection, PooledDatabaseWrapperMixin):
+        age = connection.connection_age()
+        result['pool'] = connection.pool.snapshot()
+    else:
+        connected_at = getattr(connection, 'connected_at', None)
+        age = time.monotonic() - connected_at if connected_at is not None else None
+    return {
+        **result,
+        'status': 'ok',
+        'latency_ms': round(latency * 1000, 3),
+        'connection_reused': reused,
+        'connection_age_s': round(age, 3) if age is not None else None,
+    }
+
+
+@contextmanager
+def statement_timeout(alias: str = DEFAULT_DB_ALIAS) -> Iterator[None]:
+    """Bound the block's queries by ``LETTERS_HEALTH_DB_TIMEOUT`` where the database supports it.
+
+    PostgreSQL gets a transaction-local ``statement_timeout``; SQLite queries
+    here never wait on the network, and its lock waits are bounded already.
+    """
+    connection = connections[alias]
+    timeout = float(getattr(settings, 'LETTERS_HEALTH_DB_TIMEOUT', 0))
+    if connection.vendor != 'postgresql' or timeout <= 0:
+        yield
+        return
+    with transaction.atomic(using=alias):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL statement_timeout = %s', [int(timeout * 1000)])
+        yield
+
+
+def check_migrations(alias: str = DEFAULT_DB_ALIAS) -> Dict[str, Any]:
+    """List migrations that exist on disk but haven't been applied.
+
+    Once none are pending this answers from memory: loading the migration
+    graph on every probe is the most expensive part of readiness.
+    """
+    if alias in _migrated:
+        return {'status': 'ok', 'pending': []}
+    try:
+        with statement_timeout(alias):
+            executor = MigrationExecutor(connections[alias])
+            plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    except Exception as exc:
+        return {'status': 'error', 'error': str(exc)}
+    pending = [f'{migration.app_label}.{migration.name}' for migration, backwards in plan if not backwards]
+    if not pending:
+        _migrated.add(alias)
+    return {'status': 'pending' if pending else 'ok', 'pending': pending}
+
+
+def check_cache() -> Dict[str, Any]:
+    """Check that the public response cache backend answers."""
+    config = public_cache.get_config()
+    result: Dict[str, Any] = {'backend': config['BACKEND']}
+    try:
+        backend = public_cache.get_backend()
+        if isinstance(backend, public_cache.LRUCacheBackend):
+            return {**result, 'status': 'ok', 'entries': len(backend), 'max_entries': backend.max_entries}
+        started = time.perf_counter()
+        backend.get(public_cache.cache_key('-health-'))
+        return {**result, 'status': 'ok', 'latency_ms': round((time.perf_counter() - started) * 1000, 3)}
+    except Exception as exc:
+        return {**result, 'status': 'error', 'error': str(exc)}
+
+
+def run_readiness_checks() -> Dict[str, Any]:
+    """Run every readiness check now."""
+    checks = {
+        'database': check_database(),
+        'migrations': check_migrations(),
+        'cache': check_cache(),
+    }
+    ready = all(check['status'] == 'ok' for check in checks.values())
+    return {
+        'status': 'ready' if ready else 'not_ready',
+        'checked_at': timezone.now().isoformat(),
+        'checks': checks,
+    }
+
+
+def readiness() -> Dict[str, Any]:
+    """Return the readiness report, reusing a recent one within the TTL.
+
+    When the report is stale, one caller runs the checks while concurrent
+    callers get the stale report instead of queueing behind the database.
+    """
+    global _ready, _checking
+    ttl = float(getattr(settings, 'LETTERS_HEALTH_READY_TTL', 0))
+    with _ready_changed:
+        while True:
+            if _ready is not None and (_checking or time.monotonic() - _ready[0] < ttl):
+                return {**_ready[1], 'cached': True}
+            if not _checking:
+                break
+            # The very first check is still running: wait for its report.
+            _ready_changed.wait()
+        _checking = True
+    report = None
+    try:
+        report = run_readiness_checks()
+    finally:
+        with _ready_changed:
+            _checking = False
+            if report is not None:
+                _ready = (time.monotonic(), report)
+            _ready_changed.notify_all()
+    return {**report, 'cached': False}
+
+
+def reset() -> None:
+    """Forget the cached readiness report and migration state."""
+    global _ready
+    with _ready_changed:
+        _ready = None
+    _migrated.clear()
@@ -0,0 +1,219 @@
+"""Content-addressed storage of uploaded images with responsive variants.
+
+An upload is stored under ``images/<sha256[:2]>/<sha256>/`` in the default
+storage: a metadata-free copy of the original plus WebP and JPEG variants at
+each width in ``VARIANT_WIDTHS`` (never upscaled). Variants are encoded in a
+small pool of spawned processes so one upload uses several cores without
+holding the GIL of the serving process; spawning (rather than forking a
+multi-threaded server) keeps the workers free of its locks and connections.
+A pool whose worker died is replaced and the upload answered with 503.
+``manifest.json`` is written last; once it exists, uploading the same bytes
+again returns the stored result without re-encoding. Files are content
+addressed, so one already written by a concurrent upload of the same image is
+kept as is.
+"""
+import hashlib
+import io
+import json
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+VARIANT_WIDTHS: Dict[str, int] = {'thumbnail': 320, 'mobile': 768, 'desktop': 1600}
+VARIANT_FORMATS: Dict[str, Dict[str, Any]] = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+ACCEPTED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+MANIFEST_NAME = 'manifest.json'
+DEFAULT_WORKERS = 2
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+class ImageUploadError(ValueError):
+    """The upload isn't an image this pipeline accepts."""
+
+
+class ImageProcessingUnavailable(RuntimeError):
+    """The encoding pool broke; the upload can be retried."""
+
+
+def get_executor() -> Executor:
+    """Return the process pool that encodes variants, starting it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=getattr(settings, 'LETTERS_IMAGE_WORKERS', None) or DEFAULT_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+    return _executor
+
+
+def _discard_executor(executor: Executor) -> None:
+    """Drop a broken pool so the next upload starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _open(data: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    # Apply the EXIF orientation before the metadata is dropped.
+    return ImageOps.exif_transpose(image)
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """Composite transparency onto white for formats without alpha."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def encode_variant(data: bytes, width: int, fmt: str) -> Tuple[bytes, int, int]:
+    """Resize an image to ``width`` and encode it without metadata (runs in a worker)."""
+    image = _open(data)
+    if width < image.width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.Resampling.LANCZOS)
+    options = VARIANT_FORMATS[fmt]
+    if options['format'] == 'JPEG':
+        image = _flatten(image)
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    out = io.BytesIO()
+    # No exif/icc arguments: Pillow writes no metadata unless asked to.
+    image.save(out, **options)
+    return out.getvalue(), image.width, image.height
+
+
+def encode_original(data: bytes, fmt: str) -> bytes:
+    """Re-encode the original at full size without metadata (runs in a worker)."""
+    image = _open(data)
+    out = io.BytesIO()
+    if fmt == 'JPEG':
+        _flatten(image).save(out, format='JPEG', quality=92, optimize=True)
+    else:
+        image.save(out, format=fmt)
+    return out.getvalue()
+
+
+def read_upload(upload: UploadedFile) -> Tuple[bytes, str]:
+    """Read an upload into memory and return it with its SHA-256 digest."""
+    limit = int(getattr(settings, 'LETTERS_IMAGE_MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+    if upload.size is not None and upload.size > limit:
+        raise ImageUploadError(f'Images may be at most {limit // (1024 * 1024)} MB.')
+    digest = hashlib.sha256()
+    buffer = io.BytesIO()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+        buffer.write(chunk)
+    return buffer.getvalue(), digest.hexdigest()
+
+
+def inspect_image(data: bytes) -> Tuple[str, int, int]:
+    """Return the format and (orientation-corrected) size of an image, or raise."""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            fmt = image.format or ''
+            image.verify()
+        image = _open(data)
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise ImageUploadError('Upload a valid JPEG, PNG, WebP or GIF image.') from exc
+    if fmt not in ACCEPTED_FORMATS:
+        raise ImageUploadError('Upload a valid JPEG, PNG, WebP or GIF image.')
+    return fmt, image.width, image.height
+
+
+def _variant_widths(width: int) -> Dict[str, int]:
+    """Target width per variant name, dropping variants that would upscale."""
+    widths: Dict[str, int] = {}
+    for name, target in VARIANT_WIDTHS.items():
+        actual = min(target, width)
+        if actual not in widths.values():
+            widths[name] = actual
+    return widths
+
+
+def _srcset(variants: List[Dict[str, Any]], fmt: str) -> str:
+    return ', '.join(f"{v['url']} {v['width']}w" for v in variants if v['format'] == fmt)
+
+
+def store_image(upload: UploadedFile) -> Tuple[Dict[str, Any], bool]:
+    """Store an upload with its variants; return the block content and whether it was new."""
+    data, digest = read_upload(upload)
+    directory = f'images/{digest[:2]}/{digest}'
+    manifest_path = f'{directory}/{MANIFEST_NAME}'
+    if default_storage.exists(manifest_path):
+        with default_storage.open(manifest_path) as manifest:
+            return json.loads(manifest.read()), False
+
+    fmt, width, height = inspect_image(data)
+    original_fmt = 'PNG' if fmt in ('PNG', 'GIF') else 'JPEG'
+    executor = get_executor()
+    try:
+        original_job = executor.submit(encode_original, data, original_fmt)
+        jobs = {
+            (name, variant_fmt): executor.submit(encode_variant, data, target, variant_fmt)
+            for name, target in _variant_widths(width).items()
+            for variant_fmt in VARIANT_FORMATS
+        }
+        original = original_job.result()
+        encoded = {key: job.result() for key, job in jobs.items()}
+    except BrokenProcessPool as exc:
+        # A worker died (e.g. killed for memory); every pending job fails with it.
+        _discard_executor(executor)
+        raise ImageProcessingUnavailable('Image processing is temporarily unavailable; try again.') from exc
+
+    original_url = _save(f'{directory}/original.{original_fmt.lower()}', original)
+    variants: List[Dict[str, Any]] = []
+    for (name, variant_fmt), (variant, variant_width, _) in encoded.items():
+        variants.append({
+            'format': variant_fmt,
+            'width': variant_width,
+            'url': _save(f'{directory}/{name}.{variant_fmt}', variant),
+        })
+
+    fallback = max((v for v in variants if v['format'] == 'jpeg'), key=lambda v: v['width'])
+    content = {
+        'url': fallback['url'],
+        'original_url': original_url,
+        'width': width,
+        'height': height,
+        'hash': digest,
+        'srcset': {fmt_name: _srcset(variants, fmt_name) for fmt_name in VARIANT_FORMATS},
+    }
+    _save(manifest_path, json.dumps(content).encode('utf-8'))
+    return content, True
+
+
+def _save(path: str, content: bytes) -> str:
+    """Store ``content`` at exactly ``path`` and return its URL.
+
+    A concurrent upload of the same image may write ``path`` between the
+    existence check and the save, in which case the storage picks another
+    name; that copy is dropped since the file at ``path`` holds the same bytes.
+    """
+    if not default_storage.exists(path):
+        saved = default_storage.save(path, ContentFile(content))
+        if saved != path:
+            default_storage.delete(saved)
+    return default_storage.url(path)
@@ -0,0 +1,275 @@
+"""Django management command running a repeatable load benchmark of the API."""
+import http.cookiejar
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from letters.models import Letter, LetterType, User
+
+
+SCENARIOS = ['public', 'list', 'create', 'update']
+EXTRA_SCENARIOS = ['health']
+BENCH_TITLE = 'Bench letter'
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class InProcessTransport:
+    """Issues requests through Django's test client and counts SQL queries."""
+
+    counts_queries = True
+
+    def __init__(self, staff: Optional[User]) -> None:
+        host = next((h for h in settings.ALLOWED_HOSTS if h not in ('*', '')), 'localhost').lstrip('.')
+        self.client = Client(SERVER_NAME=host, raise_request_exception=False)
+        if staff is not None:
+            self.client.force_login(staff)
+
+    def request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Tuple[int, int, bytes]:
+        queries = 0
+
+        def count(execute: Callable[..., Any], sql: str, params: Any, many: bool, context: Any) -> Any:
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        send = getattr(self.client, method.lower())
+        with connection.execute_wrapper(count):
+            if body is None:
+                response = send(path)
+            else:
+                response = send(path, body, content_type='application/json')
+        return response.status_code, queries, response.content
+
+
+class HTTPTransport:
+    """Issues requests against a running server, logged in with a session cookie."""
+
+    counts_queries = False
+
+    def __init__(self, base_url: str, credentials: Optional[Tuple[str, str]]) -> None:
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+        if credentials is not None:
+            status, _, _ = self.request('POST', '/api/auth/login/', {'username': credentials[0], 'password': credentials[1]})
+            if status != 200:
+                raise CommandError(f"Login as '{credentials[0]}' failed with HTTP {status}.")
+
+    def request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Tuple[int, int, bytes]:
+        headers = {'Content-Type': 'application/json', 'Referer': self.base_url + '/'}
+        csrf = next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), None)
+        if csrf:
+            headers['X-CSRFToken'] = csrf
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with self.opener.open(request) as response:
+                return response.status, 0, response.read()
+        except urllib.error.HTTPError as exc:
+            return exc.code, 0, exc.read()
+
+
+class Command(BaseCommand):
+    """Drive the public view, admin list, create and update endpoints with concurrent clients."""
+
+    help = "Benchmarks API endpoints and reports throughput, latency percentiles and queries per request as JSON"
+
+    def add_arguments(self, parser: Any) -> None:
+        """Add command arguments."""
+        parser.add_argument(
+            '--scenario',
+            nargs='+',
+            choices=SCENARIOS + EXTRA_SCENARIOS,
+            default=SCENARIOS,
+            help='Scenarios to run (default: %s)' % ' '.join(SCENARIOS),
+        )
+        parser.add_argument('--requests', type=int, default=500, help='Requests per scenario (default: 500)')
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            nargs='+',
+            default=[4],
+            help='Concurrent clients; several values run each scenario at each level (default: 4)',
+        )
+        parser.add_argument('--blocks', type=int, default=10, help='Blocks per created/updated letter (default: 10)')
+        parser.add_argument(
+            '--url',
+            type=str,
+            default=None,
+            help='Base URL of a running server; omit to run in-process with query counting',
+        )
+        parser.add_argument('--username', type=str, default=None, help='Staff username for admin scenarios')
+        parser.add_argument('--password', type=str, default=None, help='Password for --username (with --url)')
+        parser.add_argument('--keep', action='store_true', help='Keep letters created by the benchmark')
+        parser.add_argument('--output', type=str, default=None, help='Also write the JSON report to this file')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for request selection')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Execute the command."""
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.local = threading.local()
+        self.staff = self.get_staff(options['username'])
+        self.letter_type = LetterType.objects.order_by('name').first()
+        if self.letter_type is None and {'create', 'update'} & set(options['scenario']):
+            raise CommandError("No letter types exist; run 'manage.py seed_letters' first.")
+        self.public_slugs = list(
+            Letter.objects.filter(is_published=True).order_by('?').values_list('slug', flat=True)[:1000]
+        )
+        if 'public' in options['scenario'] and not self.public_slugs:
+            raise CommandError("No published letters exist; run 'manage.py seed_letters' first.")
+
+        self.created_ids: List[str] = []
+        self.created_lock = threading.Lock()
+        report: Dict[str, Any] = {
+            'mode': 'http' if options['url'] else 'in-process',
+            'database': connection.vendor,
+            'runs': [],
+        }
+        try:
+            for concurrency in options['concurrency']:
+                report['runs'].append({
+                    'concurrency': concurrency,
+                    'scenarios': {
+                        scenario: self.run_scenario(scenario, concurrency) for scenario in options['scenario']
+                    },
+                })
+        finally:
+            if self.created_ids and not options['keep']:
+                Letter.objects.filter(pk__in=self.created_ids).delete()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+        self.stdout.write(output)
+
+    def get_staff(self, username: Optional[str]) -> Optional[User]:
+        staff = User.objects.filter(is_staff=True)
+        if username:
+            staff = staff.filter(username=username)
+        return staff.order_by('date_joined').first()
+
+    def transport(self, admin: bool) -> Any:
+        """Return this thread's transport, logging in once for admin scenarios."""
+        key = 'admin' if admin else 'anonymous'
+        transport = getattr(self.local, key, None)
+        if transport is None:
+            if self.options['url']:
+                credentials = (self.options['username'], self.options['password']) if admin else None
+                if admin and not all(credentials or ()):
+                    raise CommandError('--username and --password are required for admin scenarios with --url.')
+                transport = HTTPTransport(self.options['url'], credentials)
+            else:
+                if admin and self.staff is None:
+                    raise CommandError('No staff user exists for the admin scenarios.')
+                transport = InProcessTransport(self.staff if admin else None)
+            setattr(self.local, key, transport)
+        return transport
+
+    def letter_payload(self, index: int) -> Dict[str, Any]:
+        return {
+            'title': BENCH_TITLE,
+            'description': 'Created by manage.py bench',
+            'recipient_name': f'Recipient {index}',
+            'letter_type_id': str(self.letter_type.pk) if self.letter_type else None,
+            'custom_properties': {},
+            'is_published': True,
+            'content_blocks': [
+                {'block_type': 'text', 'order': order, 'content': {'text': f'Block {order} of request {index}'}}
+                for order in range(self.options['blocks'])
+            ],
+        }
+
+    def prepare_update_targets(self, concurrency: int) -> List[str]:
+        """Create one letter per client so concurrent updates don't contend on a row."""
+        transport = self.transport(admin=True)
+        targets = []
+        for index in range(concurrency):
+            status, _, body = transport.request('POST', '/api/admin/letters/', self.letter_payload(index))
+            if status != 201:
+                raise CommandError(f"Could not create update targets (HTTP {status}): {body[:200]!r}")
+            targets.append(json.loads(body)['id'])
+        self.created_ids.extend(targets)
+        return targets
+
+    def run_scenario(self, scenario: str, concurrency: int) -> Dict[str, Any]:
+        targets = self.prepare_update_targets(concurrency) if scenario == 'update' else []
+        worker_ids = threading.local()
+        worker_counter = iter(range(10**9))
+        counter_lock = threading.Lock()
+
+        def one_request(index: int) -> Tuple[float, int, Optional[int]]:
+            if not hasattr(worker_ids, 'id'):
+                with counter_lock:
+                    worker_ids.id = next(worker_counter)
+            if scenario == 'public':
+                transport = self.transport(admin=False)
+                method, path, body = 'GET', f'/api/letters/{self.rng.choice(self.public_slugs)}/', None
+            elif scenario == 'health':
+                transport = self.transport(admin=False)
+                method, path, body = 'GET', '/api/health/', None
+            elif scenario == 'list':
+                transport = self.transport(admin=True)
+                method, path, body = 'GET', '/api/admin/letters/', None
+            elif scenario == 'create':
+                transport = self.transport(admin=True)
+                method, path, body = 'POST', '/api/admin/letters/', self.letter_payload(index)
+            else:
+                transport = self.transport(admin=True)
+                target = targets[worker_ids.id % len(targets)]
+                payload = self.letter_payload(index)
+                payload.pop('letter_type_id')
+                method, path, body = 'PATCH', f'/api/admin/letters/{target}/', payload
+
+            started = time.perf_counter()
+            status, queries, content = transport.request(method, path, body)
+            elapsed = time.perf_counter() - started
+            if scenario == 'create' and status == 201:
+                with self.created_lock:
+                    self.created_ids.append(json.loads(content)['id'])
+            return elapsed, status, queries if transport.counts_queries else None
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one_request, range(self.options['requests'])))
+        duration = time.perf_counter() - started
+
+        latencies = sorted(elapsed * 1000 for elapsed, _, _ in results)
+        errors = sum(1 for _, status, _ in results if status >= 400)
+        queries = [count for _, _, count in results if count is not None]
+        return {
+            'requests': len(results),
+            'errors': errors,
+            'duration_s': round(duration, 3),
+            'throughput_rps': round(len(results) / duration, 1) if duration else None,
+            'latency_ms': {
+                'mean': round(statistics.fmean(latencies), 3),
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'max': round(latencies[-1], 3),
+            },
+            'queries_per_request': {
+                'mean': round(statistics.fmean(queries), 2),
+                'max': max(queries),
+            } if queries else None,
+        }
@@ -0,0 +1,97 @@
+"""Django management command comparing the DRF and pydantic serialization engines."""
+import timeit
+from datetime import timedelta
+from typing import Any, Callable, List
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from letters.models import ContentBlock, Letter, LetterType, User
+from letters.serialization import render_letter, render_public_letter
+
+
+def build_letter(block_count: int) -> Letter:
+    """Build an unsaved letter with ``block_count`` blocks, as if fully prefetched."""
+    now = timezone.now()
+    letter_type = LetterType(
+        name='Christmas', slug='christmas', description='Festive letters',
+        meta_schema={'type': 'object', 'properties': {'year': {'type': 'integer'}}},
+        created_at=now, updated_at=now,
+    )
+    user = User(username='santa', email='santa@example.com', is_staff=True)
+    letter = Letter(
+        title='Merry Christmas', slug='merry-christmas', description='Season’s greetings',
+        recipient_name='Rudolph', letter_type=letter_type, created_by=user,
+        custom_properties={'year': 2026, 'family': 'smith'},
+        is_published=True, published_at=now, created_at=now, updated_at=now,
+    )
+    block_kinds = [
+        ('text', {'text': 'Dear Rudolph, ' + 'ho ' * 40}),
+        ('image', {'url': '/media/sleigh.jpg', 'caption': 'The sleigh'}),
+        ('rich_text', {'html': '<p>Thank you for <strong>everything</strong>.</p>'}),
+    ]
+    blocks = []
+    for order in range(block_count):
+        block_type, content = block_kinds[order % len(block_kinds)]
+        blocks.append(ContentBlock(
+            letter=letter, block_type=block_type, order=order, content=content,
+            created_at=now + timedelta(microseconds=order), updated_at=now,
+        ))
+    set_prefetched_blocks(letter, blocks)
+    return letter
+
+
+def set_prefetched_blocks(letter: Letter, blocks: List[ContentBlock]) -> None:
+    """Fill an unsaved ``letter.content_blocks`` as if it had been prefetched with ``blocks``.
+
+    Unsaved letters can't use ``prefetch_related_objects()``, so this sets the
+    prefetch cache Django would have built; only this benchmark needs it.
+    """
+    prefetched = ContentBlock.objects.none()
+    prefetched._result_cache = blocks
+    prefetched._prefetch_done = True  # type: ignore[attr-defined]
+    letter._prefetched_objects_cache = {'content_blocks': prefetched}  # type: ignore[attr-defined]
+
+
+class Command(BaseCommand):
+    """Benchmark letter rendering with both serialization engines."""
+
+    help = "Compares DRF and pydantic rendering of letters with 1, 50 and 500 blocks"
+
+    def add_arguments(self, parser: Any) -> None:
+        """Add command arguments."""
+        parser.add_argument(
+            '--blocks',
+            type=int,
+            nargs='+',
+            default=[1, 50, 500],
+            help='Block counts to benchmark (default: 1 50 500)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timing rounds per case; the best round is reported (default: 5)',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Execute the command."""
+        renderers: dict[str, Callable[[Letter, str], bytes]] = {
+            'public': render_public_letter,
+            'admin': render_letter,
+        }
+        self.stdout.write(f"{'view':<8}{'blocks':>8}{'drf ms':>12}{'pydantic ms':>14}{'speedup':>10}")
+        for block_count in options['blocks']:
+            letter = build_letter(block_count)
+            for view, render in renderers.items():
+                if render(letter, 'drf') != render(letter, 'pydantic'):
+                    raise CommandError(f"Engines disagree for the {view} view with {block_count} blocks")
+                timings = {}
+                for engine in ('drf', 'pydantic'):
+                    number = max(1, 2000 // (block_count + 10))
+                    best = min(timeit.repeat(lambda: render(letter, engine), number=number, repeat=options['repeat']))
+                    timings[engine] = best / number * 1000
+                self.stdout.write(
+                    f"{view:<8}{block_count:>8}{timings['drf']:>12.3f}{timings['pydantic']:>14.3f}"
+                    f"{timings['drf'] / timings['pydantic']:>9.1f}x"
+                )
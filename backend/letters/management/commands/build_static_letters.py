@@ -0,0 +1,91 @@
+"""Django management command to pre-generate the static public letter files."""
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, List, Set, Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from letters import snapshots, static_letters
+from letters.models import Letter
+
+
+class Command(BaseCommand):
+    """Write every published letter's JSON (plain, gzip and brotli) for nginx to serve."""
+
+    help = "Rebuilds the static files of all published letters and removes those of the rest"
+
+    def add_arguments(self, parser: Any) -> None:
+        """Add command arguments."""
+        parser.add_argument(
+            '--output',
+            help='Output directory (default: LETTERS_STATIC_ROOT)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'LETTERS_STATIC_WORKERS', 0),
+            help='Compression processes (default: LETTERS_STATIC_WORKERS, 0 = CPU count)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Letters handed to a worker at a time (default: 200)',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Execute the command."""
+        root = Path(options['output']) if options['output'] else static_letters.get_root()
+        if root is None:
+            raise CommandError('Set LETTERS_STATIC_ROOT or pass --output.')
+        root.mkdir(parents=True, exist_ok=True)
+        if static_letters.brotli is None:
+            self.stderr.write(self.style.WARNING('brotli is not installed; skipping .json.br files.'))
+
+        started = time.time()
+        # Letters published before snapshots existed get one first.
+        snapshots.refresh_snapshots(
+            Letter.objects.filter(is_published=True, public_snapshot__isnull=True).values_list('pk', flat=True)
+        )
+        published = (
+            Letter.objects.filter(is_published=True, public_snapshot__isnull=False)
+            .order_by('pk')
+            .values_list('slug', 'public_snapshot')
+        )
+
+        written: Set[str] = set()
+        workers = options['workers'] or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Each pending batch holds its snapshots; keep about two per worker
+            # queued instead of reading the whole table ahead of the workers.
+            jobs: Deque['Future[List[str]]'] = deque()
+            batch: List[Tuple[str, str]] = []
+            for slug, snapshot in published.iterator(chunk_size=options['batch_size']):
+                if snapshot is None:
+                    continue
+                batch.append((slug, snapshot))
+                if len(batch) >= options['batch_size']:
+                    jobs.append(executor.submit(static_letters.write_batch, str(root), batch))
+                    batch = []
+                    if len(jobs) >= 2 * workers:
+                        written.update(jobs.popleft().result())
+            if batch:
+                jobs.append(executor.submit(static_letters.write_batch, str(root), batch))
+            while jobs:
+                written.update(jobs.popleft().result())
+
+        # Files written since the build started belong to letters published
+        # meanwhile (by the on-commit sync), not to stale ones.
+        removed = 0
+        for slug in static_letters.stored_slugs(root, before=started):
+            if slug not in written:
+                static_letters.remove_letter(root, slug)
+                removed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(written)} letters to {root} ({workers} workers), removed {removed} stale."
+        ))
@@ -0,0 +1,42 @@
+"""Django management command to export letters as NDJSON."""
+import sys
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from letters.transfer import DEFAULT_CHUNK_SIZE, export_letters
+
+
+class Command(BaseCommand):
+    """Write every letter, with its type and blocks, as one JSON object per line."""
+
+    help = "Exports letters as NDJSON (one letter with its blocks per line)"
+
+    def add_arguments(self, parser: Any) -> None:
+        """Add command arguments."""
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='-',
+            help='File to write to (default: stdout)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Letters fetched per database round trip (default: {DEFAULT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Execute the command."""
+        output = options['output']
+        stream = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        count = 0
+        try:
+            for line in export_letters(chunk_size=options['chunk_size']):
+                stream.write(line)
+                count += 1
+        finally:
+            if stream is not sys.stdout.buffer:
+                stream.close()
+        self.stderr.write(self.style.SUCCESS(f"Exported {count} letters."))
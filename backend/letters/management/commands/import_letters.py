@@ -0,0 +1,55 @@
+"""Django management command to import letters from NDJSON."""
+import sys
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from letters.models import User
+from letters.transfer import DEFAULT_CHUNK_SIZE, import_letters
+
+
+class Command(BaseCommand):
+    """Import letters written by export_letters (or the export endpoint)."""
+
+    help = "Imports letters from NDJSON in chunked bulk transactions"
+
+    def add_arguments(self, parser: Any) -> None:
+        """Add command arguments."""
+        parser.add_argument(
+            'path',
+            type=str,
+            help='NDJSON file to read, or - for stdin',
+        )
+        parser.add_argument(
+            '--user',
+            type=str,
+            required=True,
+            help='Username that owns letters whose author does not exist here',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Letters written per transaction (default: {DEFAULT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Execute the command."""
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        path = options['path']
+        stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        try:
+            result = import_letters(stream, default_user=user, chunk_size=options['chunk_size'])
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+        for error in result.errors:
+            self.stderr.write(self.style.WARNING(error))
+        self.stdout.write(
+            self.style.SUCCESS(f"Imported {result.created} letters ({result.skipped} skipped).")
+        )
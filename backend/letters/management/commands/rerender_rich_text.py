@@ -0,0 +1,60 @@
+"""Django management command to re-render rich_text blocks after sanitizer changes."""
+from typing import Any, List
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from letters import richtext, search, snapshots
+from letters.models import ContentBlock, Letter
+from letters.signals import invalidate_public_cache
+
+
+class Command(BaseCommand):
+    """Re-render every rich_text block stored by an older sanitizer version."""
+
+    help = "Re-renders stale rich_text blocks and refreshes the affected letter snapshots"
+
+    def add_arguments(self, parser: Any) -> None:
+        """Add command arguments."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Blocks updated per transaction (default: 500)',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Execute the command."""
+        stale = (
+            ContentBlock.objects.filter(block_type='rich_text')
+            # A missing key compares as NULL, so it needs its own condition.
+            .filter(
+                Q(content__sanitizer_version__isnull=True)
+                | ~Q(content__sanitizer_version=richtext.SANITIZER_VERSION)
+            )
+            .only('id', 'letter_id', 'block_type', 'content')
+            .order_by('id')
+        )
+        total = 0
+        batch: List[ContentBlock] = []
+        for block in stale.iterator(chunk_size=options['batch_size']):
+            batch.append(block)
+            if len(batch) >= options['batch_size']:
+                total += self.rerender(batch)
+                batch = []
+        if batch:
+            total += self.rerender(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-rendered {total} rich_text blocks (sanitizer version {richtext.SANITIZER_VERSION})."
+        ))
+
+    def rerender(self, blocks: List[ContentBlock]) -> int:
+        """Re-render one batch and refresh the snapshots of the letters it touches."""
+        letter_ids = {block.letter_id for block in blocks}
+        with transaction.atomic():
+            updated = snapshots.rerender_stale_blocks(blocks)
+            snapshots.refresh_snapshots(letter_ids)
+            search.schedule_reindex(letter_ids)
+            invalidate_public_cache(Letter.objects.filter(pk__in=letter_ids).values_list('slug', flat=True))
+        return len(updated)
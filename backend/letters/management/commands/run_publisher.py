@@ -0,0 +1,72 @@
+"""Django management command running the scheduled letter publisher."""
+import logging
+import signal
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+
+from letters import publisher
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Publish scheduled letters as their ``published_at`` comes (see ``letters.publisher``)."""
+
+    help = "Publishes drafts whose published_at has passed, polling until stopped"
+
+    def add_arguments(self, parser: Any) -> None:
+        """Add command arguments."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Letters claimed per transaction (default: 100)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds between polls while nothing is due (default: 1.0)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Publish everything due now and exit',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Execute the command."""
+        self.stopping = False
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        total = 0
+        while not self.stopping:
+            close_old_connections()
+            try:
+                slugs = publisher.publish_due(options['batch_size'])
+            except DatabaseError:
+                if options['once']:
+                    raise
+                logger.exception('Publishing scheduled letters failed; retrying')
+                slugs = []
+            total += len(slugs)
+            if slugs:
+                self.stdout.write(f"Published {len(slugs)} letters: {', '.join(slugs)}")
+            # A full batch means more may be due right away.
+            if len(slugs) >= options['batch_size']:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Published {total} letters."))
+
+    def stop(self, signum: int, frame: Any) -> None:
+        """Finish the current batch, then exit."""
+        self.stopping = True
@@ -0,0 +1,148 @@
+"""Django management command to bulk-generate synthetic letters for load testing."""
+import random
+import secrets
+from typing import Any, Dict, List
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.text import slugify
+
+from letters import properties, richtext, search, snapshots
+from letters.models import ContentBlock, Letter, LetterType, User
+
+
+TITLES = [
+    'Merry Christmas', 'Happy Holidays', 'Season’s Greetings', 'Happy New Year',
+    'Thank You', 'Happy Birthday', 'Thinking of You', 'Warm Wishes',
+]
+RECIPIENTS = ['Grandma', 'Grandpa', 'Mom', 'Dad', 'Aunt Rose', 'Uncle Joe', 'Sam', 'Alex', 'The Smiths']
+WORDS = (
+    'snow joy family warm cocoa lights tree gift laugh cookies sleigh star '
+    'winter cozy fire song peace hope love together year memory wish'
+).split()
+
+# Share of each block type; text dominates real letters.
+BLOCK_TYPE_WEIGHTS = {'text': 0.6, 'image': 0.2, 'rich_text': 0.2}
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(max(1, words))).capitalize() + '.'
+
+
+def paragraph(rng: random.Random) -> str:
+    # Log-normal paragraph length: mostly a few sentences, occasionally long.
+    sentences = max(1, int(rng.lognormvariate(1.2, 0.7)))
+    return ' '.join(sentence(rng, rng.randint(5, 18)) for _ in range(sentences))
+
+
+def block_content(rng: random.Random, block_type: str) -> Dict[str, Any]:
+    if block_type == 'image':
+        return {'url': f'/media/seed/{rng.randint(1, 500)}.jpg', 'caption': sentence(rng, rng.randint(2, 8))}
+    if block_type == 'rich_text':
+        return {'html': ''.join(f'<p>{paragraph(rng)}</p>' for _ in range(rng.randint(1, 4)))}
+    return {'text': paragraph(rng)}
+
+
+class Command(BaseCommand):
+    """Bulk-create letter types, letters and content blocks with realistic sizes."""
+
+    help = "Generates synthetic LetterType, Letter and ContentBlock rows for benchmarking"
+
+    def add_arguments(self, parser: Any) -> None:
+        """Add command arguments."""
+        parser.add_argument('--types', type=int, default=5, help='Letter types to create (default: 5)')
+        parser.add_argument('--letters', type=int, default=1000, help='Letters to create (default: 1000)')
+        parser.add_argument(
+            '--median-blocks',
+            type=float,
+            default=8,
+            help='Median blocks per letter; counts are log-normal with a long tail (default: 8)',
+        )
+        parser.add_argument('--max-blocks', type=int, default=500, help='Upper bound on blocks per letter (default: 500)')
+        parser.add_argument(
+            '--published-ratio',
+            type=float,
+            default=0.8,
+            help='Share of letters that are published (default: 0.8)',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Letters per transaction (default: 500)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible data')
+        parser.add_argument(
+            '--user',
+            type=str,
+            default='seed',
+            help='Username that owns the letters; created as staff if missing (default: seed)',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Execute the command."""
+        rng = random.Random(options['seed'])
+        run = secrets.token_hex(3) if options['seed'] is None else f"s{options['seed']}"
+        user, _ = User.objects.get_or_create(
+            username=options['user'],
+            defaults={'email': f"{options['user']}@example.com", 'is_staff': True},
+        )
+        letter_types = self.create_letter_types(options['types'], run)
+
+        created_letters = created_blocks = 0
+        batch_size = options['batch_size']
+        for start in range(0, options['letters'], batch_size):
+            count = min(batch_size, options['letters'] - start)
+            letters: List[Letter] = []
+            blocks: List[ContentBlock] = []
+            for index in range(start, start + count):
+                title = rng.choice(TITLES)
+                letter = Letter(
+                    title=title,
+                    slug=f"{slugify(title)}-{run}-{index}",
+                    description=sentence(rng, rng.randint(8, 30)),
+                    recipient_name=rng.choice(RECIPIENTS),
+                    letter_type=rng.choice(letter_types),
+                    custom_properties={'year': rng.randint(2015, 2026), 'family': rng.choice(RECIPIENTS)},
+                    created_by=user,
+                    is_published=rng.random() < options['published_ratio'],
+                )
+                letters.append(letter)
+                block_count = min(
+                    options['max_blocks'],
+                    max(1, int(rng.lognormvariate(0, 0.9) * options['median_blocks'])),
+                )
+                block_types = rng.choices(list(BLOCK_TYPE_WEIGHTS), list(BLOCK_TYPE_WEIGHTS.values()), k=block_count)
+                for order, block_type in enumerate(block_types):
+                    blocks.append(ContentBlock(
+                        letter=letter, block_type=block_type, order=order,
+                        content=richtext.prepare_content(block_type, block_content(rng, block_type)),
+                    ))
+
+            with transaction.atomic():
+                Letter.objects.bulk_create(letters)
+                ContentBlock.objects.bulk_create(blocks, batch_size=1000)
+                properties.index_letters(letters, created=True)
+                snapshots.refresh_snapshots([letter.pk for letter in letters if letter.is_published])
+                search.schedule_reindex(letter.pk for letter in letters)
+            created_letters += len(letters)
+            created_blocks += len(blocks)
+            self.stdout.write(f"  {created_letters}/{options['letters']} letters")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(letter_types)} letter types, {created_letters} letters and {created_blocks} blocks."
+        ))
+
+    def create_letter_types(self, count: int, run: str) -> List[LetterType]:
+        """Create ``count`` letter types with small meta schemas."""
+        letter_types = [
+            LetterType(
+                name=f'Seed {run} {index}',
+                slug=f'seed-{run}-{index}',
+                description='Synthetic letter type for benchmarking',
+                meta_schema={
+                    'type': 'object',
+                    'properties': {
+                        'year': {'type': 'integer', 'indexed': True},
+                        'family': {'type': 'string', 'indexed': True},
+                    },
+                },
+            )
+            for index in range(count)
+        ]
+        return LetterType.objects.bulk_create(letter_types)
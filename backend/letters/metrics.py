@@ -0,0 +1,96 @@
+"""Prometheus metrics, exposed in the text format at ``/api/metrics``.
+
+``ServerTimingMiddleware`` records every request's latency, status code and
+query count by view name (``letter-public``, ``letter-list``,
+``lettertype-detail``, ``login``, ...; ``unmatched`` for unrouted paths) and the
+public response cache counts its hits and misses.
+
+Under gunicorn each worker has its own memory, so set
+``PROMETHEUS_MULTIPROC_DIR`` to an empty directory: workers then write their
+samples to memory-mapped files there and ``/api/metrics`` adds them up,
+whichever worker serves the scrape. ``gunicorn.conf.py`` empties the directory
+when the server starts. Without the variable, metrics live in the process.
+"""
+import os
+from typing import Any, Tuple
+
+from django.http import HttpRequest, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+
+MULTIPROCESS_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR', '')
+if MULTIPROCESS_DIR:
+    # Management commands can run before gunicorn has created it.
+    os.makedirs(MULTIPROCESS_DIR, exist_ok=True)
+
+UNMATCHED = 'unmatched'
+# Any other method is counted as OTHER_METHOD, so made-up ones can't add series.
+METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+OTHER_METHOD = 'other'
+
+REQUEST_LATENCY = Histogram(
+    'letters_http_request_duration_seconds',
+    'Request latency by view',
+    ['view', 'method'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+RESPONSES = Counter(
+    'letters_http_responses',
+    'Responses by view and status code',
+    ['view', 'method', 'status'],
+)
+DB_QUERIES = Histogram(
+    'letters_db_queries_per_request',
+    'Database queries per request by view',
+    ['view'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+CACHE_LOOKUPS = Counter(
+    'letters_public_cache_lookups',
+    'Public letter cache lookups by result',
+    ['result'],
+)
+_CACHE_HIT = CACHE_LOOKUPS.labels(result='hit')
+_CACHE_MISS = CACHE_LOOKUPS.labels(result='miss')
+
+
+def view_label(request: HttpRequest) -> str:
+    """The URL name of the view that handled ``request``."""
+    match = request.resolver_match
+    return match.view_name if match is not None and match.view_name else UNMATCHED
+
+
+def observe_request(request: HttpRequest, response: HttpResponse, seconds: float, queries: int) -> None:
+    """Record one finished request."""
+    view = view_label(request)
+    method = request.method if request.method in METHODS else OTHER_METHOD
+    REQUEST_LATENCY.labels(view, method).observe(seconds)
+    RESPONSES.labels(view, method, str(response.status_code)).inc()
+    DB_QUERIES.labels(view).observe(queries)
+
+
+def cache_lookup(hit: bool) -> None:
+    """Count a public cache lookup."""
+    (_CACHE_HIT if hit else _CACHE_MISS).inc()
+
+
+def get_registry() -> Any:
+    """The registry to expose: every worker's files, or this process's metrics."""
+    if not MULTIPROCESS_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)  # type: ignore[no-untyped-call]  # unannotated upstream
+    return registry
+
+
+def exposition() -> Tuple[bytes, str]:
+    """Return the metrics page and its content type."""
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('letters', '0002_alter_letter_custom_properties_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='letter',
+            name='public_snapshot',
+            field=models.TextField(blank=True, editable=False, help_text='Rendered public JSON, regenerated whenever a published letter changes', null=True),
+        ),
+    ]
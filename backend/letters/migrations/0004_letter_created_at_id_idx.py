@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('letters', '0003_letter_public_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='letter',
+            index=models.Index(fields=['-created_at', '-id'], name='letter_created_at_id_idx'),
+        ),
+    ]
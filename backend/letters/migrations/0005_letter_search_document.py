@@ -0,0 +1,180 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:37
+
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, List, Tuple
+
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations.state import StateApps
+import django.db.models.deletion
+
+
+# Frozen copies of the search helpers, so later changes to them don't alter this migration.
+SEARCHED_BLOCK_TYPES = ('text', 'rich_text')
+TEXT_BLOCK_TAGS = {'p', 'div', 'ul', 'ol', 'li', 'blockquote', 'h1', 'h2', 'h3', 'h4', 'pre', 'br'}
+SKIPPED_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'svg', 'math', 'head', 'title'}
+
+
+SQLITE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE letters_search_fts USING fts5(
+        title, recipient_name, description, body,
+        content='letters_lettersearchdocument',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER letters_search_ai AFTER INSERT ON letters_lettersearchdocument BEGIN
+        INSERT INTO letters_search_fts(rowid, title, recipient_name, description, body)
+        VALUES (new.rowid, new.title, new.recipient_name, new.description, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER letters_search_ad AFTER DELETE ON letters_lettersearchdocument BEGIN
+        INSERT INTO letters_search_fts(letters_search_fts, rowid, title, recipient_name, description, body)
+        VALUES ('delete', old.rowid, old.title, old.recipient_name, old.description, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER letters_search_au AFTER UPDATE ON letters_lettersearchdocument BEGIN
+        INSERT INTO letters_search_fts(letters_search_fts, rowid, title, recipient_name, description, body)
+        VALUES ('delete', old.rowid, old.title, old.recipient_name, old.description, old.body);
+        INSERT INTO letters_search_fts(rowid, title, recipient_name, description, body)
+        VALUES (new.rowid, new.title, new.recipient_name, new.description, new.body);
+    END
+    """,
+]
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS letters_search_au',
+    'DROP TRIGGER IF EXISTS letters_search_ad',
+    'DROP TRIGGER IF EXISTS letters_search_ai',
+    'DROP TABLE IF EXISTS letters_search_fts',
+]
+POSTGRESQL_INDEX = [
+    """
+    ALTER TABLE letters_lettersearchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', title), 'A')
+        || setweight(to_tsvector('english', recipient_name), 'A')
+        || setweight(to_tsvector('english', description), 'B')
+        || setweight(to_tsvector('english', body), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX letters_search_vector_gin ON letters_lettersearchdocument USING GIN (search_vector)',
+]
+POSTGRESQL_DROP = [
+    'DROP INDEX IF EXISTS letters_search_vector_gin',
+    'ALTER TABLE letters_lettersearchdocument DROP COLUMN IF EXISTS search_vector',
+]
+
+
+class _TextExtractor(HTMLParser):
+    """Collect the text of an HTML fragment, one line per block element."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.pieces: List[str] = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Any]]) -> None:
+        if tag in SKIPPED_TAGS:
+            self.skipping += 1
+        elif tag in TEXT_BLOCK_TAGS:
+            self.pieces.append('\n')
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in SKIPPED_TAGS:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in TEXT_BLOCK_TAGS:
+            self.pieces.append('\n')
+
+    def handle_data(self, data: str) -> None:
+        if not self.skipping:
+            self.pieces.append(data)
+
+
+def html_text(html: str) -> str:
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    lines = (re.sub(r'\s+', ' ', line).strip() for line in ''.join(parser.pieces).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def block_text(block_type: str, content: Any) -> str:
+    # Blocks saved before rich_text was pre-rendered only have their html.
+    if block_type not in SEARCHED_BLOCK_TYPES or not isinstance(content, dict):
+        return ''
+    text = content.get('text')
+    if isinstance(text, str):
+        return text
+    html = content.get('html')
+    return html_text(html) if block_type == 'rich_text' and isinstance(html, str) else ''
+
+
+def document_body(blocks: Iterable[Tuple[str, Any]]) -> str:
+    return '\n\n'.join(text for text in (block_text(*block) for block in blocks) if text)
+
+
+def _run(schema_editor: BaseDatabaseSchemaEditor, statements: Dict[str, List[str]]) -> None:
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_index(apps: StateApps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    """Add the backend's full-text index over the search documents."""
+    _run(schema_editor, {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRESQL_INDEX})
+
+
+def drop_index(apps: StateApps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    _run(schema_editor, {'sqlite': SQLITE_DROP, 'postgresql': POSTGRESQL_DROP})
+
+
+def index_existing_letters(apps: StateApps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    """Build a search document for every existing letter."""
+    Letter = apps.get_model('letters', 'Letter')
+    ContentBlock = apps.get_model('letters', 'ContentBlock')
+    LetterSearchDocument = apps.get_model('letters', 'LetterSearchDocument')
+    letters = list(Letter.objects.values_list('id', 'title', 'recipient_name', 'description'))
+    for start in range(0, len(letters), 500):
+        chunk = letters[start:start + 500]
+        blocks: Dict[Any, List[Tuple[str, Any]]] = {}
+        rows = (
+            ContentBlock.objects.filter(letter_id__in=[row[0] for row in chunk], block_type__in=SEARCHED_BLOCK_TYPES)
+            .order_by('order').values_list('letter_id', 'block_type', 'content')
+        )
+        for letter_id, block_type, content in rows:
+            blocks.setdefault(letter_id, []).append((block_type, content))
+        LetterSearchDocument.objects.bulk_create([
+            LetterSearchDocument(
+                letter_id=letter_id,
+                title=title,
+                recipient_name=recipient_name,
+                description=description,
+                body=document_body(blocks.get(letter_id, [])),
+            )
+            for letter_id, title, recipient_name, description in chunk
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('letters', '0004_letter_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LetterSearchDocument',
+            fields=[
+                ('letter', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='letters.letter')),
+                ('title', models.TextField()),
+                ('recipient_name', models.TextField()),
+                ('description', models.TextField()),
+                ('body', models.TextField(blank=True, help_text="Text of the letter's text and rich_text blocks")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_index, drop_index),
+        migrations.RunPython(index_existing_letters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:41
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations.state import StateApps
+import django.db.models.deletion
+
+
+def add_custom_properties_gin(apps: StateApps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    """GIN index for containment (``@>``) lookups on custom_properties, PostgreSQL only."""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX letter_custom_properties_gin ON letters_letter '
+            'USING GIN (custom_properties jsonb_path_ops)'
+        )
+
+
+def drop_custom_properties_gin(apps: StateApps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS letter_custom_properties_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('letters', '0005_letter_search_document'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='letter',
+            index=models.Index(fields=['created_by', '-created_at'], name='letter_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='letter',
+            index=models.Index(fields=['letter_type', '-created_at'], name='letter_type_created_idx'),
+        ),
+        # The composites above lead with these columns; drop their own indexes.
+        migrations.AlterField(
+            model_name='letter',
+            name='created_by',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='letters', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='letter',
+            name='letter_type',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='letters', to='letters.lettertype'),
+        ),
+        migrations.RunPython(add_custom_properties_gin, drop_custom_properties_gin),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:44
+
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations.state import StateApps
+import django.db.models.deletion
+
+
+# Frozen copies of the property helpers, so later changes to them don't alter this migration.
+MAX_TEXT_LENGTH = 255
+COLUMNS = {
+    'string': 'value_text',
+    'integer': 'value_number',
+    'number': 'value_number',
+    'boolean': 'value_bool',
+}
+
+
+def _json_type(spec: Dict[str, Any]) -> Optional[str]:
+    json_type = spec.get('type')
+    if json_type is None and spec.get('enum'):
+        values = spec['enum']
+        if all(isinstance(value, bool) for value in values):
+            return 'boolean'
+        if all(isinstance(value, str) for value in values):
+            return 'string'
+        if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+            return 'number'
+    return json_type if isinstance(json_type, str) else None
+
+
+def indexed_properties(meta_schema: Any) -> Dict[str, str]:
+    properties = meta_schema.get('properties') if isinstance(meta_schema, dict) else None
+    if not isinstance(properties, dict):
+        return {}
+    columns = {}
+    for key, spec in properties.items():
+        json_type = _json_type(spec) if isinstance(spec, dict) and spec.get('indexed') is True else None
+        if json_type is not None and json_type in COLUMNS:
+            columns[key] = COLUMNS[json_type]
+    return columns
+
+
+def _column_value(column: str, value: Any) -> Any:
+    if column == 'value_bool':
+        return value if isinstance(value, bool) else None
+    if column == 'value_number':
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+            return float(value)
+        return None
+    return value if isinstance(value, str) and len(value) <= MAX_TEXT_LENGTH else None
+
+
+def property_values(columns: Dict[str, str], custom_properties: Any) -> List[Tuple[str, str, Any]]:
+    """``(key, column, value)`` for the indexed values of one letter's properties."""
+    if not isinstance(custom_properties, dict):
+        return []
+    values = ((key, column, _column_value(column, custom_properties.get(key))) for key, column in columns.items())
+    return [(key, column, value) for key, column, value in values if value is not None]
+
+
+def index_existing_properties(apps: StateApps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    """Copy the indexed custom property values of existing letters."""
+    Letter = apps.get_model('letters', 'Letter')
+    LetterType = apps.get_model('letters', 'LetterType')
+    LetterPropertyValue = apps.get_model('letters', 'LetterPropertyValue')
+    for type_id, meta_schema in LetterType.objects.values_list('id', 'meta_schema'):
+        columns = indexed_properties(meta_schema)
+        if not columns:
+            continue
+        rows: List[Any] = []
+        for letter_id, custom_properties in (
+            Letter.objects.filter(letter_type_id=type_id).values_list('id', 'custom_properties').iterator()
+        ):
+            rows.extend(
+                LetterPropertyValue(letter_id=letter_id, key=key, **{column: value})
+                for key, column, value in property_values(columns, custom_properties)
+            )
+            if len(rows) >= 500:
+                LetterPropertyValue.objects.bulk_create(rows)
+                rows = []
+        LetterPropertyValue.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('letters', '0006_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LetterPropertyValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('value_text', models.CharField(blank=True, max_length=255, null=True)),
+                ('value_number', models.FloatField(blank=True, null=True)),
+                ('value_bool', models.BooleanField(blank=True, null=True)),
+                ('letter', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='property_values', to='letters.letter')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'value_text', 'letter'], name='letter_property_text_idx'), models.Index(fields=['key', 'value_number', 'letter'], name='letter_property_number_idx'), models.Index(fields=['key', 'value_bool', 'letter'], name='letter_property_bool_idx')],
+                'unique_together': {('letter', 'key')},
+            },
+        ),
+        migrations.RunPython(index_existing_properties, migrations.RunPython.noop),
+    ]
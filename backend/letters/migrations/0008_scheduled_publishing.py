@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:46
+
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations.state import StateApps
+from django.utils import timezone
+
+
+def clear_past_draft_times(apps: StateApps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    """Drafts with a past published_at were unpublished, not scheduled; don't publish them now."""
+    Letter = apps.get_model('letters', 'Letter')
+    Letter.objects.filter(is_published=False, published_at__lte=timezone.now()).update(published_at=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('letters', '0007_letter_property_value'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_past_draft_times, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='letter',
+            name='published_at',
+            field=models.DateTimeField(blank=True, help_text='When the letter went live; a draft with a time set is published then by run_publisher', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='letter',
+            index=models.Index(condition=models.Q(('is_published', False), ('published_at__isnull', False)), fields=['published_at'], name='letter_scheduled_idx'),
+        ),
+    ]
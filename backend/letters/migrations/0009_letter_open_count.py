@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('letters', '0008_scheduled_publishing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LetterOpenCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='Start of the hour (UTC)')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('letter', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='open_counts', to='letters.letter')),
+            ],
+            options={
+                'unique_together': {('letter', 'hour')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:02
+
+from django.db import migrations
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations.state import StateApps
+from django.utils import timezone
+
+
+def drop_rich_text_source_from_snapshots(apps: StateApps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    """Rebuild snapshots that still carry rich_text ``html``, and give their letters new validators.
+
+    A cleared snapshot is rendered again on the letter's next public read;
+    touching the blocks changes the ETag so clients don't keep the old body.
+    """
+    Letter = apps.get_model('letters', 'Letter')
+    ContentBlock = apps.get_model('letters', 'ContentBlock')
+    blocks = ContentBlock.objects.filter(block_type='rich_text')
+    Letter.objects.filter(pk__in=blocks.values('letter_id')).update(public_snapshot=None)
+    blocks.update(updated_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('letters', '0009_letter_open_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_rich_text_source_from_snapshots, migrations.RunPython.noop),
+    ]
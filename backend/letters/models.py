@@ -1,8 +1,15 @@
+import re
 import uuid
+from typing import Any, Dict, Optional
+
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, Max, Q, Value, When
+from django.db.models.functions import Cast, Substr
 from django.utils.text import slugify
 
+from . import richtext
+
 
 class User(AbstractUser):
     """Custom user model with UUID primary key."""
@@ -51,6 +58,8 @@ class Letter(models.Model):
         LetterType,
         on_delete=models.PROTECT,
         related_name='letters',
+        # letter_type_created_idx leads with this column.
+        db_index=False,
     )
     custom_properties = models.JSONField(
         help_text="Custom properties validated against letter_type.meta_schema",
@@ -62,25 +71,98 @@ class Letter(models.Model):
         'User',
         on_delete=models.CASCADE,
         related_name='letters',
+        # letter_author_created_idx leads with this column.
+        db_index=False,
     )
     is_published = models.BooleanField(default=False)
-    published_at = models.DateTimeField(null=True, blank=True)
+    published_at = models.DateTimeField(
+        help_text="When the letter went live; a draft with a time set is published then by run_publisher",
+        null=True,
+        blank=True,
+    )
+    public_snapshot = models.TextField(
+        help_text="Rendered public JSON, regenerated whenever a published letter changes",
+        null=True,
+        blank=True,
+        editable=False,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Serves the keyset pagination of the admin letter list.
+            models.Index(fields=['-created_at', '-id'], name='letter_created_at_id_idx'),
+            # Newest-first lists of one author's or one type's letters.
+            models.Index(fields=['created_by', '-created_at'], name='letter_author_created_idx'),
+            models.Index(fields=['letter_type', '-created_at'], name='letter_type_created_idx'),
+            # Scheduled drafts, polled by the publisher.
+            models.Index(
+                fields=['published_at'], name='letter_scheduled_idx',
+                condition=models.Q(is_published=False, published_at__isnull=False),
+            ),
+            # PostgreSQL also gets a GIN index on custom_properties (migration 0006).
+        ]
+
+    # Attempts at claiming a generated slug before giving up under contention.
+    SLUG_ATTEMPTS = 25
+    # Longest slug suffix counted by next_free_slug; 9 digits always fit an int4.
+    MAX_SUFFIX_DIGITS = 9
+
+    # is_published as loaded or last saved (None until then). Only a save that
+    # turns it from True to False unpublishes; see signals.remember_previous_slug.
+    _saved_is_published: Optional[bool] = None
+
+    @classmethod
+    def from_db(cls, db: Optional[str], field_names: Any, values: Any) -> 'Letter':
+        letter = super().from_db(db, field_names, values)
+        letter._saved_is_published = letter.__dict__.get('is_published')
+        return letter
 
     def save(self, *args, **kwargs) -> None:  # type: ignore
-        if not self.slug:
-            base_slug = slugify(self.title)
-            slug = base_slug
-            counter = 1
-            while Letter.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        if self.slug:
+            super().save(*args, **kwargs)
+            return
+
+        base_slug = slugify(self.title)
+        for attempt in range(self.SLUG_ATTEMPTS):
+            self.slug = self.next_free_slug(base_slug)
+            try:
+                # A savepoint keeps the surrounding transaction usable if a
+                # concurrent create claimed the same slug first.
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                collided = Letter.objects.filter(slug=self.slug).exclude(pk=self.pk).exists()
+                self.slug = ''
+                if not collided or attempt == self.SLUG_ATTEMPTS - 1:
+                    raise
+
+    def next_free_slug(self, base_slug: str, allow_base: bool = True) -> str:
+        """Return ``base_slug`` or the next free ``base_slug-N`` in a single query.
+
+        With ``allow_base=False`` a suffixed slug is returned even if the base is free.
+        Numeric suffixes longer than ``MAX_SUFFIX_DIGITS`` (say, a phone number
+        in the title) are not counted, so casting them can't overflow.
+        """
+        suffixed = rf'^{re.escape(base_slug)}-[0-9]{{1,{self.MAX_SUFFIX_DIGITS}}}$'
+        taken = (
+            Letter.objects.exclude(pk=self.pk)
+            .filter(Q(slug=base_slug) | Q(slug__regex=suffixed))
+            .annotate(suffix=Case(
+                When(slug=base_slug, then=Value(0)),
+                default=Cast(Substr('slug', len(base_slug) + 2), models.IntegerField()),
+            ))
+            .aggregate(
+                base_taken=Count('pk', filter=Q(slug=base_slug)),
+                highest=Max('suffix'),
+            )
+        )
+        if allow_base and not taken['base_taken']:
+            return base_slug
+        return f"{base_slug}-{(taken['highest'] or 0) + 1}"
 
     def __str__(self) -> str:
         return f"{self.title} (to {self.recipient_name})"
@@ -90,6 +172,11 @@ class Letter(models.Model):
         from django.conf import settings
         return f"{settings.FRONTEND_URL}/letter/{self.slug}"
 
+    def get_open_stats(self) -> Dict[str, Any]:
+        """Public page opens from the hourly counts (see ``letters.analytics``)."""
+        from .analytics import open_stats
+        return open_stats(self.pk)
+
 
 class ContentBlock(models.Model):
     """Polymorphic content blocks for letters (text, image, rich_text)."""
@@ -125,3 +212,83 @@ class ContentBlock(models.Model):
 
     def __str__(self) -> str:
         return f"{self.block_type} block #{self.order} for {self.letter.title}"
+
+    def save(self, *args, **kwargs) -> None:  # type: ignore
+        """Pre-render rich_text content (see ``letters.richtext``) before saving."""
+        self.content = richtext.prepare_content(self.block_type, self.content)
+        super().save(*args, **kwargs)
+
+
+class LetterSearchDocument(models.Model):
+    """Searchable text of a letter, kept in sync by ``letters.search``.
+
+    The database indexes it: a generated ``search_vector`` column with a GIN
+    index on PostgreSQL, an FTS5 table fed by triggers on SQLite (created in
+    migration 0005, outside the model).
+    """
+
+    letter = models.OneToOneField(
+        Letter,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+    )
+    title = models.TextField()
+    recipient_name = models.TextField()
+    description = models.TextField()
+    body = models.TextField(blank=True, help_text="Text of the letter's text and rich_text blocks")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"Search document for {self.title}"
+
+
+class LetterPropertyValue(models.Model):
+    """One ``custom_properties`` value a letter's type marks ``indexed``, kept by ``letters.properties``.
+
+    Each value is stored in the column matching its schema type, so filters
+    on it are plain lookups on the ``(key, value, letter)`` indexes below.
+    """
+
+    letter = models.ForeignKey(
+        Letter,
+        on_delete=models.CASCADE,
+        related_name='property_values',
+        # The (letter, key) unique index leads with this column.
+        db_index=False,
+    )
+    key = models.CharField(max_length=100)
+    value_text = models.CharField(max_length=255, null=True, blank=True)
+    value_number = models.FloatField(null=True, blank=True)
+    value_bool = models.BooleanField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['letter', 'key']
+        indexes = [
+            models.Index(fields=['key', 'value_text', 'letter'], name='letter_property_text_idx'),
+            models.Index(fields=['key', 'value_number', 'letter'], name='letter_property_number_idx'),
+            models.Index(fields=['key', 'value_bool', 'letter'], name='letter_property_bool_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.key} of letter {self.letter_id}"
+
+
+class LetterOpenCount(models.Model):
+    """Opens of a letter's public page in one hour, added up by ``letters.analytics``."""
+
+    letter = models.ForeignKey(
+        Letter,
+        on_delete=models.CASCADE,
+        related_name='open_counts',
+        # The (letter, hour) unique index leads with this column.
+        db_index=False,
+    )
+    hour = models.DateTimeField(help_text="Start of the hour (UTC)")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['letter', 'hour']
+
+    def __str__(self) -> str:
+        return f"{self.count} opens of letter {self.letter_id} at {self.hour:%Y-%m-%d %H:00}"
@@ -0,0 +1,172 @@
+"""Pagination classes for the letters API and admin."""
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Model, Q, QuerySet
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Keyset (seek) pagination over ``(created_at, id)``, newest first.
+
+    Each page is fetched with ``WHERE (created_at, id) < cursor ORDER BY
+    created_at DESC, id DESC LIMIT n``, which the composite index answers
+    directly, so page cost doesn't grow with depth and no ``COUNT(*)`` runs.
+    Requests with ``?page=N`` fall back to ``PageNumberPagination``.
+    """
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    legacy_query_param = 'page'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self) -> None:
+        self.legacy: Optional[PageNumberPagination] = None
+
+    def paginate_queryset(self, queryset: 'QuerySet[Any]', request: Request, view: Any = None) -> List[Any]:
+        if self.legacy_query_param in request.query_params:
+            self.legacy = PageNumberPagination()
+            return self.legacy.paginate_queryset(queryset.order_by('-created_at', '-id'), request, view)  # type: ignore
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['reverse'])
+
+        if cursor is None:
+            page_queryset = queryset.order_by('-created_at', '-id')
+        elif reverse:
+            page_queryset = queryset.filter(
+                Q(created_at__gt=cursor['created_at'])
+                | Q(created_at=cursor['created_at'], id__gt=cursor['id'])
+            ).order_by('created_at', 'id')
+        else:
+            page_queryset = queryset.filter(
+                Q(created_at__lt=cursor['created_at'])
+                | Q(created_at=cursor['created_at'], id__lt=cursor['id'])
+            ).order_by('-created_at', '-id')
+
+        results = list(page_queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        self.has_next = has_more if not reverse else True
+        self.has_previous = cursor is not None and (has_more if reverse else True)
+        return results
+
+    def get_page_size(self, request: Request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request: Request) -> Optional[Dict[str, Any]]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            created_at = datetime.fromisoformat(payload['c'])
+            cursor = {
+                'created_at': created_at,
+                'id': uuid.UUID(str(payload['i'])),
+                'reverse': bool(payload.get('r')),
+            }
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        # Cursors carry aware times; a naive one wasn't issued here.
+        if timezone.is_naive(created_at):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, item: Model, reverse: bool) -> str:
+        payload: Dict[str, Any] = {'c': item.created_at.isoformat(), 'i': str(item.pk)}  # type: ignore[attr-defined]
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('ascii'))
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded.decode('ascii'))
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data: Sequence[Any]) -> Response:
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+def estimate_row_count(model: Any, using: str) -> Optional[int]:
+    """The planner's row estimate for a model's table, if the database keeps one.
+
+    PostgreSQL keeps ``pg_class.reltuples`` current through autovacuum; SQLite
+    only has ``sqlite_stat1`` after ``ANALYZE``.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # The first number of an index's stat is the table's row count.
+            cursor.execute("SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples is -1 for a table that was never analyzed.
+    return row[0] if row is not None and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):  # type: ignore[type-arg]
+    """Paginator that skips the exact ``COUNT(*)`` of an unfiltered large table.
+
+    When the queryset has no filters and the table's estimated size is at
+    least ``threshold`` rows, the estimate is used as the count; otherwise
+    it counts as usual. Page numbers near the end of an estimated count may
+    fall past the real last page.
+    """
+    threshold = 10_000
+
+    @cached_property
+    def count(self) -> int:
+        # Usually a QuerySet, but Paginator also takes lists.
+        queryset: Any = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where and not query.distinct and not query.combinator:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.threshold:
+                return estimate
+        return super().count
@@ -0,0 +1,185 @@
+"""Indexed filtering on ``Letter.custom_properties``.
+
+A property of a ``LetterType.meta_schema`` is filterable when its spec sets
+``"indexed": true``::
+
+    {"properties": {"year": {"type": "integer", "indexed": true},
+                    "family": {"type": "string", "indexed": true}}}
+
+Indexed values of ``string``, ``integer``, ``number`` and ``boolean``
+properties (or enums of one such type) are copied into ``LetterPropertyValue``
+rows, in the transaction that saves the letter, so a filter such as
+``?prop.year=2026&prop.family=smith`` compiles to one indexed subquery per
+property. Strings longer than ``MAX_TEXT_LENGTH`` are not indexed. Changing
+which properties of a type are indexed rebuilds the rows of its letters.
+"""
+import math
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set
+
+from django.db.models import Q, QuerySet
+
+from .models import Letter, LetterPropertyValue, LetterType
+
+
+PARAM_PREFIX = 'prop.'
+MAX_TEXT_LENGTH = 255
+CHUNK_SIZE = 500
+
+COLUMNS = {
+    'string': 'value_text',
+    'integer': 'value_number',
+    'number': 'value_number',
+    'boolean': 'value_bool',
+}
+
+
+class PropertyFilterError(ValueError):
+    """A ``prop.<key>`` filter names an unindexed property or has an unusable value."""
+
+
+def _json_type(spec: Dict[str, Any]) -> Optional[str]:
+    json_type = spec.get('type')
+    if json_type is None and spec.get('enum'):
+        values = spec['enum']
+        if all(isinstance(value, bool) for value in values):
+            return 'boolean'
+        if all(isinstance(value, str) for value in values):
+            return 'string'
+        if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+            return 'number'
+    return json_type if isinstance(json_type, str) else None
+
+
+def indexed_properties(meta_schema: Any) -> Dict[str, str]:
+    """Map each indexed property of a meta schema to the column holding its values."""
+    properties = meta_schema.get('properties') if isinstance(meta_schema, dict) else None
+    if not isinstance(properties, dict):
+        return {}
+    columns = {}
+    for key, spec in properties.items():
+        json_type = _json_type(spec) if isinstance(spec, dict) and spec.get('indexed') is True else None
+        if json_type is not None and json_type in COLUMNS:
+            columns[key] = COLUMNS[json_type]
+    return columns
+
+
+def meta_schema_errors(meta_schema: Any) -> List[str]:
+    """Describe the properties marked ``indexed`` that can't be indexed."""
+    properties = meta_schema.get('properties') if isinstance(meta_schema, dict) else None
+    if not isinstance(properties, dict):
+        return []
+    return [
+        f"{key}: only string, integer, number and boolean properties can be indexed"
+        for key, spec in properties.items()
+        if isinstance(spec, dict) and spec.get('indexed') is True and _json_type(spec) not in COLUMNS
+    ]
+
+
+def _column_value(column: str, value: Any) -> Any:
+    """``value`` as stored in ``column``, or ``None`` if it doesn't belong there."""
+    if column == 'value_bool':
+        return value if isinstance(value, bool) else None
+    if column == 'value_number':
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+            return float(value)
+        return None
+    return value if isinstance(value, str) and len(value) <= MAX_TEXT_LENGTH else None
+
+
+def property_values(letter_id: Any, columns: Dict[str, str], custom_properties: Any) -> List[LetterPropertyValue]:
+    """Unsaved rows for the indexed values of one letter's properties."""
+    if not isinstance(custom_properties, dict):
+        return []
+    rows = []
+    for key, column in columns.items():
+        value = _column_value(column, custom_properties.get(key))
+        if value is not None:
+            rows.append(LetterPropertyValue(letter_id=letter_id, key=key, **{column: value}))
+    return rows
+
+
+def index_letters(letters: Sequence[Letter], created: bool = False) -> None:
+    """Rewrite the indexed property values of these saved letters.
+
+    ``created=True`` skips removing old rows of letters that were just inserted.
+    """
+    if not letters:
+        return
+    schemas = dict(
+        LetterType.objects.filter(pk__in={letter.letter_type_id for letter in letters})
+        .values_list('pk', 'meta_schema')
+    )
+    columns = {type_id: indexed_properties(schema) for type_id, schema in schemas.items()}
+    rows = [
+        row
+        for letter in letters
+        for row in property_values(letter.pk, columns.get(letter.letter_type_id, {}), letter.custom_properties)
+    ]
+    if not created:
+        LetterPropertyValue.objects.filter(letter_id__in=[letter.pk for letter in letters]).delete()
+    LetterPropertyValue.objects.bulk_create(rows, batch_size=CHUNK_SIZE)
+
+
+def reindex_letter_type(letter_type_id: Any) -> None:
+    """Rewrite the indexed property values of every letter of a type."""
+    letters = (
+        Letter.objects.filter(letter_type_id=letter_type_id)
+        .order_by('pk')
+        .only('id', 'letter_type_id', 'custom_properties')
+    )
+    chunk: List[Letter] = []
+    for letter in letters.iterator(chunk_size=CHUNK_SIZE):
+        chunk.append(letter)
+        if len(chunk) >= CHUNK_SIZE:
+            index_letters(chunk)
+            chunk = []
+    index_letters(chunk)
+
+
+def filters_from_params(params: Any) -> Dict[str, List[str]]:
+    """Collect ``prop.<key>`` query parameters as ``{key: [values]}``."""
+    return {
+        name[len(PARAM_PREFIX):]: params.getlist(name)
+        for name in params
+        if name.startswith(PARAM_PREFIX)
+    }
+
+
+def _parse(column: str, raw: str) -> Any:
+    if column == 'value_bool':
+        return {'true': True, 'false': False}.get(raw.lower())
+    if column == 'value_number':
+        try:
+            number = float(raw)
+        except ValueError:
+            return None
+        return number if math.isfinite(number) else None
+    return raw if len(raw) <= MAX_TEXT_LENGTH else None
+
+
+def filter_letters(queryset: QuerySet[Letter], filters: Mapping[str, Iterable[str]]) -> QuerySet[Letter]:
+    """Keep the letters matching every ``{key: [values]}`` filter (any of a key's values).
+
+    A key may be indexed with different types by different letter types; a
+    value is compared in each column it parses for.
+    """
+    if not filters:
+        return queryset
+    columns: Dict[str, Set[str]] = {}
+    for schema in LetterType.objects.values_list('meta_schema', flat=True):
+        for key, column in indexed_properties(schema).items():
+            columns.setdefault(key, set()).add(column)
+
+    for key, raw_values in filters.items():
+        if key not in columns:
+            raise PropertyFilterError(f"'{key}' is not an indexed property.")
+        condition = Q()
+        for column in sorted(columns[key]):
+            values = {value for value in (_parse(column, raw) for raw in raw_values) if value is not None}
+            if values:
+                condition |= Q(**{f'{column}__in': values})
+        if not condition:
+            raise PropertyFilterError(f"Invalid value for '{key}'.")
+        matching = LetterPropertyValue.objects.filter(condition, key=key).values('letter_id')
+        queryset = queryset.filter(pk__in=matching)
+    return queryset
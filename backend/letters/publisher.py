@@ -0,0 +1,61 @@
+"""Scheduled publishing.
+
+A draft (``is_published=False``) with ``published_at`` set is scheduled: once
+that time has come, ``publish_due()`` publishes it. ``manage.py
+run_publisher`` calls it in a loop. Each batch is claimed with ``SELECT ...
+FOR UPDATE SKIP LOCKED``, so several publishers can run side by side without
+waiting on or publishing each other's letters. (SQLite has no row locks; it
+runs one writer at a time instead.)
+
+A published batch gets its snapshots rendered in the same transaction. After
+the commit, its static files are written, its search entries are updated,
+and its responses are stored in the public cache. The first readers then hit
+warm paths. The in-process ``lru`` cache only warms the publisher's own
+process, so use the shared ``django`` cache backend when the publisher runs
+separately from the web workers.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from . import cache as public_cache
+from . import conditional, search, snapshots
+from .models import Letter
+from .signals import invalidate_public_cache
+
+
+def due_letters(now: datetime) -> QuerySet[Letter]:
+    """Scheduled drafts whose publication time has come, earliest first."""
+    return Letter.objects.filter(is_published=False, published_at__lte=now).order_by('published_at', 'pk')
+
+
+def publish_due(batch_size: int = 100, now: Optional[datetime] = None) -> List[str]:
+    """Publish one batch of due letters and return their slugs."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        due = list(
+            due_letters(now).select_for_update(skip_locked=True).values_list('pk', 'slug')[:batch_size]
+        )
+        if not due:
+            return []
+        letter_ids = [pk for pk, _ in due]
+        # updated_at is bumped by hand: queryset updates skip auto_now.
+        Letter.objects.filter(pk__in=letter_ids, is_published=False).update(is_published=True, updated_at=now)
+        snapshots.refresh_snapshots(letter_ids)
+        search.schedule_reindex(letter_ids)
+        invalidate_public_cache(slug for _, slug in due)
+        rendered: Dict[str, public_cache.CachedResponse] = {}
+        rows = conditional.annotate_validators(
+            Letter.objects.filter(pk__in=letter_ids, public_snapshot__isnull=False)
+        ).values_list('slug', 'public_snapshot', 'pk', 'updated_at', 'letter_type__updated_at', 'blocks_updated_at', 'block_count')
+        for slug, snapshot, *columns in rows:
+            validators = conditional.validators_from_row(*columns)
+            rendered[slug] = public_cache.CachedResponse(
+                status=200, body=snapshot.encode('utf-8'),
+                etag=validators.etag, last_modified=validators.last_modified,
+            )
+        transaction.on_commit(lambda: public_cache.prime(rendered))
+    return [slug for _, slug in due]
@@ -0,0 +1,15 @@
+"""DRF renderers."""
+from typing import Any, Optional
+
+from rest_framework.renderers import JSONRenderer
+
+from .timing import timed
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` that reports its time as the request's ``render`` phase."""
+
+    def render(self, data: Any, accepted_media_type: Optional[str] = None, renderer_context: Any = None) -> bytes:
+        with timed('render'):
+            rendered: bytes = super().render(data, accepted_media_type, renderer_context)
+        return rendered
@@ -0,0 +1,216 @@
+"""Write-time sanitizing and pre-rendering of rich_text blocks.
+
+The ``html`` a client sends is kept as the source. Next to it the block stores
+``rendered`` (the HTML cleaned against an allowlist and normalized: lowercase
+tags, ``b``/``i`` as ``strong``/``em``, collapsed whitespace, every element
+closed, empty ones dropped), ``text`` (a plain-text extraction) and the
+``sanitizer_version`` that produced them. Readers serve ``rendered`` as is;
+the public payload leaves out the unsanitized ``html``, which only the admin
+API returns.
+Bumping ``SANITIZER_VERSION`` marks stored blocks stale; they are re-rendered
+the next time their letter's snapshot is built, or all at once with
+``manage.py rerender_rich_text``.
+"""
+import re
+from html import escape
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+
+SANITIZER_VERSION = 1
+
+ALLOWED_TAGS = {
+    'p', 'br', 'strong', 'em', 'u', 's', 'a', 'ul', 'ol', 'li',
+    'blockquote', 'h1', 'h2', 'h3', 'h4', 'code', 'pre', 'span',
+}
+ALLOWED_ATTRIBUTES = {'a': {'href', 'title'}}
+ALLOWED_URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+RENAMED_TAGS = {'b': 'strong', 'i': 'em', 'strike': 's', 'del': 's', 'ins': 'u'}
+VOID_TAGS = {'br'}
+BLOCK_TAGS = {'p', 'ul', 'ol', 'li', 'blockquote', 'h1', 'h2', 'h3', 'h4', 'pre'}
+# Dropped together with everything inside them.
+DROPPED_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'svg', 'math', 'head', 'title'}
+
+_WHITESPACE = re.compile(r'\s+')
+_BLOCK_BOUNDARY = re.compile(r'\s*(</?(?:%s)\b[^>]*>)\s*' % '|'.join(sorted(BLOCK_TAGS - {'pre'})))
+
+
+class Element:
+    """A parsed element: tag name, allowed attributes and children."""
+
+    __slots__ = ('tag', 'attrs', 'children')
+
+    def __init__(self, tag: str, attrs: Optional[List[Tuple[str, str]]] = None) -> None:
+        self.tag = tag
+        self.attrs = attrs or []
+        self.children: List[Union['Element', str]] = []
+
+
+class _Sanitizer(HTMLParser):
+    """Builds a tree of allowed elements; everything else is unwrapped or dropped."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.root = Element('')
+        self.stack: List[Element] = [self.root]
+        self.dropping: List[str] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if self.dropping or tag in DROPPED_TAGS:
+            if tag in DROPPED_TAGS:
+                self.dropping.append(tag)
+            return
+        tag = RENAMED_TAGS.get(tag, tag)
+        if tag not in ALLOWED_TAGS:
+            return
+        self._close_implied(tag)
+        element = Element(tag, _clean_attributes(tag, attrs))
+        self.stack[-1].children.append(element)
+        if tag not in VOID_TAGS:
+            self.stack.append(element)
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag not in DROPPED_TAGS:
+            self.handle_starttag(tag, attrs)
+            if tag not in VOID_TAGS:
+                self.handle_endtag(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if self.dropping:
+            if tag == self.dropping[-1]:
+                self.dropping.pop()
+            return
+        tag = RENAMED_TAGS.get(tag, tag)
+        # Close up to the matching open element; stray end tags are ignored.
+        for depth in range(len(self.stack) - 1, 0, -1):
+            if self.stack[depth].tag == tag:
+                del self.stack[depth:]
+                return
+
+    def _close_implied(self, tag: str) -> None:
+        """Close elements the way browsers do: a block ends an open ``p``, an ``li`` ends the previous one."""
+        tags = [element.tag for element in self.stack]
+        if tag == 'li':
+            for depth in range(len(tags) - 1, 0, -1):
+                if tags[depth] in ('ul', 'ol'):
+                    break
+                if tags[depth] == 'li':
+                    del self.stack[depth:]
+                    return
+        if tag in BLOCK_TAGS and 'p' in tags:
+            del self.stack[len(tags) - 1 - tags[::-1].index('p'):]
+
+    def handle_data(self, data: str) -> None:
+        if not self.dropping:
+            self.stack[-1].children.append(data)
+
+
+def _clean_attributes(tag: str, attrs: List[Tuple[str, Optional[str]]]) -> List[Tuple[str, str]]:
+    allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+    cleaned = []
+    for name, value in attrs:
+        if name not in allowed or value is None:
+            continue
+        value = value.strip()
+        if name == 'href' and not _safe_url(value):
+            continue
+        cleaned.append((name, value))
+    return cleaned
+
+
+def _safe_url(url: str) -> bool:
+    # Browsers ignore control characters and whitespace inside schemes ("java\tscript:").
+    compact = re.sub(r'[\x00-\x20]', '', url)
+    try:
+        return urlsplit(compact).scheme.lower() in ALLOWED_URL_SCHEMES
+    except ValueError:
+        return False
+
+
+def _render(element: Element, preformatted: bool = False) -> str:
+    html = ''
+    for child in element.children:
+        if isinstance(child, str):
+            part = escape(child if preformatted else _WHITESPACE.sub(' ', child), quote=False)
+        else:
+            part = _render_element(child, preformatted)
+        if not preformatted and html.endswith(' ') and part.startswith(' '):
+            part = part[1:]
+        html += part
+    if element.tag in BLOCK_TAGS or not element.tag:
+        # Whitespace next to block boundaries is never significant.
+        html = _BLOCK_BOUNDARY.sub(r'\1', html)
+        if not preformatted:
+            html = html.strip()
+    return html
+
+
+def _render_element(element: Element, preformatted: bool) -> str:
+    attrs = ''.join(f' {name}="{escape(value)}"' for name, value in element.attrs)
+    if element.tag in VOID_TAGS:
+        return f'<{element.tag}{attrs}>'
+    inner = _render(element, preformatted or element.tag == 'pre')
+    if not inner.strip() and element.tag != 'pre':
+        # Empty elements carry no content; keep the whitespace they held.
+        return ' ' if inner else ''
+    if element.tag == 'span' or (element.tag == 'a' and 'href' not in dict(element.attrs)):
+        return inner
+    return f'<{element.tag}{attrs}>{inner}</{element.tag}>'
+
+
+def _text(element: Element, out: List[str]) -> None:
+    for child in element.children:
+        if isinstance(child, str):
+            out.append(child if element.tag == 'pre' else _WHITESPACE.sub(' ', child))
+        elif child.tag == 'br':
+            out.append('\n')
+        else:
+            # List items start a new line; other blocks a new paragraph.
+            boundary = '\n\n' if child.tag in BLOCK_TAGS - {'li'} else ''
+            out.append(boundary or ('\n' if child.tag == 'li' else ''))
+            _text(child, out)
+            out.append(boundary)
+
+
+def sanitize(html: str) -> Tuple[str, str]:
+    """Return the sanitized, normalized HTML and the plain text of ``html``."""
+    parser = _Sanitizer()
+    parser.feed(html or '')
+    parser.close()
+    rendered = _render(parser.root)
+    pieces: List[str] = []
+    _text(parser.root, pieces)
+    lines = [re.sub(r' {2,}', ' ', line).strip() for line in ''.join(pieces).split('\n')]
+    text = re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+    return rendered, text
+
+
+def prepare_content(block_type: str, content: Any) -> Any:
+    """Return block content with the rich_text pre-rendered fields filled in."""
+    if block_type != 'rich_text' or not isinstance(content, dict) or not isinstance(content.get('html'), str):
+        return content
+    rendered, text = sanitize(content['html'])
+    return {
+        **content,
+        'rendered': rendered,
+        'text': text,
+        'sanitizer_version': SANITIZER_VERSION,
+    }
+
+
+def public_content(block_type: str, content: Any) -> Any:
+    """Return block content as the public payload carries it: rich_text without ``html``."""
+    if block_type != 'rich_text' or not isinstance(content, dict) or 'html' not in content:
+        return content
+    return {key: value for key, value in content.items() if key != 'html'}
+
+
+def is_stale(block_type: str, content: Any) -> bool:
+    """Whether a stored block needs (re-)rendering under the current rules."""
+    return (
+        block_type == 'rich_text'
+        and isinstance(content, dict)
+        and isinstance(content.get('html'), str)
+        and content.get('sanitizer_version') != SANITIZER_VERSION
+    )
@@ -2,7 +2,9 @@
 from datetime import datetime
 from typing import Any, Dict, List, Literal, Optional
 from uuid import UUID
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from . import richtext
 
 
 # Content Block Schemas
@@ -19,14 +21,30 @@ class TextBlockContent(BaseModel):
 
 
 class ImageBlockContent(BaseModel):
-    """Image block content structure."""
+    """Image block content structure.
+
+    Uploads through ``/api/admin/images/`` also fill in the stored image's
+    size, content hash and per-format ``srcset`` strings.
+    """
     url: str
     caption: Optional[str] = None
+    original_url: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    hash: Optional[str] = None
+    srcset: Optional[Dict[str, str]] = None
 
 
 class RichTextBlockContent(BaseModel):
-    """Rich text block content structure."""
+    """Rich text block content structure.
+
+    ``html`` is the source as sent; the other fields are filled in at write
+    time by ``letters.richtext``. Public responses leave ``html`` out.
+    """
     html: str
+    rendered: Optional[str] = None
+    text: Optional[str] = None
+    sanitizer_version: Optional[int] = None
 
 
 # LetterType Schemas
@@ -42,10 +60,13 @@ class LetterTypeCreate(LetterTypeBase):
     pass
 
 
-class LetterTypeResponse(LetterTypeBase):
-    """Schema for letter type response."""
+class LetterTypeResponse(BaseModel):
+    """Schema for letter type response (field order matches LetterTypeSerializer)."""
     id: UUID
+    name: str
     slug: str
+    description: str
+    meta_schema: Dict[str, Any] = Field(default_factory=dict)
     created_at: datetime
     updated_at: datetime
 
@@ -91,20 +112,13 @@ class ContentBlockResponse(BaseModel):
         from_attributes = True
 
 
-class LetterResponse(LetterBase):
-    """Schema for letter response."""
-    id: UUID
-    slug: str
-    letter_type: LetterTypeResponse
-    is_published: bool
-    published_at: Optional[datetime]
-    created_at: datetime
-    updated_at: datetime
-    content_blocks: List[ContentBlockResponse] = Field(default_factory=list)
-    public_url: str
+class PublicContentBlockResponse(ContentBlockResponse):
+    """Content block as the public sees it (rich_text without its source ``html``)."""
 
-    class Config:
-        from_attributes = True
+    @model_validator(mode='after')
+    def drop_rich_text_source(self) -> 'PublicContentBlockResponse':
+        self.content = richtext.public_content(self.block_type, self.content)
+        return self
 
 
 class LetterPublicResponse(BaseModel):
@@ -116,9 +130,15 @@ class LetterPublicResponse(BaseModel):
     slug: str
     letter_type: LetterTypeResponse
     custom_properties: Dict[str, Any]
-    content_blocks: List[ContentBlockResponse]
+    content_blocks: List[PublicContentBlockResponse]
     created_at: datetime
 
+    @field_validator('content_blocks', mode='before')
+    @classmethod
+    def load_content_blocks(cls, value: Any) -> Any:
+        """Turn a related manager into a list, using any prefetch cache."""
+        return list(value.all()) if hasattr(value, 'all') else value
+
     class Config:
         from_attributes = True
 
@@ -134,7 +154,8 @@ class UserResponse(BaseModel):
     """User response schema."""
     id: UUID
     username: str
-    email: EmailStr
+    # Not EmailStr: stored emails are never validated (create_user defaults to '').
+    email: str
     is_staff: bool
     is_superuser: bool
 
@@ -142,6 +163,52 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+class LetterOpenStatsResponse(BaseModel):
+    """Public page opens of a letter (see ``letters.analytics``)."""
+    total: int
+    last_24_hours: int
+    last_opened_at: Optional[datetime]
+
+
+class LetterResponse(BaseModel):
+    """Schema for letter response (field order matches LetterSerializer)."""
+    id: UUID
+    title: str
+    description: str
+    recipient_name: str
+    slug: str
+    letter_type: LetterTypeResponse
+    custom_properties: Dict[str, Any] = Field(default_factory=dict)
+    content_blocks: List[ContentBlockResponse] = Field(default_factory=list)
+    is_published: bool
+    published_at: Optional[datetime]
+    created_by: UserResponse
+    created_at: datetime
+    updated_at: datetime
+    public_url: str
+    open_stats: LetterOpenStatsResponse
+
+    @field_validator('content_blocks', mode='before')
+    @classmethod
+    def load_content_blocks(cls, value: Any) -> Any:
+        """Turn a related manager into a list, using any prefetch cache."""
+        return list(value.all()) if hasattr(value, 'all') else value
+
+    @model_validator(mode='before')
+    @classmethod
+    def read_letter_attributes(cls, data: Any) -> Any:
+        """Read model attributes, taking public_url and open_stats from the Letter's getters."""
+        if hasattr(data, 'get_public_url'):
+            values = {name: getattr(data, name) for name in cls.model_fields if name not in ('public_url', 'open_stats')}
+            values['public_url'] = data.get_public_url()
+            values['open_stats'] = data.get_open_stats()
+            return values
+        return data
+
+    class Config:
+        from_attributes = True
+
+
 class LoginResponse(BaseModel):
     """Login response schema."""
     user: UserResponse
@@ -0,0 +1,214 @@
+"""Full-text search over letters and their block text.
+
+Each letter has a ``LetterSearchDocument`` row holding its title, recipient,
+description and the text of its ``text`` and ``rich_text`` blocks. Saving a
+letter or a block schedules that letter's row to be rewritten once the
+transaction commits; the database keeps its own index of the rows:
+
+* PostgreSQL: a stored generated ``tsvector`` column (title and recipient
+  weighted above description, above block text) with a GIN index, queried
+  with ``websearch_to_tsquery`` and ranked by ``ts_rank_cd``.
+* SQLite: an external-content FTS5 table (porter stemming) updated by
+  triggers, ranked by ``bm25``.
+
+Other databases fall back to unranked ``icontains`` matching. Highlights are
+HTML-escaped with matches wrapped in ``<mark>``.
+"""
+import threading
+import uuid
+from contextlib import contextmanager
+from html import escape
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Prefetch, Q
+
+from . import richtext
+from .models import ContentBlock, Letter, LetterSearchDocument
+
+
+SEARCHED_BLOCK_TYPES = ('text', 'rich_text')
+MAX_RESULTS = 100
+# Match delimiters the database puts around hits; escaped text can't contain them.
+_START, _STOP = '\x02', '\x03'
+
+_deferred = threading.local()
+
+
+def block_text(block_type: str, content: Any) -> str:
+    """Searchable text of one block (``text`` of text and rich_text blocks).
+
+    A rich_text block saved before it was pre-rendered has only its ``html``;
+    its text is extracted on the fly.
+    """
+    if block_type not in SEARCHED_BLOCK_TYPES or not isinstance(content, dict):
+        return ''
+    text = content.get('text')
+    if isinstance(text, str):
+        return text
+    html = content.get('html')
+    return richtext.sanitize(html)[1] if block_type == 'rich_text' and isinstance(html, str) else ''
+
+
+def document_body(blocks: Iterable[Tuple[str, Any]]) -> str:
+    """Join the text of ``(block_type, content)`` pairs, in order, one block per paragraph."""
+    return '\n\n'.join(text for text in (block_text(*block) for block in blocks) if text)
+
+
+def reindex(letter_ids: Iterable[Any]) -> None:
+    """Rewrite the search documents of these letters (deleted letters lose theirs)."""
+    letter_ids = list(set(letter_ids))
+    if not letter_ids:
+        return
+    blocks = ContentBlock.objects.filter(block_type__in=SEARCHED_BLOCK_TYPES).only(
+        'letter_id', 'block_type', 'content', 'order',
+    )
+    letters = (
+        Letter.objects.filter(pk__in=letter_ids)
+        .only('id', 'title', 'recipient_name', 'description')
+        .prefetch_related(Prefetch('content_blocks', queryset=blocks))
+    )
+    documents = [
+        LetterSearchDocument(
+            letter_id=letter.pk,
+            title=letter.title,
+            recipient_name=letter.recipient_name,
+            description=letter.description,
+            body=document_body((block.block_type, block.content) for block in letter.content_blocks.all()),
+        )
+        for letter in letters
+    ]
+    LetterSearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=['letter'],
+        update_fields=['title', 'recipient_name', 'description', 'body', 'updated_at'],
+    )
+    indexed = {document.letter_id for document in documents}
+    missing = [pk for pk in letter_ids if pk not in indexed]
+    if missing:
+        LetterSearchDocument.objects.filter(letter_id__in=missing).delete()
+
+
+def schedule_reindex(letter_ids: Iterable[Any]) -> None:
+    """Reindex these letters once the current transaction commits.
+
+    Inside a ``deferred()`` block the letters are collected and scheduled once
+    when the block exits.
+    """
+    letter_ids = list(letter_ids)
+    if not letter_ids:
+        return
+    pending: Optional[Set[Any]] = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        pending.update(letter_ids)
+        return
+    transaction.on_commit(lambda: reindex(letter_ids))
+
+
+@contextmanager
+def deferred() -> Iterator[None]:
+    """Coalesce reindexes scheduled in this block into one at exit."""
+    if getattr(_deferred, 'pending', None) is not None:
+        yield
+        return
+    _deferred.pending = set()
+    try:
+        yield
+        letter_ids: List[Any] = list(_deferred.pending)
+    finally:
+        _deferred.pending = None
+    schedule_reindex(letter_ids)
+
+
+def _highlight(text: str) -> str:
+    return escape(text or '').replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def _fts5_query(query: str) -> str:
+    # Quote every term so FTS5 operators and punctuation are matched literally.
+    return ' '.join('"%s"' % term.replace('"', '""') for term in query.split())
+
+
+def _search_sqlite(query: str, limit: int) -> List[Tuple[str, float, str, str]]:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT d.letter_id,
+                   bm25(letters_search_fts, 10.0, 10.0, 4.0, 1.0) AS score,
+                   highlight(letters_search_fts, 0, %s, %s),
+                   snippet(letters_search_fts, -1, %s, %s, '…', 24)
+            FROM letters_search_fts
+            JOIN letters_lettersearchdocument d ON d.rowid = letters_search_fts.rowid
+            WHERE letters_search_fts MATCH %s
+            ORDER BY score
+            LIMIT %s
+            """,
+            [_START, _STOP, _START, _STOP, _fts5_query(query), limit],
+        )
+        # bm25 is lower for better matches; flip it so higher ranks first everywhere.
+        return [(letter_id, -score, title, snippet) for letter_id, score, title, snippet in cursor.fetchall()]
+
+
+def _search_postgresql(query: str, limit: int) -> List[Tuple[str, float, str, str]]:
+    options = f'StartSel={_START}, StopSel={_STOP}'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT d.letter_id,
+                   ts_rank_cd(d.search_vector, q) AS score,
+                   ts_headline('english', d.title, q, %s),
+                   ts_headline('english', d.description || ' ' || d.body, q, %s)
+            FROM letters_lettersearchdocument d, websearch_to_tsquery('english', %s) q
+            WHERE d.search_vector @@ q
+            ORDER BY score DESC
+            LIMIT %s
+            """,
+            [options + ', HighlightAll=true', options + ', MaxFragments=2, MaxWords=24, MinWords=8', query, limit],
+        )
+        return [(str(letter_id), score, title, snippet) for letter_id, score, title, snippet in cursor.fetchall()]
+
+
+def _search_fallback(query: str, limit: int) -> List[Tuple[str, float, str, str]]:
+    condition = Q()
+    for term in query.split():
+        condition &= (
+            Q(title__icontains=term) | Q(recipient_name__icontains=term)
+            | Q(description__icontains=term) | Q(body__icontains=term)
+        )
+    rows = LetterSearchDocument.objects.filter(condition).values_list('letter_id', 'title', 'description')[:limit]
+    return [(str(letter_id), 0.0, title, description[:200]) for letter_id, title, description in rows]
+
+
+def search_ids(query: str, limit: int = 20) -> List[Tuple[uuid.UUID, float, Dict[str, str]]]:
+    """Return ``(letter_id, rank, highlights)`` for the best matches, best first."""
+    query = query.strip()
+    if not query:
+        return []
+    limit = max(1, limit)
+    backend = {'sqlite': _search_sqlite, 'postgresql': _search_postgresql}.get(connection.vendor, _search_fallback)
+    return [
+        (uuid.UUID(str(letter_id)), float(rank), {'title': _highlight(title), 'snippet': _highlight(snippet)})
+        for letter_id, rank, title, snippet in backend(query, limit)
+    ]
+
+
+def search(query: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Ranked matching letters with highlighted title and text snippet (at most ``MAX_RESULTS``)."""
+    matches = search_ids(query, min(limit, MAX_RESULTS))
+    letters = Letter.objects.only('id', 'title', 'slug', 'recipient_name', 'is_published').in_bulk(
+        [letter_id for letter_id, _, _ in matches]
+    )
+    return [
+        {
+            'id': str(letter_id),
+            'title': letters[letter_id].title,
+            'slug': letters[letter_id].slug,
+            'recipient_name': letters[letter_id].recipient_name,
+            'is_published': letters[letter_id].is_published,
+            'rank': rank,
+            'highlights': highlights,
+        }
+        for letter_id, rank, highlights in matches
+        if letter_id in letters
+    ]
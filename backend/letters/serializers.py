@@ -1,6 +1,45 @@
 """DRF Serializers for API endpoints."""
-from rest_framework import serializers
+from typing import Any, Dict, Iterable, List, Optional
+
+from rest_framework import permissions, serializers
+from . import properties, richtext
+from .blocks import sync_content_blocks
 from .models import User, LetterType, Letter, ContentBlock
+from .timing import timed
+from .validation import compile_errors, validate_custom_properties
+
+
+def requested_fields(request: Any) -> Optional[List[str]]:
+    """Return the field names asked for with ``?fields=a,b``, if any."""
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return None
+    raw = request.query_params.get('fields')
+    if not raw:
+        return None
+    return [name.strip() for name in raw.split(',') if name.strip()]
+
+
+class SparseFieldsetsMixin:
+    """Limit a serializer's output to ``fields`` or to the request's ``?fields=``.
+
+    Only applied on read requests, so writes always see every writable field.
+    """
+
+    def __init__(self, *args: Any, fields: Optional[Iterable[str]] = None, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            fields = requested_fields(self.context.get('request'))  # type: ignore[attr-defined]
+        if fields is not None:
+            for name in set(self.fields) - set(fields):  # type: ignore[attr-defined]
+                self.fields.pop(name)  # type: ignore[attr-defined]
+
+
+class TimedSerializerMixin:
+    """Report ``to_representation`` time as the request's ``serialize`` phase."""
+
+    def to_representation(self, instance: Any) -> Any:
+        with timed('serialize'):
+            return super().to_representation(instance)  # type: ignore[misc]
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -21,7 +60,16 @@ class ContentBlockSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class LetterTypeSerializer(serializers.ModelSerializer):
+class PublicContentBlockSerializer(ContentBlockSerializer):
+    """Content block as the public sees it (rich_text without its source ``html``)."""
+
+    def to_representation(self, instance: Any) -> Any:
+        data = super().to_representation(instance)
+        data['content'] = richtext.public_content(instance.block_type, data['content'])
+        return data
+
+
+class LetterTypeSerializer(SparseFieldsetsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for LetterType model."""
 
     class Meta:
@@ -29,14 +77,38 @@ class LetterTypeSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug', 'description', 'meta_schema', 'created_at', 'updated_at']
         read_only_fields = ['id', 'slug', 'created_at', 'updated_at']
 
+    def validate_meta_schema(self, value: Any) -> Any:
+        """Reject schemas that can't be compiled and ``indexed`` flags on properties that can't be indexed."""
+        errors = compile_errors(value) + properties.meta_schema_errors(value)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return value
+
 
-class LetterSerializer(serializers.ModelSerializer):
+class LetterTypeSummarySerializer(serializers.ModelSerializer):
+    """Compact LetterType representation for list views."""
+
+    class Meta:
+        model = LetterType
+        fields = ['id', 'name', 'slug']
+        read_only_fields = fields
+
+
+class LetterOpenStatsSerializer(serializers.Serializer):
+    """Public page opens of a letter (see ``letters.analytics``)."""
+    total = serializers.IntegerField(read_only=True)
+    last_24_hours = serializers.IntegerField(read_only=True)
+    last_opened_at = serializers.DateTimeField(read_only=True, allow_null=True)
+
+
+class LetterSerializer(SparseFieldsetsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Letter model."""
     content_blocks = ContentBlockSerializer(many=True, read_only=True)
     letter_type = LetterTypeSerializer(read_only=True)
     letter_type_id = serializers.UUIDField(write_only=True)
     public_url = serializers.CharField(source='get_public_url', read_only=True)
     created_by = UserSerializer(read_only=True)
+    open_stats = LetterOpenStatsSerializer(source='get_open_stats', read_only=True)
 
     class Meta:
         model = Letter
@@ -44,24 +116,54 @@ class LetterSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'recipient_name', 'slug',
             'letter_type', 'letter_type_id', 'custom_properties',
             'content_blocks', 'is_published', 'published_at',
-            'created_by', 'created_at', 'updated_at', 'public_url'
+            'created_by', 'created_at', 'updated_at', 'public_url', 'open_stats'
         ]
         read_only_fields = ['id', 'slug', 'created_by', 'created_at', 'updated_at']
 
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        """Check custom_properties against the letter type's meta schema."""
+        instance = self.instance if isinstance(self.instance, Letter) else None
+        letter_type = instance.letter_type if instance is not None else None
+        if 'letter_type_id' in attrs:
+            letter_type = LetterType.objects.filter(pk=attrs['letter_type_id']).first()
+            if letter_type is None:
+                raise serializers.ValidationError({'letter_type_id': ['Letter type not found.']})
+        if letter_type is not None:
+            custom_properties = attrs.get(
+                'custom_properties',
+                instance.custom_properties if instance is not None else {},
+            )
+            validate_custom_properties(letter_type, custom_properties)
+        return attrs
+
     def create(self, validated_data):  # type: ignore
         """Create letter with content blocks."""
         content_blocks_data = self.context.get('content_blocks', [])
         letter = Letter.objects.create(**validated_data)
+        sync_content_blocks(letter, content_blocks_data, existing=[])
+        return letter
 
-        for block_data in content_blocks_data:
-            ContentBlock.objects.create(letter=letter, **block_data)
 
-        return letter
+class LetterListSerializer(SparseFieldsetsMixin, TimedSerializerMixin, serializers.ModelSerializer):
+    """Summary serializer for the admin letter list (no blocks or schemas)."""
+    letter_type = LetterTypeSummarySerializer(read_only=True)
+    created_by = serializers.CharField(source='created_by.username', read_only=True)
+    block_count = serializers.IntegerField(read_only=True)
+    public_url = serializers.CharField(source='get_public_url', read_only=True)
 
+    class Meta:
+        model = Letter
+        fields = [
+            'id', 'title', 'recipient_name', 'slug', 'letter_type',
+            'block_count', 'is_published', 'published_at',
+            'created_by', 'created_at', 'updated_at', 'public_url'
+        ]
+        read_only_fields = fields
 
-class LetterPublicSerializer(serializers.ModelSerializer):
+
+class LetterPublicSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Public serializer for Letter model (no admin fields)."""
-    content_blocks = ContentBlockSerializer(many=True, read_only=True)
+    content_blocks = PublicContentBlockSerializer(many=True, read_only=True)
     letter_type = LetterTypeSerializer(read_only=True)
 
     class Meta:
@@ -0,0 +1,116 @@
+"""Model signal handlers keeping derived letter data in sync."""
+import time
+from typing import Any, Iterable, List
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from . import cache as public_cache
+from . import properties, search, snapshots, static_letters, timing, validation
+from .models import ContentBlock, Letter, LetterType
+
+
+# Sent with ``letter=`` after a letter's blocks are changed in bulk
+# (bulk_create/bulk_update/queryset delete send no model signals).
+content_blocks_changed = Signal()
+
+
+@receiver(connection_created)
+def record_connection_time(sender: Any, connection: Any, **kwargs: Any) -> None:
+    """Stamp new database connections so health checks can report their age."""
+    connection.connected_at = time.monotonic()
+
+
+@receiver(connection_created)
+def install_timing(sender: Any, connection: Any, **kwargs: Any) -> None:
+    """Count every connection's queries towards the current request's timings."""
+    timing.install(connection)
+
+
+def invalidate_public_cache(slugs: Iterable[str]) -> None:
+    """Invalidate cached public responses and static files once the current transaction commits."""
+    slugs = [slug for slug in set(slugs) if slug]
+    if slugs:
+        transaction.on_commit(lambda: _public_letters_changed(slugs))
+
+
+def _public_letters_changed(slugs: List[str]) -> None:
+    public_cache.invalidate(slugs)
+    static_letters.sync(slugs)
+
+
+def _letter_slugs(letter_ids: Iterable[Any]) -> List[str]:
+    return list(Letter.objects.filter(pk__in=list(letter_ids)).values_list('slug', flat=True))
+
+
+@receiver(pre_save, sender=Letter)
+def remember_previous_slug(sender: Any, instance: Letter, **kwargs: Any) -> None:
+    """Record the stored slug so a renamed letter also drops its old cache entry.
+
+    Also keeps ``published_at`` meaningful for the publisher: publishing
+    stamps it if unset, and unpublishing clears it unless it is a future
+    time (the letter is being rescheduled), so the draft isn't published again.
+    Only a letter this instance was loaded (or last saved) as published counts
+    as unpublished: saving a copy loaded before ``run_publisher`` published it
+    keeps the time, and the publisher publishes it again.
+    """
+    stored = None
+    if not instance._state.adding:
+        stored = Letter.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+    instance._previous_slug = stored  # type: ignore[attr-defined]
+    now = timezone.now()
+    if instance.is_published and instance.published_at is None:
+        instance.published_at = now
+    elif instance._saved_is_published and not instance.is_published:
+        if instance.published_at is not None and instance.published_at <= now:
+            instance.published_at = None
+
+
+@receiver(post_save, sender=Letter)
+@receiver(post_delete, sender=Letter)
+def letter_changed(sender: Any, instance: Letter, signal: Any, **kwargs: Any) -> None:
+    if signal is post_save:
+        instance._saved_is_published = instance.is_published
+        properties.index_letters([instance], created=kwargs.get('created', False))
+        snapshots.refresh_snapshots([instance.pk])
+        search.schedule_reindex([instance.pk])
+    invalidate_public_cache([instance.slug, getattr(instance, '_previous_slug', None) or ''])
+
+
+@receiver(pre_save, sender=LetterType)
+def remember_indexed_properties(sender: Any, instance: LetterType, **kwargs: Any) -> None:
+    """Record which properties the stored schema indexes, to rebuild its letters' values on change."""
+    stored = None
+    if not instance._state.adding:
+        stored = LetterType.objects.filter(pk=instance.pk).values_list('meta_schema', flat=True).first()
+    instance._previous_indexed = properties.indexed_properties(stored)  # type: ignore[attr-defined]
+
+
+@receiver(post_save, sender=LetterType)
+@receiver(post_delete, sender=LetterType)
+def letter_type_changed(sender: Any, instance: LetterType, signal: Any, **kwargs: Any) -> None:
+    validation.forget(instance.pk)
+    letters = Letter.objects.filter(letter_type_id=instance.pk)
+    if signal is post_save:
+        if properties.indexed_properties(instance.meta_schema) != getattr(instance, '_previous_indexed', {}):
+            properties.reindex_letter_type(instance.pk)
+        snapshots.refresh_snapshots(letters.filter(is_published=True).values_list('pk', flat=True))
+    invalidate_public_cache(letters.values_list('slug', flat=True))
+
+
+@receiver(post_save, sender=ContentBlock)
+@receiver(post_delete, sender=ContentBlock)
+def content_block_changed(sender: Any, instance: ContentBlock, **kwargs: Any) -> None:
+    snapshots.refresh_snapshots([instance.letter_id])
+    search.schedule_reindex([instance.letter_id])
+    invalidate_public_cache(_letter_slugs([instance.letter_id]))
+
+
+@receiver(content_blocks_changed)
+def content_blocks_synced(sender: Any, letter: Letter, **kwargs: Any) -> None:
+    snapshots.refresh_snapshots([letter.pk])
+    search.schedule_reindex([letter.pk])
+    invalidate_public_cache([letter.slug])
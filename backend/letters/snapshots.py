@@ -0,0 +1,85 @@
+"""Materialized public snapshots of published letters.
+
+The public JSON of a published letter is rendered once, when it is published
+or edited, and stored on ``Letter.public_snapshot``. The public endpoint then
+serves it with a single indexed row read. Snapshots are regenerated inside the
+transaction that changed the letter, so readers never see a half-updated one.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, List, Optional, Set
+
+from django.utils import timezone
+
+from . import richtext
+from .models import ContentBlock, Letter
+
+
+_deferred = threading.local()
+
+
+def render_snapshot(letter: Letter) -> str:
+    """Render the public JSON for a letter."""
+    # Imported here: serializers -> blocks -> signals -> snapshots.
+    from .serialization import render_public_letter
+    return render_public_letter(letter).decode('utf-8')
+
+
+def refresh_snapshots(letter_ids: Iterable[Any]) -> None:
+    """Regenerate snapshots of published letters and clear unpublished ones.
+
+    Inside a ``deferred()`` block the work is postponed until the block exits.
+    """
+    letter_ids = list(letter_ids)
+    if not letter_ids:
+        return
+    pending: Optional[Set[Any]] = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        pending.update(letter_ids)
+        return
+
+    Letter.objects.filter(
+        pk__in=letter_ids, is_published=False, public_snapshot__isnull=False,
+    ).update(public_snapshot=None)
+    published = (
+        Letter.objects.filter(pk__in=letter_ids, is_published=True)
+        .select_related('letter_type')
+        .prefetch_related('content_blocks')
+    )
+    for letter in published:
+        rerender_stale_blocks(letter.content_blocks.all())
+        Letter.objects.filter(pk=letter.pk).update(public_snapshot=render_snapshot(letter))
+
+
+def rerender_stale_blocks(blocks: Iterable[ContentBlock]) -> List[ContentBlock]:
+    """Re-render rich_text blocks stored by an older sanitizer, in place and in the database."""
+    stale = [block for block in blocks if richtext.is_stale(block.block_type, block.content)]
+    now = timezone.now()
+    for block in stale:
+        block.content = richtext.prepare_content(block.block_type, block.content)
+        # Bumped by hand (bulk_update skips auto_now): it feeds the letter's ETag.
+        block.updated_at = now
+    if stale:
+        ContentBlock.objects.bulk_update(stale, ['content', 'updated_at'])
+    return stale
+
+
+def refresh_snapshot(letter_id: Any) -> Optional[str]:
+    """Regenerate one letter's snapshot and return it (``None`` if unpublished)."""
+    refresh_snapshots([letter_id])
+    return Letter.objects.filter(pk=letter_id).values_list('public_snapshot', flat=True).first()
+
+
+@contextmanager
+def deferred() -> Iterator[None]:
+    """Coalesce snapshot refreshes requested in this block into one pass at exit."""
+    if getattr(_deferred, 'pending', None) is not None:
+        yield
+        return
+    _deferred.pending = set()
+    try:
+        yield
+        letter_ids: List[Any] = list(_deferred.pending)
+    finally:
+        _deferred.pending = None
+    refresh_snapshots(letter_ids)
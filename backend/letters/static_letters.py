@@ -0,0 +1,147 @@
+"""Pre-generated public letter files that nginx serves without reaching Django.
+
+When ``LETTERS_STATIC_ROOT`` is set, each published letter's public JSON (its
+snapshot) is kept there as ``<slug>.json`` with precompressed
+``<slug>.json.gz`` and ``<slug>.json.br`` next to it. nginx answers
+``/api/letters/<slug>/`` from these files and falls back to Django when there
+is none (see ``nginx/conf.d/default.conf``). The files of the letters a
+transaction touched are rewritten or removed once it commits;
+``manage.py build_static_letters`` rewrites them all.
+
+Every file is written under a temporary name and renamed into place, the
+compressed variants before ``.json``, so nginx never reads a partial file.
+Removal goes the other way: ``.json`` first, which sends requests straight
+back to Django.
+"""
+import gzip
+import importlib
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from .models import Letter
+
+brotli: Optional[ModuleType]
+try:
+    brotli = importlib.import_module('brotli')
+except ImportError:  # pragma: no cover - .br files are skipped without it
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+# Must match the slug pattern of the nginx location.
+SLUG_PATTERN = re.compile(r'^[-a-zA-Z0-9_]+$')
+SUFFIXES = ('.json.br', '.json.gz', '.json')
+CHUNK_SIZE = 500
+
+
+def get_root() -> Optional[Path]:
+    """Return the output directory, or ``None`` when static letters are off."""
+    root = getattr(settings, 'LETTERS_STATIC_ROOT', '')
+    return Path(root) if root else None
+
+
+def encode(body: bytes) -> Dict[str, bytes]:
+    """Return the file contents to write for a letter, by suffix."""
+    files = {'.json': body, '.json.gz': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        files['.json.br'] = brotli.compress(body, mode=brotli.MODE_TEXT, quality=11)
+    return files
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(data)
+        # mkstemp creates the file 0600; nginx runs as another user.
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def write_letter(root: Path, slug: str, body: bytes) -> bool:
+    """Write one letter's files; return ``False`` for slugs nginx can't route."""
+    if not SLUG_PATTERN.match(slug):
+        return False
+    root.mkdir(parents=True, exist_ok=True)
+    files = encode(body)
+    for suffix in SUFFIXES:
+        if suffix in files:
+            _write_atomic(root / f'{slug}{suffix}', files[suffix])
+        else:
+            (root / f'{slug}{suffix}').unlink(missing_ok=True)
+    return True
+
+
+def remove_letter(root: Path, slug: str) -> None:
+    """Remove one letter's files so its requests fall back to Django."""
+    if not SLUG_PATTERN.match(slug):
+        return
+    for suffix in reversed(SUFFIXES):
+        (root / f'{slug}{suffix}').unlink(missing_ok=True)
+
+
+def write_batch(root: str, letters: List[Tuple[str, str]]) -> List[str]:
+    """Write ``(slug, snapshot)`` pairs and return the slugs written (runs in a worker)."""
+    return [slug for slug, snapshot in letters if write_letter(Path(root), slug, snapshot.encode('utf-8'))]
+
+
+def stored_slugs(root: Path, before: Optional[float] = None) -> List[str]:
+    """Slugs that currently have a ``.json`` file under ``root``.
+
+    With ``before`` (a timestamp), only files last written before then count.
+    """
+    if not root.is_dir():
+        return []
+    slugs = []
+    for path in root.glob('*.json'):
+        if before is not None:
+            try:
+                if path.stat().st_mtime >= before:
+                    continue
+            except FileNotFoundError:
+                continue
+        slugs.append(path.name[:-len('.json')])
+    return slugs
+
+
+def sync(slugs: Iterable[str]) -> None:
+    """Bring the files of ``slugs`` in line with the database.
+
+    Published letters are rewritten from their snapshot; any other slug
+    (unpublished, deleted or renamed away) loses its files. A failed write
+    removes the letter's files rather than leave a stale copy public.
+    """
+    root = get_root()
+    if root is None:
+        return
+    slugs = [slug for slug in set(slugs) if slug]
+    for start in range(0, len(slugs), CHUNK_SIZE):
+        chunk = slugs[start:start + CHUNK_SIZE]
+        published = dict(
+            Letter.objects.filter(slug__in=chunk, is_published=True, public_snapshot__isnull=False)
+            .values_list('slug', 'public_snapshot')
+        )
+        for slug in chunk:
+            try:
+                snapshot = published.get(slug)
+                if snapshot is not None:
+                    write_letter(root, slug, snapshot.encode('utf-8'))
+                else:
+                    remove_letter(root, slug)
+            except OSError:
+                logger.exception('Could not update static files of letter %r', slug)
+                try:
+                    remove_letter(root, slug)
+                except OSError:
+                    pass
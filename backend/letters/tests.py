@@ -1,3 +1,1534 @@
-from django.test import TestCase
+import base64
+import gzip
+import importlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Set
+from unittest import mock, skipIf
 
-# Create your tests here.
+import brotli
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, DataError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models.signals import post_delete
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from prometheus_client import REGISTRY
+from rest_framework import serializers as drf_serializers
+
+from . import analytics, async_views, health, images, metrics, properties, publisher, richtext, search, serialization, snapshots, static_letters, timing, views
+from . import cache as public_cache
+from .admin import LetterAdmin, LetterAdminForm, LetterTypeAdminForm
+from .blocks import sync_content_blocks
+from . import pagination
+from .db.base import PooledDatabaseWrapperMixin
+from .db.pool import ConnectionPool, PoolTimeout
+from .models import ContentBlock, Letter, LetterOpenCount, LetterPropertyValue, LetterSearchDocument, LetterType, User
+from .serialization import render_letter, render_public_letter
+from .signals import content_blocks_changed
+from .transfer import LetterImporter
+from .validation import compile_errors, get_validator, validate_custom_properties
+
+
+def make_letter(title: str, **kwargs) -> Letter:  # type: ignore
+    defaults = {
+        'description': 'A letter',
+        'recipient_name': 'Santa',
+        'letter_type': LetterType.objects.get_or_create(name='Christmas', defaults={'description': 'Festive'})[0],
+        'created_by': User.objects.get_or_create(username='elf', defaults={'email': 'elf@example.com'})[0],
+    }
+    defaults.update(kwargs)
+    return Letter.objects.create(title=title, **defaults)
+
+
+# Sampled request timings would otherwise log at random throughout the run.
+quiet_timing = override_settings(LETTERS_TIMING_LOG_SAMPLE_RATE=0)
+
+
+def setUpModule() -> None:
+    quiet_timing.enable()
+
+
+def tearDownModule() -> None:
+    quiet_timing.disable()
+
+
+class LetterSlugTests(TestCase):
+    """Slug allocation for letters sharing a title."""
+
+    def test_duplicate_titles_get_increasing_suffixes(self) -> None:
+        slugs = [make_letter('Merry Christmas').slug for _ in range(3)]
+        self.assertEqual(slugs, ['merry-christmas', 'merry-christmas-1', 'merry-christmas-2'])
+
+    def test_next_suffix_follows_highest_taken(self) -> None:
+        make_letter('Merry Christmas')
+        make_letter('Merry Christmas', slug='merry-christmas-41')
+        make_letter('Merry Christmas Eve')
+        self.assertEqual(make_letter('Merry Christmas').slug, 'merry-christmas-42')
+
+    def test_long_numeric_suffixes_are_not_counted(self) -> None:
+        make_letter('Merry Christmas')
+        make_letter('Merry Christmas', slug='merry-christmas-5')
+        # Would overflow PostgreSQL's integer cast.
+        make_letter('Merry Christmas', slug='merry-christmas-55512345678')
+        self.assertEqual(make_letter('Merry Christmas').slug, 'merry-christmas-6')
+
+    def test_free_base_slug_is_reused(self) -> None:
+        make_letter('Merry Christmas', slug='merry-christmas-3')
+        self.assertEqual(make_letter('Merry Christmas').slug, 'merry-christmas')
+
+    def test_slug_lookup_is_a_single_query(self) -> None:
+        for _ in range(20):
+            make_letter('Merry Christmas')
+        with self.assertNumQueries(1):
+            slug = Letter(title='Merry Christmas').next_free_slug('merry-christmas')
+        self.assertEqual(slug, 'merry-christmas-20')
+
+    def test_collision_is_retried_in_a_savepoint(self) -> None:
+        make_letter('Merry Christmas')
+        # Simulate a concurrent create claiming the slug between lookup and insert.
+        with mock.patch.object(Letter, 'next_free_slug', side_effect=['merry-christmas', 'merry-christmas-1']):
+            letter = make_letter('Merry Christmas')
+        self.assertEqual(letter.slug, 'merry-christmas-1')
+
+
+class ContentBlockSyncTests(TestCase):
+    """Diffing a letter's blocks against an incoming payload."""
+
+    def setUp(self) -> None:
+        self.letter = make_letter('Merry Christmas')
+        self.blocks = sync_content_blocks(self.letter, [self.text(order, f'Block {order}') for order in range(3)], existing=[])
+
+    def text(self, order: int, text: str, block_id: Any = None) -> Dict[str, Any]:
+        data: Dict[str, Any] = {'block_type': 'text', 'order': order, 'content': {'text': text}}
+        if block_id is not None:
+            data['id'] = str(block_id)
+        return data
+
+    def stored(self) -> List[Any]:
+        return list(ContentBlock.objects.filter(letter=self.letter).values_list('pk', 'order', 'content'))
+
+    def sync(self, blocks_data: List[Dict[str, Any]]) -> List[ContentBlock]:
+        letter = Letter.objects.prefetch_related('content_blocks').get(pk=self.letter.pk)
+        return sync_content_blocks(letter, blocks_data)
+
+    def test_create_update_and_delete(self) -> None:
+        first, second, third = self.blocks
+        synced = self.sync([
+            self.text(0, 'Changed', first.pk),
+            self.text(2, 'Block 2'),
+            self.text(3, 'New'),
+        ])
+        self.assertEqual([block.pk for block in synced[:2]], [first.pk, third.pk])
+        self.assertEqual(self.stored(), [
+            (first.pk, 0, {'text': 'Changed'}),
+            (third.pk, 2, {'text': 'Block 2'}),
+            (synced[2].pk, 3, {'text': 'New'}),
+        ])
+        self.assertFalse(ContentBlock.objects.filter(pk=second.pk).exists())
+
+    def test_reorder_and_swap_keep_ids(self) -> None:
+        first, second, third = self.blocks
+        self.sync([
+            self.text(1, 'Block 0', first.pk),
+            self.text(0, 'Block 1', second.pk),
+            self.text(5, 'Block 2', third.pk),
+        ])
+        self.assertEqual(self.stored(), [
+            (second.pk, 0, {'text': 'Block 1'}),
+            (first.pk, 1, {'text': 'Block 0'}),
+            (third.pk, 5, {'text': 'Block 2'}),
+        ])
+
+    def test_unknown_ids_create_new_blocks(self) -> None:
+        other = make_letter('Happy Holidays')
+        foreign = ContentBlock.objects.create(letter=other, block_type='text', order=0, content={'text': 'Theirs'})
+        synced = self.sync([self.text(7, 'Mine', foreign.pk), self.text(8, 'Random', uuid.uuid4())])
+
+        self.assertEqual([block.order for block in synced], [7, 8])
+        self.assertNotIn(foreign.pk, [block.pk for block in synced])
+        self.assertEqual(ContentBlock.objects.get(pk=foreign.pk).content, {'text': 'Theirs'})
+        self.assertEqual(len(self.stored()), 2)
+
+    def test_invalid_payloads_are_rejected_per_block(self) -> None:
+        with self.assertRaises(drf_serializers.ValidationError) as raised:
+            self.sync([self.text(0, 'Fine'), {**self.text(1, 'Bad'), 'id': 'not-a-uuid'}, {'block_type': 'text'}])
+        self.assertEqual(set(raised.exception.detail['content_blocks']), {'1', '2'})  # type: ignore[call-overload]
+        with self.assertRaises(drf_serializers.ValidationError):
+            self.sync([self.text(0, 'One'), self.text(0, 'Two')])
+        self.assertEqual(len(self.stored()), 3)
+
+    def test_changes_send_one_signal_and_refill_the_prefetch(self) -> None:
+        changed, deleted = mock.Mock(), mock.Mock()
+        content_blocks_changed.connect(changed)
+        post_delete.connect(deleted, sender=ContentBlock)
+        self.addCleanup(content_blocks_changed.disconnect, changed)
+        self.addCleanup(post_delete.disconnect, deleted, sender=ContentBlock)
+
+        letter = Letter.objects.prefetch_related('content_blocks').get(pk=self.letter.pk)
+        synced = sync_content_blocks(letter, [self.text(0, 'Only')])
+        self.assertEqual(changed.call_count, 1)
+        deleted.assert_not_called()
+        with self.assertNumQueries(0):
+            self.assertEqual(list(letter.content_blocks.all()), synced)
+
+        sync_content_blocks(letter, [self.text(0, 'Only', synced[0].pk)])
+        self.assertEqual(changed.call_count, 1)
+
+    def shifted(self, count: int) -> List[Dict[str, Any]]:
+        # Against blocks 0..count-1 this updates all but one, deletes one and creates one.
+        return [self.text(order, f'Shifted {order}') for order in range(1, count + 1)]
+
+    def test_query_count_does_not_grow_with_blocks(self) -> None:
+        def queries(count: int) -> int:
+            letter = make_letter('Merry Christmas')
+            sync_content_blocks(letter, [self.text(order, 'Block') for order in range(count)], existing=[])
+            letter = Letter.objects.prefetch_related('content_blocks').get(pk=letter.pk)
+            with CaptureQueriesContext(connection) as captured:
+                sync_content_blocks(letter, self.shifted(count))
+            return len(captured)
+
+        self.assertEqual(queries(3), queries(30))
+
+    def test_api_update_query_count_does_not_grow_with_blocks(self) -> None:
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+
+        def queries(count: int) -> int:
+            letter = make_letter('Merry Christmas', is_published=True)
+            sync_content_blocks(letter, [self.text(order, 'Block') for order in range(count)], existing=[])
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.patch(
+                    f'/api/admin/letters/{letter.pk}/', {'content_blocks': self.shifted(count)}, content_type='application/json',
+                )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['content_blocks']), count)
+            return len(captured)
+
+        self.assertEqual(queries(3), queries(30))
+
+
+class SerializationEngineTests(TestCase):
+    """The pydantic engine must render exactly what the DRF serializers do."""
+
+    def test_engines_render_identical_bytes(self) -> None:
+        numbers = {'big': 1e20, 'small': 3.5e-7, 'tiny': 1e-5, 'plain': 1.5, 'list': [1e16, -0.0]}
+        letter = make_letter('Merry Christmas', custom_properties={'year': 2026, 'note': 'línea\u2028nueva', **numbers})
+        ContentBlock.objects.create(letter=letter, block_type='text', order=0, content={'text': 'Ho ho\n"ho"', **numbers})
+        ContentBlock.objects.create(letter=letter, block_type='image', order=1, content={'url': '/a.jpg', 'caption': None})
+        ContentBlock.objects.create(letter=letter, block_type='rich_text', order=2, content={'html': '<i>Ho</i>'})
+        letter = Letter.objects.select_related('letter_type', 'created_by').prefetch_related('content_blocks').get()
+
+        self.assertEqual(render_public_letter(letter, 'pydantic'), render_public_letter(letter, 'drf'))
+        self.assertEqual(render_letter(letter, 'pydantic'), render_letter(letter, 'drf'))
+        self.assertEqual(json.loads(render_public_letter(letter))['custom_properties']['small'], 3.5e-7)
+
+    def test_retrieve_renders_unvalidated_author_emails(self) -> None:
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        for email in ['', 'admin@localhost']:
+            author = User.objects.create_user(f'author-{len(email)}', email=email)
+            letter = make_letter('Merry Christmas', created_by=author)
+            bodies = []
+            for engine in serialization.ENGINES:
+                with self.subTest(email=email, engine=engine), override_settings(LETTERS_SERIALIZATION_ENGINE=engine):
+                    response = self.client.get(f'/api/admin/letters/{letter.pk}/')
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response.json()['created_by']['email'], email)
+                    bodies.append(response.content)
+            self.assertEqual(bodies[0], bodies[1])
+
+
+class AsyncPublicViewTests(TestCase):
+    """The async public view serves the same responses as the sync one."""
+
+    def setUp(self) -> None:
+        public_cache.clear()
+        self.addCleanup(public_cache.clear)
+
+    async def test_async_view_matches_sync_view(self) -> None:
+        letter = await Letter.objects.acreate(
+            title='Merry Christmas', recipient_name='Grandma', is_published=True,
+            letter_type=await LetterType.objects.acreate(name='Christmas', description='Festive'),
+            created_by=await User.objects.acreate(username='santa'),
+        )
+        await ContentBlock.objects.acreate(letter=letter, block_type='text', order=0, content={'text': 'Ho ho ho'})
+
+        response = await async_views.letter_public_view(AsyncRequestFactory().get('/'), letter.slug)
+        expected = await sync_to_async(views.render_public_letter)(letter.slug)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected.body)
+
+        missing = await async_views.letter_public_view(AsyncRequestFactory().get('/'), 'missing')
+        self.assertEqual(missing.status_code, 404)
+        not_allowed = await async_views.letter_public_view(AsyncRequestFactory().post('/'), letter.slug)
+        self.assertEqual(not_allowed.status_code, 405)
+
+
+class PublicCacheTests(TestCase):
+    """Cached public responses and their invalidation."""
+
+    def setUp(self) -> None:
+        public_cache.clear()
+        self.addCleanup(public_cache.clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.letter = make_letter('Merry Christmas', is_published=True)
+            self.block = ContentBlock.objects.create(letter=self.letter, block_type='text', order=0, content={'text': 'Ho ho ho'})
+
+    def get(self, slug: str) -> Any:
+        return self.client.get(f'/api/letters/{slug}/')
+
+    def cached(self, slug: str) -> Any:
+        return public_cache.get_backend().get(public_cache.cache_key(slug))
+
+    def test_hit_skips_the_database(self) -> None:
+        first = self.get(self.letter.slug)
+        with self.assertNumQueries(0):
+            second = self.get(self.letter.slug)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+
+    def test_saves_invalidate_the_letter(self) -> None:
+        def save_letter() -> None:
+            self.letter.title = 'Happy Holidays'
+            self.letter.save()
+
+        def save_type() -> None:
+            self.letter.letter_type.description = 'Cosy'
+            self.letter.letter_type.save()
+
+        def save_block() -> None:
+            self.block.content = {'text': 'Ho ho ho ho'}
+            self.block.save()
+
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        for backend in ['lru', 'django']:
+            with override_settings(CACHES=shared, LETTERS_PUBLIC_CACHE={'BACKEND': backend, 'ALIAS': 'default'}):
+                for change in [save_letter, save_type, save_block]:
+                    with self.subTest(backend=backend, change=change.__name__):
+                        self.get(self.letter.slug)
+                        self.assertIsNotNone(self.cached(self.letter.slug))
+                        with self.captureOnCommitCallbacks(execute=True):
+                            change()
+                        self.assertIsNone(self.cached(self.letter.slug))
+                        body = self.get(self.letter.slug).json()
+                        self.assertEqual(body['title'], 'Happy Holidays')
+
+        self.assertEqual(body['letter_type']['description'], 'Cosy')
+        self.assertEqual(body['content_blocks'][0]['content'], {'text': 'Ho ho ho ho'})
+
+    def test_rename_drops_the_old_slug(self) -> None:
+        old_slug = self.letter.slug
+        self.assertEqual(self.get(old_slug).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.letter.slug = 'happy-holidays'
+            self.letter.save()
+        self.assertEqual(self.get(old_slug).status_code, 404)
+        self.assertEqual(self.get('happy-holidays').status_code, 200)
+
+    def test_not_found_is_cached_for_its_own_timeout(self) -> None:
+        with mock.patch('letters.cache.time') as clock:
+            clock.monotonic.return_value = 1000.0
+            self.assertEqual(self.get('missing').status_code, 404)
+            clock.monotonic.return_value = 1000.0 + public_cache.DEFAULTS['NOT_FOUND_TIMEOUT'] - 1
+            with self.assertNumQueries(0):
+                self.assertEqual(self.get('missing').status_code, 404)
+            clock.monotonic.return_value = 1000.0 + public_cache.DEFAULTS['NOT_FOUND_TIMEOUT']
+            self.assertIsNone(self.cached('missing'))
+            self.assertEqual(public_cache.DEFAULTS['NOT_FOUND_TIMEOUT'], settings.LETTERS_PUBLIC_CACHE['NOT_FOUND_TIMEOUT'])
+            self.assertEqual(public_cache.DEFAULTS['TIMEOUT'], settings.LETTERS_PUBLIC_CACHE['TIMEOUT'])
+
+
+class SnapshotTests(TestCase):
+    """Stored public snapshots of published letters."""
+
+    def setUp(self) -> None:
+        public_cache.clear()
+        self.addCleanup(public_cache.clear)
+        self.letter = make_letter('Merry Christmas', is_published=True)
+        self.block = ContentBlock.objects.create(letter=self.letter, block_type='text', order=0, content={'text': 'Ho ho ho'})
+
+    def snapshot(self) -> Any:
+        stored = Letter.objects.values_list('public_snapshot', flat=True).get(pk=self.letter.pk)
+        return json.loads(stored) if stored is not None else None
+
+    def rendered(self) -> Any:
+        letter = Letter.objects.select_related('letter_type').prefetch_related('content_blocks').get(pk=self.letter.pk)
+        return json.loads(render_public_letter(letter))
+
+    def test_refresh_renders_published_and_clears_unpublished(self) -> None:
+        draft = make_letter('Draft')
+        Letter.objects.filter(pk__in=[self.letter.pk, draft.pk]).update(public_snapshot='stale')
+        snapshots.refresh_snapshots([self.letter.pk, draft.pk])
+
+        self.assertEqual(self.snapshot(), self.rendered())
+        self.assertIsNone(Letter.objects.values_list('public_snapshot', flat=True).get(pk=draft.pk))
+
+    def test_type_and_block_changes_refresh_the_snapshot(self) -> None:
+        self.letter.letter_type.description = 'Cosy'
+        self.letter.letter_type.save()
+        self.assertEqual(self.snapshot()['letter_type']['description'], 'Cosy')
+
+        self.block.content = {'text': 'Ho ho ho ho'}
+        self.block.save()
+        self.assertEqual(self.snapshot()['content_blocks'][0]['content'], {'text': 'Ho ho ho ho'})
+
+        self.block.delete()
+        self.assertEqual(self.snapshot()['content_blocks'], [])
+
+        self.letter.is_published = False
+        self.letter.save()
+        self.assertIsNone(self.snapshot())
+
+    def test_deferred_refreshes_once_at_exit(self) -> None:
+        with mock.patch.object(snapshots, 'render_snapshot', wraps=snapshots.render_snapshot) as render:
+            with snapshots.deferred():
+                self.letter.title = 'Happy Holidays'
+                self.letter.save()
+                with snapshots.deferred():
+                    self.block.content = {'text': 'Fa la la'}
+                    self.block.save()
+                render.assert_not_called()
+            self.assertEqual(render.call_count, 1)
+        self.assertEqual(self.snapshot(), self.rendered())
+
+    def test_deferred_drops_pending_refreshes_on_error(self) -> None:
+        with self.assertRaises(RuntimeError), transaction.atomic(), snapshots.deferred():
+            self.letter.title = 'Happy Holidays'
+            self.letter.save()
+            raise RuntimeError
+        self.assertEqual(self.snapshot()['title'], 'Merry Christmas')
+        # Outside the failed block refreshes happen immediately again.
+        self.letter.save()
+        self.assertEqual(self.snapshot()['title'], 'Happy Holidays')
+
+    def test_letters_published_before_snapshots_are_built_on_first_read(self) -> None:
+        Letter.objects.filter(pk=self.letter.pk).update(public_snapshot=None)
+        response = self.client.get(f'/api/letters/{self.letter.slug}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.rendered())
+        self.assertEqual(self.snapshot(), self.rendered())
+
+
+@override_settings(LETTERS_HEALTH_READY_TTL=60)
+class HealthCheckTests(TestCase):
+    """Liveness does no I/O; readiness checks the database and caches its result."""
+
+    def setUp(self) -> None:
+        health.reset()
+        self.addCleanup(health.reset)
+
+    def test_live(self) -> None:
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/health/live/')
+        self.assertEqual(response.json()['status'], 'alive')
+
+    def test_ready_is_cached(self) -> None:
+        response = self.client.get('/api/health/ready/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['checks']['database']['status'], 'ok')
+        self.assertFalse(response.json()['cached'])
+        with self.assertNumQueries(0):
+            self.assertTrue(self.client.get('/api/health/ready/').json()['cached'])
+
+    def test_pending_migrations_are_not_ready(self) -> None:
+        with mock.patch.object(health, 'check_migrations', return_value={'status': 'pending', 'pending': ['x.0001']}):
+            response = self.client.get('/api/health/ready/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'not_ready')
+
+    @override_settings(LETTERS_HEALTH_READY_TTL=0)
+    def test_concurrent_probes_get_the_previous_report_while_one_checks(self) -> None:
+        previous = health.readiness()
+        started, release = threading.Event(), threading.Event()
+
+        def slow_checks() -> Dict[str, Any]:
+            started.set()
+            release.wait(5)
+            return {**previous, 'status': 'refreshed'}
+
+        with mock.patch.object(health, 'run_readiness_checks', side_effect=slow_checks) as checks:
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                refreshing = pool.submit(health.readiness)
+                self.assertTrue(started.wait(5))
+                meanwhile = health.readiness()
+                release.set()
+                self.assertEqual(refreshing.result()['status'], 'refreshed')
+        self.assertEqual(checks.call_count, 1)
+        self.assertEqual((meanwhile['status'], meanwhile['cached']), (previous['status'], True))
+
+    def test_migrations_are_not_rechecked_once_applied(self) -> None:
+        with mock.patch('letters.health.MigrationExecutor', wraps=MigrationExecutor) as executor:
+            self.assertEqual(health.check_migrations()['status'], 'ok')
+            with self.assertNumQueries(0):
+                self.assertEqual(health.check_migrations(), {'status': 'ok', 'pending': []})
+        self.assertEqual(executor.call_count, 1)
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """The pool bounds, validates and evicts connections (SQLite stand-in)."""
+
+    def make_pool(self, **kwargs: Any) -> ConnectionPool:
+        def ping(raw: sqlite3.Connection) -> bool:
+            raw.execute('SELECT 1')
+            return True
+        pool = ConnectionPool(connect=lambda: sqlite3.connect(':memory:', check_same_thread=False), check=ping, **kwargs)
+        self.addCleanup(pool.close_all)
+        return pool
+
+    def test_reuses_and_bounds_connections(self) -> None:
+        pool = self.make_pool(max_size=2, timeout=0.05)
+        first, second = pool.acquire(), pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        pool.release(first.raw)
+        self.assertIs(pool.acquire().raw, first.raw)
+        self.assertEqual(pool.snapshot()['created'], 2)
+        self.assertEqual(pool.snapshot()['timeouts'], 1)
+
+    def test_broken_connections_are_replaced(self) -> None:
+        pool = self.make_pool()
+        entry = pool.acquire()
+        pool.release(entry.raw)
+        entry.raw.close()
+        self.assertIsNot(pool.acquire().raw, entry.raw)
+        self.assertEqual(pool.snapshot()['failed_checks'], 1)
+
+        discarded = pool.acquire()
+        pool.release(discarded.raw, discard=True)
+        self.assertEqual(pool.snapshot()['size'], 1)
+
+    def test_idle_and_old_connections_are_closed(self) -> None:
+        pool = self.make_pool(max_idle=0)
+        pool.release(pool.acquire().raw)
+        pool.acquire()
+        self.assertEqual(pool.snapshot()['closed'], 1)
+
+        pool = self.make_pool(max_lifetime=0)
+        pool.release(pool.acquire().raw)
+        self.assertEqual(pool.snapshot()['idle'], 0)
+
+
+class PooledBackendTests(SimpleTestCase):
+    """The pooled Django backend gets back connections that threads never closed."""
+
+    def test_connections_of_exited_threads_are_reclaimed(self) -> None:
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        handler = ConnectionHandler({'default': {
+            'ENGINE': 'letters.db.sqlite3',
+            'NAME': os.path.join(directory, 'pool.sqlite3'),
+            'CONN_MAX_AGE': 0,
+            'POOL': {'MAX_SIZE': 2, 'TIMEOUT': 5},
+        }})
+        wrapper = handler['default']
+        assert isinstance(wrapper, PooledDatabaseWrapperMixin)
+        pool = wrapper.pool
+        self.addCleanup(pool.close_all)
+        errors = []
+
+        def query_without_closing() -> None:
+            try:
+                with handler['default'].cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            except Exception as exc:
+                errors.append(exc)
+
+        for _ in range(5):
+            thread = threading.Thread(target=query_without_closing)
+            thread.start()
+            thread.join()
+
+        self.assertEqual(errors, [])
+        snapshot = pool.snapshot()
+        self.assertEqual((snapshot['size'], snapshot['reclaimed'], snapshot['waits']), (1, 4, 0))
+
+
+class ImageUploadTests(TestCase):
+    """Uploads are stored by hash with metadata-free variants."""
+
+    def setUp(self) -> None:
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+
+    def upload(self) -> SimpleUploadedFile:
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera Maker'
+        out = io.BytesIO()
+        Image.new('RGB', (1000, 500), (200, 30, 30)).save(out, format='JPEG', exif=exif)
+        return SimpleUploadedFile('photo.jpg', out.getvalue(), content_type='image/jpeg')
+
+    def test_upload_builds_variants_and_deduplicates(self) -> None:
+        response = self.client.post('/api/admin/images/', {'file': self.upload()})
+        self.assertEqual(response.status_code, 201)
+        content = response.json()
+        self.assertEqual((content['width'], content['height']), (1000, 500))
+        self.assertIn(f"images/{content['hash'][:2]}/{content['hash']}/", content['url'])
+        # Variants never upscale: the desktop one keeps the original 1000px.
+        widths = [entry.rsplit(' ', 1)[1] for entry in content['srcset']['webp'].split(', ')]
+        self.assertEqual(widths, ['320w', '768w', '1000w'])
+
+        with Image.open(self.stored(content['url'])) as variant:
+            self.assertEqual(variant.width, 1000)
+            self.assertEqual(len(variant.getexif()), 0)
+
+        again = self.client.post('/api/admin/images/', {'file': self.upload()})
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json(), content)
+
+    def test_rejects_non_images(self) -> None:
+        bogus = SimpleUploadedFile('x.jpg', b'not an image', content_type='image/jpeg')
+        response = self.client.post('/api/admin/images/', {'file': bogus})
+        self.assertEqual(response.status_code, 400)
+
+    def test_concurrent_uploads_of_one_image_share_its_files(self) -> None:
+        first = self.client.post('/api/admin/images/', {'file': self.upload()}).json()
+        # As if a concurrent upload wrote every file between the check and the save.
+        exists, checked = default_storage.exists, set()
+
+        def racing_exists(name: str) -> bool:
+            if name in checked:
+                return bool(exists(name))
+            checked.add(name)
+            return False
+
+        with mock.patch.object(default_storage, 'exists', side_effect=racing_exists):
+            second = self.client.post('/api/admin/images/', {'file': self.upload()})
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first)
+        directory = Path(self.stored(first['url'])).parent
+        self.assertEqual(sorted(path.name for path in directory.iterdir()), sorted([
+            'manifest.json', 'original.jpeg',
+            *(f'{name}.{fmt}' for name in images.VARIANT_WIDTHS for fmt in images.VARIANT_FORMATS),
+        ]))
+
+    def test_broken_pool_is_replaced_and_answers_503(self) -> None:
+        broken = mock.Mock(**{'submit.side_effect': BrokenProcessPool('worker died')})
+        with mock.patch.object(images, '_executor', broken):
+            response = self.client.post('/api/admin/images/', {'file': self.upload()})
+            self.assertEqual(response.status_code, 503)
+            self.assertIsNone(images._executor)
+        broken.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+
+    def stored(self, url: str) -> str:
+        return f"{settings.MEDIA_ROOT}/{url.split('/media/', 1)[1]}"
+
+
+class RichTextTests(TestCase):
+    """rich_text blocks are sanitized and pre-rendered when written."""
+
+    def test_sanitize(self) -> None:
+        rendered, text = richtext.sanitize(
+            '<P onclick="x">Merry <B>Christmas</B><script>alert(1)</script>'
+            '<a href=" javascript:alert(1)">bad</a> <a href="https://example.com">ok</a>'
+            '<ul><li>one<li>two</ul>'
+        )
+        self.assertEqual(
+            rendered,
+            '<p>Merry <strong>Christmas</strong>bad <a href="https://example.com">ok</a></p>'
+            '<ul><li>one</li><li>two</li></ul>',
+        )
+        self.assertEqual(text, 'Merry Christmasbad ok\n\none\ntwo')
+
+    def test_write_paths_store_rendered_output(self) -> None:
+        letter = make_letter('Merry Christmas', is_published=True)
+        block = ContentBlock.objects.create(letter=letter, block_type='rich_text', order=0, content={'html': '<b>Hi</b>'})
+        self.assertEqual(block.content['rendered'], '<strong>Hi</strong>')
+        self.assertEqual(block.content['sanitizer_version'], richtext.SANITIZER_VERSION)
+
+        # Blocks written by an older sanitizer are re-rendered with the snapshot.
+        ContentBlock.objects.filter(pk=block.pk).update(content={'html': '<i>Hi</i>', 'rendered': '<i>Hi</i>'})
+        snapshot = snapshots.refresh_snapshot(letter.pk)
+        assert snapshot is not None
+        self.assertIn('<em>Hi</em>', json.loads(snapshot)['content_blocks'][0]['content']['rendered'])
+        block.refresh_from_db()
+        self.assertEqual(block.content['text'], 'Hi')
+
+    def test_source_html_is_admin_only(self) -> None:
+        letter = make_letter('Merry Christmas', is_published=True)
+        ContentBlock.objects.create(letter=letter, block_type='rich_text', order=0, content={'html': '<b onclick="x">Hi</b>'})
+        letter = Letter.objects.select_related('letter_type', 'created_by').prefetch_related('content_blocks').get()
+        for engine in serialization.ENGINES:
+            public = json.loads(serialization.render_public_letter(letter, engine))['content_blocks'][0]['content']
+            self.assertEqual(public, {'rendered': '<strong>Hi</strong>', 'text': 'Hi', 'sanitizer_version': richtext.SANITIZER_VERSION})
+            admin = json.loads(serialization.render_letter(letter, engine))['content_blocks'][0]['content']
+            self.assertEqual(admin['html'], '<b onclick="x">Hi</b>')
+
+
+class CustomPropertiesValidationTests(TestCase):
+    """custom_properties are checked against a compiled, cached meta schema."""
+
+    def setUp(self) -> None:
+        self.letter_type = LetterType.objects.create(name='Christmas', description='Festive', meta_schema={
+            'type': 'object',
+            'properties': {
+                'year': {'type': 'integer', 'minimum': 2000},
+                'family': {'type': 'string'},
+                'mood': {'enum': ['merry', 'bright']},
+            },
+            'required': ['year'],
+        })
+
+    def test_valid_and_invalid_properties(self) -> None:
+        validate_custom_properties(self.letter_type, {'year': 2026, 'family': 'smith', 'extra': True})
+        for properties in [{}, {'year': '2026'}, {'year': 1999}, {'year': 2026, 'mood': 'grumpy'}]:
+            with self.assertRaises(ValidationError):
+                validate_custom_properties(self.letter_type, properties)
+
+    def test_validator_is_compiled_once_and_recompiled_after_save(self) -> None:
+        validator = get_validator(self.letter_type)
+        self.assertIs(get_validator(LetterType.objects.get(pk=self.letter_type.pk)), validator)
+
+        self.letter_type.meta_schema = {'properties': {'year': {'type': 'string'}}}
+        self.letter_type.save()
+        validate_custom_properties(self.letter_type, {'year': 'MMXXVI'})
+        self.assertIsNot(get_validator(self.letter_type), validator)
+
+    def test_api_rejects_invalid_properties(self) -> None:
+        staff = User.objects.create(username='admin', email='admin@example.com', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.post('/api/admin/letters/', {
+            'title': 'Hi', 'description': 'd', 'recipient_name': 'r',
+            'letter_type_id': str(self.letter_type.pk), 'custom_properties': {'year': 'soon'},
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('custom_properties', response.json())
+
+    def test_malformed_meta_schemas_are_rejected(self) -> None:
+        staff = User.objects.create(username='admin', email='admin@example.com', is_staff=True)
+        self.client.force_login(staff)
+        malformed = [
+            {'properties': {'mood': {'enum': []}}},
+            {'properties': {'code': {'type': 'string', 'pattern': '('}}},
+            {'properties': {'code': {'type': 'string', 'pattern': '^(?!x).*'}}},
+            {'properties': {'code': {'type': 'string', 'minLength': 'x'}}},
+            {'properties': {'tags': {'enum': [[1]]}}},
+            {'properties': ['year']},
+            {'required': 'year'},
+            [],
+        ]
+        for index, meta_schema in enumerate(malformed):
+            with self.subTest(meta_schema=meta_schema):
+                self.assertTrue(compile_errors(meta_schema))
+                response = self.client.post('/api/admin/letter-types/', {
+                    'name': f'Broken {index}', 'description': 'd', 'meta_schema': meta_schema,
+                }, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('meta_schema', response.json())
+                form = LetterTypeAdminForm(data={
+                    'name': f'Broken {index}', 'slug': f'broken-{index}', 'description': 'd',
+                    'meta_schema': json.dumps(meta_schema),
+                })
+                self.assertIn('meta_schema', form.errors)
+        self.assertFalse(LetterType.objects.filter(name__startswith='Broken').exists())
+
+        # A type saved around the checks fails its letters' validation, not the request.
+        self.letter_type.meta_schema = malformed[0]
+        self.letter_type.save()
+        with self.assertRaises(ValidationError):
+            validate_custom_properties(self.letter_type, {})
+        response = self.client.post('/api/admin/letters/', {
+            'title': 'Hi', 'description': 'd', 'recipient_name': 'r',
+            'letter_type_id': str(self.letter_type.pk), 'custom_properties': {},
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('custom_properties', response.json())
+
+
+class LetterListPaginationTests(TestCase):
+    """The admin letter list pages by (created_at, id) keyset."""
+
+    def setUp(self) -> None:
+        for index in range(7):
+            make_letter(f'Letter {index}')
+        # Ties on created_at must still page deterministically.
+        Letter.objects.filter(title__in=['Letter 2', 'Letter 3', 'Letter 4']).update(
+            created_at=Letter.objects.get(title='Letter 2').created_at,
+        )
+        self.client.force_login(User.objects.create(username='admin', email='admin@example.com', is_staff=True))
+        self.expected = [str(pk) for pk in Letter.objects.order_by('-created_at', '-id').values_list('pk', flat=True)]
+
+    def test_walks_forward_and_back_without_gaps(self) -> None:
+        seen, pages, url = [], [], '/api/admin/letters/?page_size=3'
+        while url:
+            body = self.client.get(url).json()
+            pages.append(body)
+            seen += [letter['id'] for letter in body['results']]
+            url = body['next']
+        self.assertEqual(seen, self.expected)
+        self.assertIsNone(pages[0]['previous'])
+        self.assertNotIn('count', pages[0])
+
+        previous = self.client.get(pages[-1]['previous']).json()
+        self.assertEqual([letter['id'] for letter in previous['results']], self.expected[3:6])
+
+    def test_malformed_cursors_are_not_found(self) -> None:
+        def cursor(payload: Dict[str, Any]) -> str:
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        created_at = timezone.now().isoformat()
+        for encoded in [
+            'not-base64!',
+            cursor({'c': created_at}),
+            cursor({'c': created_at, 'i': 'abc'}),
+            cursor({'c': created_at, 'i': 5}),
+            cursor({'c': 'yesterday', 'i': self.expected[0]}),
+            cursor({'c': '2026-10-17T12:00:00', 'i': self.expected[0]}),
+        ]:
+            with self.subTest(cursor=encoded):
+                self.assertEqual(self.client.get('/api/admin/letters/', {'cursor': encoded}).status_code, 404)
+        valid = cursor({'c': created_at, 'i': self.expected[0]})
+        self.assertEqual(self.client.get('/api/admin/letters/', {'cursor': valid}).status_code, 200)
+
+    def test_list_is_a_summary_in_one_query(self) -> None:
+        letter = Letter.objects.get(title='Letter 0')
+        ContentBlock.objects.create(letter=letter, block_type='text', order=0, content={'text': 'hi'})
+        self.client.get('/api/admin/letters/')  # warm the session and user lookups
+        with self.assertNumQueries(3):
+            body = self.client.get('/api/admin/letters/').json()
+        summary = next(item for item in body['results'] if item['id'] == str(letter.pk))
+        self.assertEqual(summary['block_count'], 1)
+        self.assertNotIn('content_blocks', summary)
+        self.assertEqual(set(summary['letter_type']), {'id', 'name', 'slug'})
+
+    def test_sparse_fieldsets(self) -> None:
+        body = self.client.get('/api/admin/letters/?fields=id,title').json()
+        self.assertEqual(set(body['results'][0]), {'id', 'title'})
+        detail = self.client.get(f"/api/admin/letters/{self.expected[0]}/?fields=id,slug").json()
+        self.assertEqual(list(detail), ['id', 'slug'])
+        types = self.client.get('/api/admin/letter-types/?fields=name').json()
+        self.assertEqual(types['results'], [{'name': 'Christmas'}])
+
+    def test_page_number_mode_is_still_available(self) -> None:
+        body = self.client.get('/api/admin/letters/?page=1').json()
+        self.assertEqual(body['count'], 7)
+        self.assertEqual([letter['id'] for letter in body['results']], self.expected)
+
+
+class StaticLettersTests(TestCase):
+    """Published letters are mirrored to precompressed files for nginx."""
+
+    def setUp(self) -> None:
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.enterContext(override_settings(LETTERS_STATIC_ROOT=self.root))
+
+    def read(self, name: str) -> bytes:
+        with open(f'{self.root}/{name}', 'rb') as f:
+            return f.read()
+
+    def test_files_follow_committed_changes(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            letter = make_letter('Merry Christmas', is_published=True)
+        body = self.read(f'{letter.slug}.json')
+        self.assertEqual(body, self.client.get(f'/api/letters/{letter.slug}/').content)
+        self.assertEqual(gzip.decompress(self.read(f'{letter.slug}.json.gz')), body)
+        self.assertEqual(brotli.decompress(self.read(f'{letter.slug}.json.br')), body)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ContentBlock.objects.create(letter=letter, block_type='text', order=0, content={'text': 'Ho ho'})
+        self.assertIn(b'Ho ho', self.read(f'{letter.slug}.json'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            letter.slug = 'renamed'
+            letter.save()
+        self.assertEqual(static_letters.stored_slugs(Path(self.root)), ['renamed'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            letter.is_published = False
+            letter.save()
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_full_build_writes_published_and_prunes_the_rest(self) -> None:
+        published = make_letter('Published', is_published=True)
+        make_letter('Draft')
+        static_letters.write_letter(Path(self.root), 'gone', b'{}')
+        os.utime(f'{self.root}/gone.json', (0, 0))
+        call_command('build_static_letters', workers=1, stdout=io.StringIO())
+        self.assertEqual(static_letters.stored_slugs(Path(self.root)), [published.slug])
+        self.assertEqual(sorted(os.listdir(self.root)), [f'{published.slug}{suffix}' for suffix in ('.json', '.json.br', '.json.gz')])
+
+    def test_full_build_keeps_files_written_while_it_runs(self) -> None:
+        make_letter('Published', is_published=True)
+        # As if the letter was published, and its files synced, mid-build.
+        static_letters.write_letter(Path(self.root), 'just-published', b'{}')
+        os.utime(f'{self.root}/just-published.json', (time.time() + 60, time.time() + 60))
+        call_command('build_static_letters', workers=1, batch_size=1, stdout=io.StringIO())
+        self.assertIn('just-published', static_letters.stored_slugs(Path(self.root)))
+
+
+class ServerTimingTests(TestCase):
+    """Responses carry per-phase timings; a sample of requests is logged."""
+
+    def timings(self, response) -> dict:  # type: ignore
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    @override_settings(LETTERS_TIMING_LOG_SAMPLE_RATE=1)
+    def test_admin_request_reports_phases_and_logs(self) -> None:
+        make_letter('Merry Christmas')
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        with self.assertLogs('letters.timing') as logs:
+            response = self.client.get('/api/admin/letters/?page=1')
+        entries = self.timings(response)
+        self.assertEqual(list(entries), ['middleware', 'db', 'serialize', 'render', 'total'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entries['db']['desc'], f'"{record["queries"]} queries"')
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['serialize_ms'], 0)
+        self.assertGreater(record['render_ms'], 0)
+        self.assertEqual((record['view'], record['status']), ('letter-list', 200))
+
+    async def test_async_middleware_counts_queries_in_threads(self) -> None:
+        async def view(request):  # type: ignore
+            await User.objects.filter(username='nobody').afirst()
+            return HttpResponse()
+
+        middleware = timing.ServerTimingMiddleware(view)
+        response = await middleware(AsyncRequestFactory().get('/'))
+        self.assertEqual(self.timings(response)['db']['desc'], '"1 queries"')
+        self.assertIsNone(timing.current())
+
+    def test_view_hook_matches_the_middleware_mode(self) -> None:
+        async def async_view(request: Any) -> HttpResponse:
+            return HttpResponse()
+
+        # An async hook spares async requests the thread hop Django adds for a sync one.
+        self.assertTrue(iscoroutinefunction(timing.ServerTimingMiddleware(async_view).process_view))
+        self.assertFalse(iscoroutinefunction(timing.ServerTimingMiddleware(lambda request: HttpResponse()).process_view))
+
+    def test_requests_are_not_sampled_under_tests(self) -> None:
+        self.assertEqual(settings.LETTERS_TIMING_LOG_SAMPLE_RATE, 0)
+
+
+class MetricsTests(TestCase):
+    """Requests and cache lookups are counted and exposed for Prometheus."""
+
+    def sample(self, name: str, **labels: str) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    def test_requests_and_cache_lookups_are_exposed(self) -> None:
+        public_cache.clear()
+        self.addCleanup(public_cache.clear)
+        letter = make_letter('Merry Christmas', is_published=True)
+        url = f'/api/letters/{letter.slug}/'
+        before = {
+            'ok': self.sample('letters_http_responses_total', view='letter-public', method='GET', status='200'),
+            'hit': self.sample('letters_public_cache_lookups_total', result='hit'),
+            'miss': self.sample('letters_public_cache_lookups_total', result='miss'),
+            'queries': self.sample('letters_db_queries_per_request_count', view='letter-public'),
+        }
+        self.client.get(url)
+        self.client.get(url)
+
+        self.assertEqual(self.sample('letters_http_responses_total', view='letter-public', method='GET', status='200'), before['ok'] + 2)
+        self.assertEqual(self.sample('letters_public_cache_lookups_total', result='hit'), before['hit'] + 1)
+        self.assertEqual(self.sample('letters_public_cache_lookups_total', result='miss'), before['miss'] + 1)
+        self.assertEqual(self.sample('letters_db_queries_per_request_count', view='letter-public'), before['queries'] + 2)
+
+        response = self.client.get('/api/metrics', HTTP_ACCEPT='application/openmetrics-text')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'letters_http_request_duration_seconds_bucket{', response.content)
+        self.assertEqual(metrics.view_label(response.wsgi_request), 'metrics')
+
+    def test_unknown_methods_share_one_label(self) -> None:
+        before = self.sample('letters_http_responses_total', view='letter-public', method='other', status='405')
+        self.client.generic('BREW', '/api/letters/teapot/')
+        self.client.generic('PROPFIND', '/api/letters/teapot/')
+        self.assertEqual(self.sample('letters_http_responses_total', view='letter-public', method='other', status='405'), before + 2)
+        self.assertEqual(self.sample('letters_http_responses_total', view='letter-public', method='BREW', status='405'), 0)
+
+
+class SearchTests(TestCase):
+    """Letters are found by their fields and block text through the full-text index."""
+
+    def test_index_follows_block_changes(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            letter = make_letter('Merry Christmas', description='From the north pole')
+            block = ContentBlock.objects.create(letter=letter, block_type='text', order=0, content={'text': 'Reindeer <3 sleighs'})
+            ContentBlock.objects.create(letter=letter, block_type='rich_text', order=1, content={'html': '<b>Mistletoe</b>'})
+            make_letter('Happy Birthday')
+
+        self.assertEqual([r['id'] for r in search.search('mistletoe')], [str(letter.pk)])
+        [result] = search.search('sleigh')  # stemmed
+        self.assertIn('Reindeer &lt;3 <mark>sleighs</mark>', result['highlights']['snippet'])
+        self.assertEqual(search.search('merry')[0]['highlights']['title'], '<mark>Merry</mark> Christmas')
+        self.assertEqual(search.search('"sleigh OR ('), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            block.content = {'text': 'Snowman'}
+            block.save()
+        self.assertEqual(search.search('reindeer'), [])
+        self.assertEqual(len(search.search('snowman')), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            letter.delete()
+        self.assertEqual(search.search('snowman'), [])
+        self.assertEqual(LetterSearchDocument.objects.count(), 1)
+
+    def test_search_endpoint_and_admin(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            letter = make_letter('Merry Christmas', recipient_name='Grandma')
+            make_letter('Happy Birthday')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        response = self.client.get('/api/admin/letters/search/', {'q': 'grandma'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['slug'] for r in response.json()['results']], [letter.slug])
+
+        changelist = self.client.get('/admin/letters/letter/', {'q': 'grandma'})
+        self.assertEqual(list(changelist.context['cl'].result_list), [letter])
+        self.assertNotContains(changelist, 'refine the search')
+
+        with mock.patch.object(LetterAdmin, 'search_result_limit', 1):
+            changelist = self.client.get('/admin/letters/letter/', {'q': 'grandma'})
+        self.assertContains(changelist, 'Only the best 1 matches are listed; refine the search to find others.')
+
+    def test_rich_text_without_extracted_text_is_indexed(self) -> None:
+        letter = make_letter('Merry Christmas')
+        block = ContentBlock.objects.create(letter=letter, block_type='rich_text', order=0, content={})
+        # As stored before rich_text blocks were pre-rendered.
+        ContentBlock.objects.filter(pk=block.pk).update(content={'html': '<p>Mistletoe <b>kisses</b></p><script>x</script>'})
+
+        migration = importlib.import_module('letters.migrations.0005_letter_search_document')
+        migration.index_existing_letters(apps, connection.schema_editor())
+        self.assertEqual(LetterSearchDocument.objects.get(letter=letter).body, 'Mistletoe kisses')
+
+        search.reindex([letter.pk])
+        self.assertEqual([r['id'] for r in search.search('mistletoe')], [str(letter.pk)])
+
+
+class AdminPerformanceTests(TestCase):
+    """Admin pages run a fixed number of queries however many rows they show."""
+
+    def setUp(self) -> None:
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+
+    def add_letters(self, count: int) -> None:
+        for i in range(count):
+            username = f'user-{Letter.objects.count()}'
+            letter = make_letter(f'Letter {i}', created_by=User.objects.create_user(username, f'{username}@example.com'))
+            ContentBlock.objects.create(letter=letter, block_type='text', order=0, content={'text': 'Hi'})
+
+    def test_changelists_do_not_query_per_row(self) -> None:
+        for url in ('/admin/letters/letter/', '/admin/letters/contentblock/'):
+            self.add_letters(2)
+            with CaptureQueriesContext(connection) as few:
+                self.client.get(url)
+            self.add_letters(5)
+            with CaptureQueriesContext(connection) as more:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(len(more), len(few), url)
+
+    def test_block_inline_is_paginated(self) -> None:
+        letter = make_letter('Long letter')
+        ContentBlock.objects.bulk_create(
+            ContentBlock(letter=letter, block_type='text', order=order, content={'text': str(order)}) for order in range(55)
+        )
+        url = f'/admin/letters/letter/{letter.pk}/change/'
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get(url)
+        self.assertLess(len(queries), 20)
+        self.assertEqual(first.context['inline_admin_formsets'][0].formset.initial_form_count(), 50)
+        self.assertContains(first, '?blocks_page=2')
+        second = self.client.get(url, {'blocks_page': 2})
+        self.assertEqual(
+            [form.instance.order for form in second.context['inline_admin_formsets'][0].formset.initial_forms],
+            [50, 51, 52, 53, 54],
+        )
+
+    def test_estimated_count_only_for_unfiltered_large_tables(self) -> None:
+        make_letter('Merry Christmas')
+        with mock.patch.object(pagination, 'estimate_row_count', return_value=50_000):
+            self.assertEqual(pagination.EstimatedCountPaginator(Letter.objects.all(), 20).count, 50_000)
+            self.assertEqual(pagination.EstimatedCountPaginator(Letter.objects.filter(is_published=False), 20).count, 1)
+        with mock.patch.object(pagination, 'estimate_row_count', return_value=500):
+            self.assertEqual(pagination.EstimatedCountPaginator(Letter.objects.all(), 20).count, 1)
+
+
+class QueryPlanTests(TestCase):
+    """The hot query shapes are answered from their indexes (checked with EXPLAIN)."""
+
+    def indexes_on(self, table: str, columns: List[str]) -> Set[str]:
+        """Names of the indexes, unique ones included, on exactly these columns."""
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+        return {name for name, info in constraints.items() if (info['index'] or info['unique']) and info['columns'] == columns}
+
+    def test_hot_queries_use_their_indexes(self) -> None:
+        letter = make_letter('Merry Christmas', is_published=True)
+        if connection.vendor == 'postgresql':
+            # Tiny test tables would otherwise be scanned sequentially.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        cases = [
+            (
+                # The unique slug index serves the public lookup (SQLite leaves it unnamed).
+                Letter.objects.filter(slug=letter.slug, is_published=True).values_list('id', 'public_snapshot'),
+                {'sqlite_autoindex_letters_letter'} | self.indexes_on('letters_letter', ['slug']),
+            ),
+            (Letter.objects.order_by('-created_at', '-id')[:20], {'letter_created_at_id_idx'}),
+            (Letter.objects.filter(created_by=letter.created_by).order_by('-created_at')[:20], {'letter_author_created_idx'}),
+            (Letter.objects.filter(letter_type=letter.letter_type).order_by('-created_at')[:20], {'letter_type_created_idx'}),
+            (publisher.due_letters(timezone.now())[:100], {'letter_scheduled_idx'}),
+            (
+                ContentBlock.objects.filter(letter=letter).order_by('order'),
+                self.indexes_on('letters_contentblock', ['letter_id', 'order']),
+            ),
+        ]
+        if connection.vendor == 'postgresql':
+            cases.append((Letter.objects.filter(custom_properties__contains={'year': 2026}), {'letter_custom_properties_gin'}))
+        for queryset, indexes in cases:
+            plan = queryset.explain()
+            self.assertTrue(any(index in plan for index in indexes), f'{queryset.query}\n{plan}')
+
+
+class PropertyFilterTests(TestCase):
+    """``?prop.<key>=`` filters on properties the letter type's schema marks ``indexed``."""
+
+    def setUp(self) -> None:
+        self.letter_type = LetterType.objects.create(name='Family', description='Family letters', meta_schema={
+            'properties': {
+                'year': {'type': 'integer', 'indexed': True},
+                'family': {'type': 'string', 'indexed': True},
+                'note': {'type': 'string'},
+            },
+        })
+        self.smith = make_letter('Smiths 2026', letter_type=self.letter_type,
+                                 custom_properties={'year': 2026, 'family': 'smith', 'note': 'x'})
+        self.jones = make_letter('Joneses 2025', letter_type=self.letter_type,
+                                 custom_properties={'year': 2025, 'family': 'jones'})
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+
+    def titles(self, params: dict) -> list:  # type: ignore
+        response = self.client.get('/api/admin/letters/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(letter['title'] for letter in response.json()['results'])
+
+    def test_migration_backfills_indexed_values(self) -> None:
+        expected = sorted(LetterPropertyValue.objects.values_list('letter_id', 'key', 'value_text', 'value_number'))
+        LetterPropertyValue.objects.all().delete()
+        migration = importlib.import_module('letters.migrations.0007_letter_property_value')
+        migration.index_existing_properties(apps, connection.schema_editor())
+        self.assertEqual(sorted(LetterPropertyValue.objects.values_list('letter_id', 'key', 'value_text', 'value_number')), expected)
+        self.assertEqual(len(expected), 4)
+
+    def test_filters_match_indexed_values(self) -> None:
+        self.assertEqual(LetterPropertyValue.objects.filter(letter=self.smith).count(), 2)
+        self.assertEqual(self.titles({'prop.year': '2026'}), ['Smiths 2026'])
+        self.assertEqual(self.titles({'prop.year': '2026', 'prop.family': 'jones'}), [])
+        self.assertEqual(self.titles({'prop.family': ['smith', 'jones']}), ['Joneses 2025', 'Smiths 2026'])
+
+        self.jones.custom_properties = {'year': 2026, 'family': 'jones'}
+        self.jones.save()
+        self.assertEqual(self.titles({'prop.year': '2026.0'}), ['Joneses 2025', 'Smiths 2026'])
+
+        for params in ({'prop.note': 'x'}, {'prop.year': 'soon'}):
+            response = self.client.get('/api/admin/letters/', params)
+            self.assertEqual(response.status_code, 400)
+
+    def test_schema_changes_rebuild_values(self) -> None:
+        self.letter_type.meta_schema['properties']['note']['indexed'] = True
+        self.letter_type.save()
+        self.assertEqual(self.titles({'prop.note': 'x'}), ['Smiths 2026'])
+
+        self.letter_type.meta_schema['properties'] = {}
+        self.letter_type.save()
+        self.assertFalse(LetterPropertyValue.objects.exists())
+
+        response = self.client.post('/api/admin/letter-types/', {
+            'name': 'Tagged', 'description': 'Tags', 'meta_schema': {'properties': {'tags': {'type': 'array', 'indexed': True}}},
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('meta_schema', response.json())
+
+    def test_filter_uses_property_index(self) -> None:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = properties.filter_letters(Letter.objects.all(), {'year': ['2026']}).explain()
+        self.assertIn('letter_property_number_idx', plan)
+
+
+class PublisherTests(TestCase):
+    """Scheduled drafts are published once their ``published_at`` has passed."""
+
+    def test_publishes_due_letters_and_warms_them(self) -> None:
+        now = timezone.now()
+        due = make_letter('Merry Christmas', published_at=now - timedelta(minutes=1))
+        later = make_letter('Happy New Year', published_at=now + timedelta(days=7))
+        public_cache.clear()
+        self.assertEqual(self.client.get(f'/api/letters/{due.slug}/').status_code, 404)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(publisher.publish_due(now=now), [due.slug])
+        due.refresh_from_db()
+        self.assertTrue(due.is_published)
+        self.assertEqual(due.updated_at, now)
+        cached = public_cache.get_backend().get(public_cache.cache_key(due.slug))
+        assert cached is not None and due.public_snapshot is not None
+        self.assertEqual(cached.body, due.public_snapshot.encode())
+        self.assertEqual(self.client.get(f'/api/letters/{due.slug}/').json()['title'], 'Merry Christmas')
+        self.assertEqual(publisher.publish_due(now=now), [])
+
+        out = io.StringIO()
+        call_command('run_publisher', '--once', stdout=out)
+        self.assertIn('Published 0 letters.', out.getvalue())
+        self.assertFalse(Letter.objects.get(pk=later.pk).is_published)
+
+    def test_publication_times_follow_manual_publishing(self) -> None:
+        letter = make_letter('Merry Christmas', is_published=True)
+        self.assertIsNotNone(letter.published_at)
+
+        letter.is_published = False
+        letter.save()
+        self.assertIsNone(letter.published_at)
+        self.assertEqual(publisher.publish_due(), [])
+
+        letter.published_at = timezone.now() + timedelta(hours=1)
+        letter.save()
+        self.assertEqual(publisher.publish_due(now=letter.published_at), [letter.slug])
+
+    def test_saving_a_copy_loaded_before_publication_keeps_the_schedule(self) -> None:
+        scheduled = timezone.now() - timedelta(minutes=1)
+        letter = make_letter('Merry Christmas', published_at=scheduled)
+        stale = Letter.objects.get(pk=letter.pk)
+        # The admin form as rendered while the letter was still a draft.
+        form_data = {
+            'title': letter.title, 'slug': letter.slug, 'description': letter.description,
+            'recipient_name': letter.recipient_name, 'letter_type': letter.letter_type_id,
+            'custom_properties': '{}', 'published_at': scheduled.isoformat(),
+            'created_by': letter.created_by_id, 'initial-is_published': 'False',
+        }
+        self.assertEqual(publisher.publish_due(), [letter.slug])
+
+        form = LetterAdminForm(data={**form_data, 'title': 'Edited'}, instance=Letter.objects.get(pk=letter.pk))
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        letter.refresh_from_db()
+        self.assertEqual((letter.title, letter.is_published, letter.published_at), ('Edited', True, scheduled))
+
+        # A stale model instance writes is_published=False, but keeps the time.
+        stale.save()
+        self.assertEqual(Letter.objects.get(pk=letter.pk).published_at, scheduled)
+        self.assertEqual(publisher.publish_due(), [letter.slug])
+
+        # Unticking the box does unpublish.
+        form = LetterAdminForm(data={**form_data, 'initial-is_published': 'True'}, instance=Letter.objects.get(pk=letter.pk))
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        letter.refresh_from_db()
+        self.assertEqual((letter.is_published, letter.published_at), (False, None))
+
+
+class OpenCountTests(TestCase):
+    """Public letter opens are buffered in memory and added to hourly counts in bulk."""
+
+    def setUp(self) -> None:
+        analytics._drain()
+        self.addCleanup(analytics._drain)
+        patcher = mock.patch.object(analytics, '_start_flusher')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flush_adds_hourly_counts(self) -> None:
+        letter = make_letter('Merry Christmas', is_published=True)
+        draft = make_letter('Draft')
+        now = timezone.now()
+        public_cache.clear()
+        for _ in range(3):
+            self.assertEqual(self.client.get(f'/api/letters/{letter.slug}/').status_code, 200)
+        self.client.get(f'/api/letters/{draft.slug}/')
+        analytics.record(draft.slug)
+        analytics.record(letter.slug, now=now - timedelta(days=2))
+        self.assertEqual(analytics.pending(), 5)
+
+        # Savepoint, slug lookup, one upsert, release.
+        with self.assertNumQueries(4):
+            self.assertEqual(analytics.flush(), 4)
+        self.assertEqual(analytics.pending(), 0)
+        self.assertEqual(LetterOpenCount.objects.filter(letter=draft).count(), 0)
+
+        analytics.record(letter.slug, now=now)
+        self.assertEqual(analytics.flush(), 1)
+        self.assertEqual(LetterOpenCount.objects.get(letter=letter, hour=analytics.current_hour(now)).count, 4)
+        self.assertEqual(analytics.open_stats(letter.pk, now=now), {
+            'total': 5, 'last_24_hours': 4, 'last_opened_at': analytics.current_hour(now),
+        })
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.assertEqual(self.client.get(f'/api/admin/letters/{letter.pk}/').json()['open_stats']['total'], 5)
+        letter = Letter.objects.select_related('letter_type', 'created_by').prefetch_related('content_blocks').get(pk=letter.pk)
+        self.assertEqual(render_letter(letter, 'pydantic'), render_letter(letter, 'drf'))
+
+    def test_threshold_wakes_flusher_and_failed_flush_keeps_counts(self) -> None:
+        letter = make_letter('Merry Christmas', is_published=True)
+        with mock.patch.object(analytics, '_wake') as wake, override_settings(LETTERS_OPEN_COUNTS_FLUSH_THRESHOLD=2):
+            analytics.record(letter.slug)
+            wake.set.assert_not_called()
+            analytics.record(letter.slug)
+            wake.set.assert_called_once()
+
+        with mock.patch.object(analytics, '_add_counts', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                analytics.flush()
+        self.assertEqual(analytics.pending(), 2)
+
+        with override_settings(LETTERS_STATIC_ROOT='/tmp/letters-static'):
+            self.client.get(f'/api/letters/{letter.slug}/')
+        self.assertEqual(analytics.pending(), 2)
+        url = f'/internal/letter-opens/{letter.slug}/'
+        self.assertEqual(self.client.get(url, HTTP_X_LETTERS_OPEN_TOKEN='').status_code, 403)
+        with override_settings(LETTERS_OPEN_TOKEN='s3cret'):
+            self.assertEqual(self.client.get(url).status_code, 403)
+            self.assertEqual(self.client.get(url, HTTP_X_LETTERS_OPEN_TOKEN='guess').status_code, 403)
+            self.assertEqual(self.client.get(url, HTTP_X_LETTERS_OPEN_TOKEN='s3cret').status_code, 204)
+        self.assertEqual(analytics.flush(), 3)
+
+
+class ConditionalGetTests(TestCase):
+    """Letter endpoints send validators and answer 304 before rendering anything."""
+
+    def setUp(self) -> None:
+        public_cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.letter = make_letter('Merry Christmas', is_published=True)
+            self.block = ContentBlock.objects.create(letter=self.letter, block_type='text', order=0, content={'text': 'Ho'})
+
+    def test_public_letter(self) -> None:
+        url = f'/api/letters/{self.letter.slug}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        self.assertIn('Last-Modified', response)
+
+        # A cache hit answers from the stored validators, a miss with one query.
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        public_cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.block.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_admin_detail(self) -> None:
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        url = f'/api/admin/letters/{self.letter.pk}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertNotEqual(self.client.get(url, {'fields': 'title'})['ETag'], etag)
+
+        with mock.patch.object(serialization, 'render_letter') as render:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        render.assert_not_called()
+
+        ContentBlock.objects.create(letter=self.letter, block_type='text', order=1, content={'text': 'Ho ho'})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get('/api/admin/letters/not-a-uuid/').status_code, 404)
+
+        # The embedded author has no timestamp of its own.
+        etag = self.client.get(url)['ETag']
+        User.objects.filter(pk=self.letter.created_by_id).update(email='santa@example.com')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created_by']['email'], 'santa@example.com')
+
+
+class LetterTransferTests(TestCase):
+    """NDJSON export and chunked import round-trip letters."""
+
+    def setUp(self) -> None:
+        self.staff = User.objects.create(username='admin', email='admin@example.com', is_staff=True)
+        self.client.force_login(self.staff)
+        for index in range(5):
+            letter = make_letter('Merry Christmas', is_published=index % 2 == 0, created_by=self.staff)
+            for order in range(3):
+                ContentBlock.objects.create(letter=letter, block_type='text', order=order, content={'text': f'{index}.{order}'})
+
+    def export(self) -> bytes:
+        response = self.client.get('/api/admin/letters/export/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        assert isinstance(response, StreamingHttpResponse)
+        return response.getvalue()
+
+    def test_round_trip(self) -> None:
+        dump = self.export()
+        before = {letter.pk: (letter.slug, letter.created_at) for letter in Letter.objects.all()}
+        Letter.objects.all().delete()
+
+        with mock.patch('letters.transfer.DEFAULT_CHUNK_SIZE', 2):
+            response = self.client.post('/api/admin/letters/import/', dump, content_type='application/x-ndjson')
+        self.assertEqual(response.json(), {'created': 5, 'skipped': 0, 'errors': []})
+        self.assertEqual({letter.pk: (letter.slug, letter.created_at) for letter in Letter.objects.all()}, before)
+        self.assertEqual(ContentBlock.objects.count(), 15)
+        self.assertEqual(self.export(), dump)
+        published = Letter.objects.filter(is_published=True)[0]
+        self.assertEqual(self.client.get(f'/api/letters/{published.slug}/').status_code, 200)
+
+    def test_existing_letters_are_skipped_and_new_slugs_resolved(self) -> None:
+        lines = self.export().splitlines(keepends=True)
+        copy = json.loads(lines[0])
+        copy['id'] = None
+        copy['content_blocks'] = []
+        body = lines[1] + json.dumps(copy).encode() + b'\n' + b'not json\n'
+        result = self.client.post('/api/admin/letters/import/', body, content_type='application/x-ndjson').json()
+        self.assertEqual((result['created'], result['skipped']), (1, 2))
+        self.assertTrue(Letter.objects.filter(slug='merry-christmas-5').exists())
+
+    def import_records(self, records: List[Any]) -> Dict[str, Any]:
+        body = b''.join(json.dumps(record).encode() + b'\n' for record in records)
+        response = self.client.post('/api/admin/letters/import/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        result: Dict[str, Any] = response.json()
+        return result
+
+    def test_invalid_records_are_reported_per_line(self) -> None:
+        taken_block = ContentBlock.objects.first()
+        assert taken_block is not None
+        letter = {'title': 'Hi', 'recipient_name': 'Santa', 'letter_type': {'slug': 'christmas'}}
+        schema = {'properties': {'year': {'type': 'integer'}}, 'required': ['year']}
+        result = self.import_records([
+            {**letter, 'letter_type': {'name': 'Christmas'}},
+            {**letter, 'letter_type': {'slug': 'xmas', 'name': 'Christmas'}},
+            {**letter, 'letter_type': {'description': 'no slug'}},
+            {**letter, 'letter_type': 'christmas'},
+            {**letter, 'letter_type': {'slug': 'broken', 'meta_schema': {'properties': {'x': {'enum': []}}}}},
+            {**letter, 'letter_type': {'slug': 'dated', 'meta_schema': schema}, 'custom_properties': {'year': 'soon'}},
+            {**letter, 'content_blocks': [{'block_type': 'video', 'order': 0, 'content': {}}]},
+            {**letter, 'content_blocks': [{'id': str(taken_block.pk), 'block_type': 'text', 'order': 0, 'content': {'text': 'x'}}]},
+        ])
+        self.assertEqual((result['created'], result['skipped']), (2, 6))
+        self.assertEqual([error.split(':')[0] for error in result['errors']], [f'line {n}' for n in range(3, 9)])
+        self.assertIn('content block', result['errors'][-1])
+        self.assertEqual(set(LetterType.objects.values_list('slug', flat=True)), {'christmas', 'dated'})
+        self.assertEqual(Letter.objects.filter(title='Hi', letter_type__slug='christmas').count(), 2)
+
+    def test_constraint_errors_skip_only_their_lines(self) -> None:
+        taken_block = ContentBlock.objects.first()
+        assert taken_block is not None
+        letter = {'title': 'Hi', 'recipient_name': 'Santa', 'letter_type': {'slug': 'christmas'}}
+        # Without the pre-check the taken block id only fails in the bulk insert.
+        with mock.patch.object(LetterImporter, '_existing_ids', return_value=set()):
+            result = self.import_records([
+                letter,
+                {**letter, 'content_blocks': [{'id': str(taken_block.pk), 'block_type': 'text', 'order': 0, 'content': {'text': 'x'}}]},
+                letter,
+            ])
+        self.assertEqual((result['created'], result['skipped']), (2, 1))
+        self.assertTrue(result['errors'][0].startswith('line 2: could not be stored'))
+        self.assertEqual(Letter.objects.filter(title='Hi').count(), 2)
+
+    def test_overlong_fields_are_reported_per_line(self) -> None:
+        letter = {'title': 'Hi', 'recipient_name': 'Santa', 'letter_type': {'slug': 'christmas'}}
+        result = self.import_records([
+            {**letter, 'title': 'x' * 201},
+            {**letter, 'recipient_name': 'x' * 201},
+            {**letter, 'slug': 'not a slug'},
+            letter,
+        ])
+        self.assertEqual((result['created'], result['skipped']), (1, 3))
+        self.assertEqual([error.split(':')[:2] for error in result['errors']],
+                         [['line 1', ' title'], ['line 2', ' recipient_name'], ['line 3', ' slug']])
+        self.assertEqual(Letter.objects.filter(letter_type__slug='christmas', title='Hi').count(), 1)
+
+    def test_data_errors_skip_only_their_lines(self) -> None:
+        letter = {'title': 'Hi', 'recipient_name': 'Santa', 'letter_type': {'slug': 'christmas'}}
+        write = LetterImporter._write
+
+        def strict_write(importer: LetterImporter, built: List[Any]) -> None:
+            # What PostgreSQL raises for a value its column can't hold.
+            if any(item[1].title == 'Too long' for item in built):
+                raise DataError('value too long for type character varying(200)')
+            write(importer, built)
+
+        with mock.patch.object(LetterImporter, '_write', strict_write):
+            result = self.import_records([letter, {**letter, 'title': 'Too long'}, letter])
+        self.assertEqual((result['created'], result['skipped']), (2, 1))
+        self.assertTrue(result['errors'][0].startswith('line 2: could not be stored'))
+
+
+@skipIf(connection.vendor == 'sqlite', "SQLite serializes writers with table locks; run against PostgreSQL")
+class ConcurrentLetterSlugTests(TransactionTestCase):
+    """Same-title letters created in parallel must all get distinct slugs."""
+
+    def test_parallel_creates_get_unique_slugs(self) -> None:
+        letter_type = LetterType.objects.create(name='Christmas', description='Festive')
+        user = User.objects.create(username='elf', email='elf@example.com')
+
+        def create(_: int) -> str:
+            try:
+                return make_letter('Merry Christmas', letter_type=letter_type, created_by=user).slug
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            slugs = list(pool.map(create, range(200)))
+
+        self.assertEqual(len(set(slugs)), 200)
+        self.assertEqual(Letter.objects.filter(title='Merry Christmas').count(), 200)
+
+
+class ManagementCommandSmokeTests(TransactionTestCase):
+    """The load-testing commands run end to end on a small data set."""
+
+    def seed(self) -> None:
+        call_command(
+            'seed_letters', types=2, letters=6, median_blocks=2, max_blocks=4,
+            published_ratio=0.5, batch_size=4, seed=1, stdout=io.StringIO(),
+        )
+
+    def test_seed_letters_creates_letters_blocks_and_snapshots(self) -> None:
+        self.seed()
+        self.assertEqual(LetterType.objects.count(), 2)
+        self.assertEqual(Letter.objects.count(), 6)
+        self.assertFalse(Letter.objects.filter(content_blocks__isnull=True).exists())
+        self.assertGreaterEqual(ContentBlock.objects.count(), 6)
+        self.assertTrue(Letter.objects.filter(is_published=True).exists())
+        self.assertFalse(Letter.objects.filter(is_published=True, public_snapshot__isnull=True).exists())
+        self.assertFalse(Letter.objects.filter(is_published=False, public_snapshot__isnull=False).exists())
+        self.assertEqual(LetterSearchDocument.objects.count(), 6)
+        self.assertEqual(LetterPropertyValue.objects.filter(key='year').count(), 6)
+
+    def test_bench_public_scenario_reports_every_request(self) -> None:
+        self.seed()
+        out = io.StringIO()
+        call_command('bench', scenario=['public'], requests=5, concurrency=[2], seed=1, stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['mode'], 'in-process')
+        result = report['runs'][0]['scenarios']['public']
+        self.assertEqual((result['requests'], result['errors']), (5, 0))
+        self.assertGreaterEqual(result['queries_per_request']['max'], 0)
+        self.assertLessEqual(result['latency_ms']['p50'], result['latency_ms']['max'])
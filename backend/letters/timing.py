@@ -0,0 +1,201 @@
+"""Per-request timing of database, serializer and render work.
+
+``ServerTimingMiddleware`` starts a ``RequestTimings`` for each request in a
+context variable, so it follows the request into ``sync_to_async`` threads.
+Every database connection gets ``sql_wrapper`` as an execute wrapper when it
+is opened; the serializers and renderers wrap their work in ``timed()``.
+Outside a request these hooks cost one context variable lookup.
+
+Each response gets a ``Server-Timing`` header::
+
+    Server-Timing: middleware;dur=0.41, db;dur=1.93;desc="3 queries",
+                   serialize;dur=0.88, render;dur=0.12, total;dur=4.02
+
+``middleware`` is the time before the view was dispatched (request-side
+middleware and URL resolving). A ``LETTERS_TIMING_LOG_SAMPLE_RATE`` share of
+requests is also logged as one JSON record to the ``letters.timing`` logger,
+and every request is counted in the Prometheus metrics (``letters.metrics``).
+"""
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Set
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('middleware', 'db', 'serialize', 'render')
+
+
+class RequestTimings:
+    """Seconds spent per phase during one request, plus the query count."""
+
+    __slots__ = ('started', 'view_started', 'durations', 'queries', 'active')
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.view_started: Optional[float] = None
+        self.durations: Dict[str, float] = {}
+        self.queries = 0
+        self.active: Set[str] = set()
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.durations[phase] = self.durations.get(phase, 0.0) + seconds
+
+    def as_dict(self, total: float) -> Dict[str, Any]:
+        """Durations in milliseconds, with the query count and total."""
+        durations = dict(self.durations)
+        if self.view_started is not None:
+            durations['middleware'] = self.view_started - self.started
+        result: Dict[str, Any] = {
+            f'{phase}_ms': round(durations.get(phase, 0.0) * 1000, 3) for phase in PHASES
+        }
+        result['queries'] = self.queries
+        result['total_ms'] = round(total * 1000, 3)
+        return result
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar('letters_request_timings', default=None)
+
+
+def current() -> Optional[RequestTimings]:
+    """Return the timings of the request being handled, if any."""
+    return _current.get()
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Add the time spent in the block to ``phase`` of the current request.
+
+    Nested blocks of the same phase (a serializer inside a serializer) count once.
+    """
+    timings = _current.get()
+    if timings is None or phase in timings.active:
+        yield
+        return
+    timings.active.add(phase)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.active.discard(phase)
+        timings.add(phase, time.perf_counter() - started)
+
+
+def sql_wrapper(execute: Callable[..., Any], sql: str, params: Any, many: bool, context: Dict[str, Any]) -> Any:
+    """Execute wrapper counting queries and their time for the current request."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.add('db', time.perf_counter() - started)
+
+
+def install(connection: Any) -> None:
+    """Add ``sql_wrapper`` to a database connection once."""
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+def server_timing_header(record: Dict[str, Any]) -> str:
+    """Format a timing record as a ``Server-Timing`` header value."""
+    parts = []
+    for phase in PHASES:
+        part = f"{phase};dur={record[f'{phase}_ms']}"
+        if phase == 'db':
+            part += f';desc="{record["queries"]} queries"'
+        parts.append(part)
+    parts.append(f"total;dur={record['total_ms']}")
+    return ', '.join(parts)
+
+
+class ServerTimingMiddleware:
+    """Time each request and report it in ``Server-Timing`` and sampled logs.
+
+    Place it first in ``MIDDLEWARE`` so ``total`` covers the other middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[..., Any]) -> None:
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.async_mode:
+            return self.__acall__(request)
+        if not getattr(settings, 'LETTERS_TIMING_ENABLED', True):
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, timings)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        response: HttpResponse
+        if not getattr(settings, 'LETTERS_TIMING_ENABLED', True):
+            response = await self.get_response(request)
+            return response
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, timings)
+        return response
+
+    @property
+    def process_view(self) -> Callable[..., Any]:
+        """The view hook for the middleware's mode.
+
+        Django runs a sync hook of an async middleware in a thread, so async
+        mode gets the coroutine.
+        """
+        return self._aprocess_view if self.async_mode else self._process_view
+
+    def _process_view(self, request: HttpRequest, *args: Any) -> None:
+        timings = _current.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+
+    async def _aprocess_view(self, request: HttpRequest, *args: Any) -> None:
+        self._process_view(request, *args)
+
+    def finish(self, request: HttpRequest, response: HttpResponse, timings: RequestTimings) -> None:
+        total = time.perf_counter() - timings.started
+        metrics.observe_request(request, response, total, timings.queries)
+        record = timings.as_dict(total)
+        if getattr(settings, 'LETTERS_TIMING_HEADER', True):
+            response['Server-Timing'] = server_timing_header(record)
+        rate = getattr(settings, 'LETTERS_TIMING_LOG_SAMPLE_RATE', 0.0)
+        if rate > 0 and random.random() < rate:
+            match = request.resolver_match
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match is not None else None,
+                'status': response.status_code,
+                **record,
+            }
+            logger.info(json.dumps(record), extra={'timings': record})
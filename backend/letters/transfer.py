@@ -0,0 +1,402 @@
+"""Streaming NDJSON export and chunked import of letters.
+
+Each line holds one letter with its letter type and content blocks, so a dump
+can move letters between environments. Both directions work in chunks of
+``chunk_size`` letters and keep memory flat however large the archive is.
+"""
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type, Union
+from uuid import UUID
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Model, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+from rest_framework import serializers
+
+from . import properties, search, snapshots
+from .blocks import parse_blocks
+from .models import ContentBlock, Letter, LetterType, User
+from .signals import invalidate_public_cache
+from .validation import compile_errors, validate_custom_properties
+
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    """JSON encoder keeping full microsecond precision, unlike DjangoJSONEncoder."""
+
+    def default(self, o: Any) -> Any:
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def letter_to_record(letter: Letter) -> Dict[str, Any]:
+    """Build the export record for a letter (type, author and blocks preloaded)."""
+    letter_type = letter.letter_type
+    return {
+        'id': str(letter.pk),
+        'title': letter.title,
+        'description': letter.description,
+        'recipient_name': letter.recipient_name,
+        'slug': letter.slug,
+        'letter_type': {
+            'slug': letter_type.slug,
+            'name': letter_type.name,
+            'description': letter_type.description,
+            'meta_schema': letter_type.meta_schema,
+        },
+        'custom_properties': letter.custom_properties,
+        'is_published': letter.is_published,
+        'published_at': letter.published_at,
+        'created_by': letter.created_by.username,
+        'created_at': letter.created_at,
+        'updated_at': letter.updated_at,
+        'content_blocks': [
+            {
+                'id': str(block.pk),
+                'block_type': block.block_type,
+                'order': block.order,
+                'content': block.content,
+                'created_at': block.created_at,
+            }
+            for block in letter.content_blocks.all()
+        ],
+    }
+
+
+def export_letters(queryset: Optional[Any] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield one NDJSON line per letter, reading through a server-side cursor."""
+    queryset = Letter.objects.all() if queryset is None else queryset
+    letters = (
+        queryset.select_related('letter_type', 'created_by')
+        .prefetch_related('content_blocks')
+        .order_by('created_at', 'id')
+        .iterator(chunk_size=chunk_size)
+    )
+    for letter in letters:
+        yield json.dumps(letter_to_record(letter), cls=ExportEncoder, ensure_ascii=False).encode('utf-8') + b'\n'
+
+
+@dataclass
+class ImportResult:
+    """Outcome of an import run."""
+    created: int = 0
+    skipped: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def error(self, line_number: int, message: str) -> None:
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line_number}: {message}")
+
+
+class LetterImporter:
+    """Incremental NDJSON importer writing letters and blocks in bulk per chunk."""
+
+    # Letter fields run through their model validators (lengths, slug format)
+    # before insert; PostgreSQL would otherwise fail the whole chunk on them.
+    CHECKED_FIELDS = ('title', 'recipient_name', 'slug')
+
+    def __init__(self, default_user: User, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self.default_user = default_user
+        self.chunk_size = chunk_size
+        self.result = ImportResult()
+        self._letter_types: Dict[str, LetterType] = {}
+        self._letter_types_by_name: Dict[str, LetterType] = {}
+        self._users: Dict[str, Any] = {default_user.username: default_user.pk}
+
+    def run(self, lines: Iterable[Union[bytes, str]]) -> ImportResult:
+        """Import every line, flushing each full chunk in its own transaction."""
+        chunk: List[Tuple[int, Dict[str, Any]]] = []
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError('expected a JSON object')
+            except ValueError as exc:
+                self.result.error(line_number, f"invalid JSON ({exc})")
+                continue
+            chunk.append((line_number, record))
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk)
+                chunk = []
+        if chunk:
+            self.flush(chunk)
+        return self.result
+
+    def flush(self, chunk: List[Tuple[int, Dict[str, Any]]]) -> None:
+        """Write one chunk of records with bulk inserts.
+
+        If the bulk insert fails in the database (e.g. a block id that is
+        already taken, or a suffixed slug that outgrows its column), the chunk
+        is written again one letter at a time so that only the offending lines
+        are reported as errors.
+        """
+        with transaction.atomic():
+            chunk = self._resolve_letter_types(chunk)
+            self._resolve_users(record.get('created_by') for _, record in chunk)
+            existing = self._existing_ids(Letter, (record.get('id') for _, record in chunk))
+            existing_blocks = self._existing_ids(ContentBlock, (
+                block.get('id')
+                for _, record in chunk if isinstance(record.get('content_blocks'), list)
+                for block in record['content_blocks'] if isinstance(block, dict)
+            ))
+
+            built: List[Tuple[int, Letter, List[ContentBlock], List[Tuple[Any, Dict[str, Any]]]]] = []
+            for line_number, record in chunk:
+                try:
+                    letter, letter_blocks, letter_timestamps = self._build(record)
+                except RecordError as exc:
+                    self.result.error(line_number, str(exc))
+                    continue
+                except (KeyError, TypeError, ValueError) as exc:
+                    self.result.error(line_number, f"invalid record ({exc!r})")
+                    continue
+                if letter.pk in existing:
+                    self.result.error(line_number, f"letter {letter.pk} already exists")
+                    continue
+                taken_block = next((block.pk for block in letter_blocks if block.pk in existing_blocks), None)
+                if taken_block is not None:
+                    self.result.error(line_number, f"content block {taken_block} already exists")
+                    continue
+                existing.add(letter.pk)
+                existing_blocks.update(block.pk for block in letter_blocks)
+                built.append((line_number, letter, letter_blocks, letter_timestamps))
+
+            self._resolve_slugs([letter for _, letter, _, _ in built])
+            try:
+                with transaction.atomic():
+                    self._write(built)
+            except DatabaseError:
+                for item in built:
+                    try:
+                        with transaction.atomic():
+                            self._write([item])
+                    except DatabaseError as exc:
+                        self.result.error(item[0], f"could not be stored ({exc})")
+
+    def _write(self, built: List[Tuple[int, Letter, List[ContentBlock], List[Tuple[Any, Dict[str, Any]]]]]) -> None:
+        """Insert built letters and blocks, then refresh what derives from them."""
+        letters = [letter for _, letter, _, _ in built]
+        blocks = [block for _, _, letter_blocks, _ in built for block in letter_blocks]
+        Letter.objects.bulk_create(letters)
+        ContentBlock.objects.bulk_create(blocks)
+        # bulk_create applies auto_now/auto_now_add; restore exported times.
+        for _, _, _, timestamps in built:
+            for obj, values in timestamps:
+                for name, value in values.items():
+                    setattr(obj, name, value)
+        Letter.objects.bulk_update(letters, ['created_at', 'updated_at'])
+        ContentBlock.objects.bulk_update(blocks, ['created_at'])
+        properties.index_letters(letters, created=True)
+
+        snapshots.refresh_snapshots([letter.pk for letter in letters if letter.is_published])
+        search.schedule_reindex(letter.pk for letter in letters)
+        invalidate_public_cache(letter.slug for letter in letters)
+        self.result.created += len(letters)
+
+    def _build(self, record: Dict[str, Any]) -> Tuple[Letter, List[ContentBlock], List[Tuple[Any, Dict[str, Any]]]]:
+        """Build unsaved objects for a record, plus the timestamps to restore.
+
+        Raises ``RecordError`` if the letter's fields, properties or blocks
+        don't validate.
+        """
+        letter_type = self._letter_type_for(record['letter_type'])
+        custom_properties = record.get('custom_properties') or {}
+        try:
+            validate_custom_properties(letter_type, custom_properties)
+        except ValidationError as exc:
+            raise RecordError(_describe(exc.message_dict)) from exc
+        created_by = record.get('created_by')
+        letter = Letter(
+            title=record['title'],
+            description=record.get('description', ''),
+            recipient_name=record['recipient_name'],
+            slug=record.get('slug') or '',
+            letter_type=letter_type,
+            custom_properties=custom_properties,
+            is_published=bool(record.get('is_published')),
+            published_at=_datetime(record.get('published_at')),
+            created_by_id=self._users.get(created_by, self.default_user.pk) if isinstance(created_by, str) else self.default_user.pk,
+        )
+        try:
+            letter.clean_fields(exclude=[f.name for f in Letter._meta.fields if f.name not in self.CHECKED_FIELDS])
+        except ValidationError as exc:
+            raise RecordError(_describe(exc.message_dict)) from exc
+        if record.get('id'):
+            letter.pk = UUID(str(record['id']))
+        timestamps: List[Tuple[Any, Dict[str, Any]]] = [(letter, _timestamps(record, ['created_at', 'updated_at']))]
+
+        blocks_data = record.get('content_blocks') or []
+        if not isinstance(blocks_data, list):
+            raise RecordError('content_blocks: must be a list')
+        try:
+            parsed = parse_blocks(blocks_data)
+        except serializers.ValidationError as exc:
+            raise RecordError(_describe(exc.detail)) from exc
+        blocks = []
+        for data, values in zip(blocks_data, parsed):
+            block = ContentBlock(
+                letter=letter,
+                block_type=values['block_type'],
+                order=values['order'],
+                content=values['content'],
+            )
+            if values['id'] is not None:
+                block.pk = values['id']
+            blocks.append(block)
+            timestamps.append((block, _timestamps(data, ['created_at'])))
+        if len({block.pk for block in blocks}) != len(blocks):
+            raise RecordError('content_blocks: duplicate block id')
+        return letter, blocks, timestamps
+
+    def _existing_ids(self, model: Type[Model], ids: Iterable[Any]) -> Set[UUID]:
+        """Return which of the given ids are already stored for ``model``."""
+        wanted = []
+        for value in ids:
+            try:
+                wanted.append(UUID(str(value)))
+            except ValueError:
+                continue
+        return set(model._default_manager.filter(pk__in=wanted).values_list('pk', flat=True))
+
+    def _letter_type_for(self, spec: Dict[str, Any]) -> LetterType:
+        """The resolved letter type for a record's spec, matched by slug, then by name."""
+        by_slug = self._letter_types.get(spec.get('slug') or slugify(spec.get('name') or ''))
+        return by_slug or self._letter_types_by_name[spec['name']]
+
+    def _resolve_letter_types(self, chunk: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, Dict[str, Any]]]:
+        """Load (or create) the letter types a chunk refers to; return its lines that have one.
+
+        A type matches by slug, or else by name (names are unique too). Lines
+        whose spec is malformed or whose type can't be created are reported.
+        """
+        valid: List[Tuple[int, Dict[str, Any]]] = []
+        for line_number, record in chunk:
+            spec = record.get('letter_type')
+            slug, name = (spec.get('slug'), spec.get('name')) if isinstance(spec, dict) else (None, None)
+            if not (isinstance(slug, str) and slug) and not (isinstance(name, str) and name):
+                self.result.error(line_number, 'letter_type: needs a slug or a name')
+            elif (slug is not None and not isinstance(slug, str)) or (name is not None and not isinstance(name, str)):
+                self.result.error(line_number, 'letter_type: slug and name must be strings')
+            else:
+                valid.append((line_number, record))
+
+        specs = [record['letter_type'] for _, record in valid]
+        slugs = {spec.get('slug') or slugify(spec['name']) for spec in specs} - set(self._letter_types)
+        names = {spec['name'] for spec in specs if spec.get('name')} - set(self._letter_types_by_name)
+        if slugs or names:
+            for letter_type in LetterType.objects.filter(Q(slug__in=slugs) | Q(name__in=names)):
+                self._remember_letter_type(letter_type)
+
+        resolved: List[Tuple[int, Dict[str, Any]]] = []
+        for line_number, record in valid:
+            spec = record['letter_type']
+            try:
+                self._letter_type_for(spec)
+            except KeyError:
+                error = self._create_letter_type(spec)
+                if error:
+                    self.result.error(line_number, f"letter_type: {error}")
+                    continue
+            resolved.append((line_number, record))
+        return resolved
+
+    def _create_letter_type(self, spec: Dict[str, Any]) -> Optional[str]:
+        """Create the letter type a spec describes; return why it can't be, if it can't."""
+        meta_schema = spec.get('meta_schema') or {}
+        errors = compile_errors(meta_schema) + properties.meta_schema_errors(meta_schema)
+        if errors:
+            return f"invalid meta_schema ({'; '.join(errors)})"
+        slug = spec.get('slug') or slugify(spec['name'])
+        try:
+            with transaction.atomic():
+                letter_type = LetterType.objects.create(
+                    slug=slug,
+                    name=spec.get('name') or slug,
+                    description=spec.get('description') or '',
+                    meta_schema=meta_schema,
+                )
+        except IntegrityError as exc:
+            return f"could not be created ({exc})"
+        self._remember_letter_type(letter_type)
+        return None
+
+    def _remember_letter_type(self, letter_type: LetterType) -> None:
+        self._letter_types[letter_type.slug] = letter_type
+        self._letter_types_by_name[letter_type.name] = letter_type
+
+    def _resolve_users(self, usernames: Iterable[Optional[str]]) -> None:
+        """Map the authors of a chunk to local users; unknown ones fall back to the importer."""
+        wanted = {name for name in usernames if name and name not in self._users}
+        if wanted:
+            self._users.update(User.objects.filter(username__in=wanted).values_list('username', 'pk'))
+            for name in wanted - set(self._users):
+                self._users[name] = self.default_user.pk
+
+    def _resolve_slugs(self, letters: List[Letter]) -> None:
+        """Give every letter in a chunk a unique slug.
+
+        Taken slugs are found with one query for the whole chunk; each
+        conflicting base slug then costs one more query for its next suffix.
+        """
+        for letter in letters:
+            if not letter.slug:
+                letter.slug = slugify(letter.title)
+        taken: Set[str] = set(
+            Letter.objects.filter(slug__in=[letter.slug for letter in letters]).values_list('slug', flat=True)
+        )
+        claimed: Set[str] = set()
+        next_suffix: Dict[str, int] = {}
+        for letter in letters:
+            base_slug = letter.slug
+            if base_slug in taken or base_slug in claimed:
+                if base_slug not in next_suffix:
+                    free = letter.next_free_slug(base_slug, allow_base=False)
+                    next_suffix[base_slug] = int(free.rsplit('-', 1)[1])
+                while f"{base_slug}-{next_suffix[base_slug]}" in claimed:
+                    next_suffix[base_slug] += 1
+                letter.slug = f"{base_slug}-{next_suffix[base_slug]}"
+                next_suffix[base_slug] += 1
+            claimed.add(letter.slug)
+
+
+class RecordError(ValueError):
+    """A record fails the validation the API applies to letters."""
+
+
+def _describe(errors: Any) -> str:
+    """Flatten a Django or DRF error dict into one line."""
+    if isinstance(errors, dict):
+        return '; '.join(f"{key}: {_describe(value)}" for key, value in errors.items())
+    if isinstance(errors, list):
+        return ', '.join(_describe(value) for value in errors)
+    return str(errors)
+
+
+def _datetime(value: Any) -> Optional[datetime]:
+    return parse_datetime(value) if value else None
+
+
+def _timestamps(record: Dict[str, Any], names: List[str]) -> Dict[str, Any]:
+    values = {name: _datetime(record.get(name)) for name in names}
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def import_letters(
+    lines: Iterable[Union[bytes, str]],
+    default_user: User,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> ImportResult:
+    """Import NDJSON letter records, e.g. from ``export_letters``."""
+    return LetterImporter(default_user, chunk_size).run(lines)
@@ -1,19 +1,27 @@
 """URL configuration for letters app."""
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views, views
 from .views import (
     LetterViewSet,
     LetterTypeViewSet,
-    letter_public_view,
+    image_upload,
 )
 
+# The public view comes from async_views when serving under ASGI.
+public_views = async_views if settings.LETTERS_ASYNC_VIEWS else views
+
 router = DefaultRouter()
 router.register(r'admin/letters', LetterViewSet, basename='letter')
 router.register(r'admin/letter-types', LetterTypeViewSet, basename='lettertype')
 
 urlpatterns = [
     # Public endpoints
-    path('letters/<slug:slug>/', letter_public_view, name='letter-public'),
+    path('letters/<slug:slug>/', public_views.letter_public_view, name='letter-public'),
+
+    # Admin endpoints
+    path('admin/images/', image_upload, name='image-upload'),
 
     # Router URLs (admin endpoints)
     path('', include(router.urls)),
@@ -0,0 +1,171 @@
+"""Validation of ``Letter.custom_properties`` against ``LetterType.meta_schema``.
+
+Each meta schema (a JSON-schema subset: ``properties`` with ``type``, ``enum``,
+``items``, string length, numeric bounds and ``pattern``, plus ``required`` and
+``additionalProperties``) is compiled once into a pydantic model. Compiled
+models are cached per process by ``(letter_type id, updated_at)`` and dropped
+when the letter type is saved or deleted. ``compile_errors()`` compiles a
+schema up front so that one pydantic can't build (an empty enum, a bad or
+look-around ``pattern``, a non-integer length) is rejected when the letter
+type is saved rather than when its letters are.
+"""
+import threading
+from typing import Any, Dict, List, Literal, Optional, Tuple, Type, Union
+
+from django.core.exceptions import ValidationError
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    StrictBool,
+    StrictFloat,
+    StrictInt,
+    StrictStr,
+    create_model,
+)
+from pydantic import ValidationError as PydanticValidationError
+from pydantic_core import SchemaError
+
+from .models import LetterType
+
+
+JSON_TYPES: Dict[str, Any] = {
+    'string': StrictStr,
+    'integer': StrictInt,
+    'number': Union[StrictInt, StrictFloat],
+    'boolean': StrictBool,
+    'array': List[Any],
+    'object': Dict[str, Any],
+    'null': None,
+}
+
+CONSTRAINTS = {
+    'minLength': 'min_length',
+    'maxLength': 'max_length',
+    'minItems': 'min_length',
+    'maxItems': 'max_length',
+    'minimum': 'ge',
+    'maximum': 'le',
+    'exclusiveMinimum': 'gt',
+    'exclusiveMaximum': 'lt',
+    'pattern': 'pattern',
+}
+
+# What building a model from a malformed meta schema raises.
+COMPILE_ERRORS = (SchemaError, AssertionError, TypeError, ValueError)
+
+_cache: Dict[Tuple[Any, Any], Optional[Type[BaseModel]]] = {}
+_cache_lock = threading.Lock()
+
+
+def _annotation(spec: Dict[str, Any]) -> Any:
+    """Map one JSON-schema property spec to a type annotation."""
+    if 'enum' in spec:
+        return Literal[tuple(spec['enum'])]
+    json_type = spec.get('type')
+    if isinstance(json_type, list):
+        return Union[tuple(_annotation({**spec, 'type': item}) for item in json_type)]
+    if json_type is not None and not isinstance(json_type, str):
+        raise TypeError(f'unsupported type {json_type!r}')
+    if json_type == 'array' and isinstance(spec.get('items'), dict):
+        return List[_annotation(spec['items'])]  # type: ignore[misc]
+    return JSON_TYPES.get(json_type or '', Any)
+
+
+def compile_meta_schema(meta_schema: Dict[str, Any], name: str = 'CustomProperties') -> Optional[Type[BaseModel]]:
+    """Compile a meta schema into a pydantic model, or ``None`` if it declares nothing.
+
+    Raises one of ``COMPILE_ERRORS`` if the schema is malformed.
+    """
+    if not isinstance(meta_schema, dict):
+        raise TypeError('meta schema must be an object')
+    properties: Dict[str, Any] = meta_schema.get('properties') or {}
+    if not isinstance(properties, dict):
+        raise TypeError('properties must be an object')
+    if not properties and meta_schema.get('additionalProperties', True) is not False:
+        return None
+
+    required = set(meta_schema.get('required', []))
+    fields: Dict[str, Any] = {}
+    for index, (key, spec) in enumerate(properties.items()):
+        spec = spec if isinstance(spec, dict) else {}
+        annotation = _annotation(spec)
+        constraints = {CONSTRAINTS[k]: v for k, v in spec.items() if k in CONSTRAINTS}
+        if key in required:
+            field = Field(..., alias=key, **constraints)
+        else:
+            annotation = Optional[annotation]
+            field = Field(None, alias=key, **constraints)
+        # Property names need not be identifiers, so fields are aliased.
+        fields[f'property_{index}'] = (annotation, field)
+
+    extra: Literal['allow', 'forbid'] = 'forbid' if meta_schema.get('additionalProperties', True) is False else 'allow'
+    return create_model(name, __config__=ConfigDict(extra=extra), **fields)
+
+
+def compile_errors(meta_schema: Any) -> List[str]:
+    """Describe why a meta schema can't be compiled; empty if it can."""
+    if not isinstance(meta_schema, dict):
+        return ['Meta schema must be an object.']
+    properties = meta_schema.get('properties') or {}
+    if not isinstance(properties, dict):
+        return ['properties: must be an object mapping names to property schemas.']
+    errors = []
+    required = meta_schema.get('required', [])
+    if not isinstance(required, list) or not all(isinstance(key, str) for key in required):
+        errors.append('required: must be a list of property names.')
+    for key, spec in properties.items():
+        try:
+            compile_meta_schema({'properties': {key: spec}})
+        except COMPILE_ERRORS:
+            errors.append(f'{key}: unsupported type, enum, pattern or constraint.')
+    if not errors:
+        try:
+            compile_meta_schema(meta_schema)
+        except COMPILE_ERRORS:
+            errors.append('Meta schema cannot be compiled.')
+    return errors
+
+
+def get_validator(letter_type: LetterType) -> Optional[Type[BaseModel]]:
+    """Return the compiled validator for a letter type, compiling it on first use.
+
+    Raises ``ValidationError`` if the type's meta schema can't be compiled.
+    """
+    key = (letter_type.pk, letter_type.updated_at)
+    try:
+        return _cache[key]
+    except KeyError:
+        pass
+    try:
+        validator = compile_meta_schema(letter_type.meta_schema or {}, f'{letter_type.slug or "letter"}-properties')
+    except COMPILE_ERRORS as exc:
+        raise ValidationError({'custom_properties': [
+            f"The meta schema of letter type '{letter_type.name}' is invalid; fix the letter type first."
+        ]}) from exc
+    with _cache_lock:
+        _cache[key] = validator
+    return validator
+
+
+def forget(letter_type_id: Any) -> None:
+    """Drop every cached validator compiled for a letter type."""
+    with _cache_lock:
+        for key in [key for key in _cache if key[0] == letter_type_id]:
+            del _cache[key]
+
+
+def validate_custom_properties(letter_type: LetterType, custom_properties: Any) -> None:
+    """Raise ``ValidationError`` if ``custom_properties`` doesn't match the type's meta schema."""
+    if not isinstance(custom_properties, dict):
+        raise ValidationError({'custom_properties': ['Custom properties must be an object.']})
+    validator = get_validator(letter_type)
+    if validator is None:
+        return
+    try:
+        validator.model_validate(custom_properties)
+    except PydanticValidationError as exc:
+        raise ValidationError({'custom_properties': [
+            f"{'.'.join(str(part) for part in error['loc']) or 'value'}: {error['msg']}"
+            for error in exc.errors()
+        ]})
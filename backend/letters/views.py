@@ -1,15 +1,28 @@
 from rest_framework import viewsets, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, parser_classes, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.request import Request
-from django.db import connection
-from .models import Letter, LetterType, ContentBlock
+from rest_framework.renderers import JSONRenderer
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from . import cache as public_cache
+from . import analytics, conditional, health, images, metrics, properties, search, serialization, snapshots
+from .blocks import sync_content_blocks
+from .models import ContentBlock, Letter, LetterType, User
+from .pagination import KeysetPagination
+from .transfer import export_letters, import_letters
 from .serializers import (
+    LetterListSerializer,
     LetterSerializer,
-    LetterPublicSerializer,
     LetterTypeSerializer,
+    requested_fields,
 )
-from typing import Any
+from typing import Any, Optional, cast
 
 
 class IsAdminUser(permissions.BasePermission):
@@ -26,11 +39,114 @@ class LetterTypeViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdminUser]
 
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+@parser_classes([MultiPartParser])
+def image_upload(request: Request) -> Response:
+    """Store an uploaded image with its responsive variants.
+
+    Returns the ``content`` for an image block. Uploading identical bytes again
+    returns the stored image (200 instead of 201) without re-encoding.
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'file': ['No file was submitted.']}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        content, created = images.store_image(upload)
+    except images.ImageUploadError as exc:
+        return Response({'file': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+    except images.ImageProcessingUnavailable as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response(content, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
 class LetterViewSet(viewsets.ModelViewSet):
     """ViewSet for letters (admin only)."""
     queryset = Letter.objects.select_related('letter_type', 'created_by').prefetch_related('content_blocks').all()
     serializer_class = LetterSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self) -> Any:
+        """Use a summary queryset for the list, without blocks or wide columns.
+
+        The list also takes ``?prop.<key>=<value>`` filters on indexed custom
+        properties (see ``letters.properties``).
+        """
+        if self.action != 'list':
+            return super().get_queryset()
+        block_count = (
+            ContentBlock.objects.filter(letter=OuterRef('pk'))
+            .order_by().values('letter').annotate(count=Count('pk')).values('count')
+        )
+        letters = Letter.objects.all()
+        try:
+            letters = properties.filter_letters(letters, properties.filters_from_params(self.request.query_params))
+        except properties.PropertyFilterError as exc:
+            raise ValidationError({'custom_properties': [str(exc)]})
+        return (
+            letters.select_related('letter_type', 'created_by')
+            .only(
+                'id', 'title', 'recipient_name', 'slug', 'is_published', 'published_at',
+                'created_at', 'updated_at',
+                'letter_type__id', 'letter_type__name', 'letter_type__slug',
+                'created_by__id', 'created_by__username',
+            )
+            .annotate(block_count=Coalesce(Subquery(block_count), 0))
+        )
+
+    def get_serializer_class(self) -> Any:
+        if self.action == 'list':
+            return LetterListSerializer
+        return super().get_serializer_class()
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request: Request) -> StreamingHttpResponse:
+        """Stream every letter with its type and blocks as NDJSON."""
+        response = StreamingHttpResponse(export_letters(), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="letters.ndjson"'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='search', url_name='search')
+    def search_letters(self, request: Request) -> Response:
+        """Full-text search over letters and block text: ``?q=`` and ``?limit=`` (max 100)."""
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'query': query, 'results': search.search(query, limit)})
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_letters(self, request: Request) -> Response:
+        """Import an NDJSON body produced by the export endpoint, line by line."""
+        lines = iter(request.stream.readline, b'') if request.stream is not None else iter([])
+        # IsAdminUser only lets authenticated staff users through.
+        result = import_letters(lines, default_user=cast(User, request.user))
+        return Response(
+            {'created': result.created, 'skipped': result.skipped, 'errors': result.errors},
+            status=status.HTTP_200_OK,
+        )
+
+    # Returns pre-rendered JSON, so not DRF's Response.
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> HttpResponse:  # type: ignore[override]
+        """Retrieve a letter, rendered by the configured serialization engine.
+
+        Answers 304 from the letter's validators (one query) before loading it.
+        """
+        fields = requested_fields(request)
+        validators = conditional.letter_validators(
+            self.kwargs[self.lookup_url_kwarg or self.lookup_field],
+            with_opens=True,
+            with_author=True,
+            # open_stats.last_24_hours moves with the clock.
+            extra=[','.join(fields or []), analytics.current_hour().isoformat()],
+        )
+        response = conditional.not_modified(request, validators)
+        if response is None:
+            body = serialization.render_letter(self.get_object(), fields=fields)
+            response = HttpResponse(body, content_type='application/json')
+        return conditional.set_validators(response, validators, conditional.ADMIN_CACHE_CONTROL)
 
     def perform_create(self, serializer: Any) -> None:
         """Set created_by to current user."""
@@ -43,47 +159,97 @@ class LetterViewSet(viewsets.ModelViewSet):
             context={'content_blocks': request.data.get('content_blocks', [])}
         )
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+        with transaction.atomic(), snapshots.deferred(), search.deferred():
+            self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
     def update(self, request: Request, *args: Any, **kwargs: Any) -> Response:
-        """Update a letter and optionally replace content blocks."""
+        """Update a letter and optionally sync its content blocks."""
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=kwargs.get('partial', False))
         serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-
-        # Handle content blocks update
-        if 'content_blocks' in request.data:
-            # Delete existing content blocks
-            instance.content_blocks.all().delete()
-            # Create new content blocks
-            for block_data in request.data['content_blocks']:
-                ContentBlock.objects.create(letter=instance, **block_data)
-
-        # Refresh to get updated content blocks
-        instance.refresh_from_db()
+
+        # Save the letter and its blocks together so the public snapshot is
+        # regenerated once, in the same transaction as the edit.
+        with transaction.atomic(), snapshots.deferred(), search.deferred():
+            self.perform_update(serializer)
+            if 'content_blocks' in request.data:
+                sync_content_blocks(instance, request.data['content_blocks'])
+
+        # sync_content_blocks() refilled the instance's prefetched blocks.
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
 
+def public_letter_row(slug: str) -> Any:
+    """Query for a published letter's id, snapshot and validator columns."""
+    return conditional.annotate_validators(Letter.objects.filter(slug=slug, is_published=True)).values_list(
+        'pk', 'public_snapshot', 'updated_at', 'letter_type__updated_at', 'blocks_updated_at', 'block_count',
+    )
+
+
+def render_public_letter(slug: str) -> public_cache.CachedResponse:
+    """Render the public JSON body for a letter slug from its stored snapshot."""
+    row = public_letter_row(slug).first()
+    if row is None:
+        return public_response(None)
+    letter_id, snapshot, *columns = row
+    if snapshot is None:
+        # Published before snapshots existed; build it once on first read.
+        snapshot = snapshots.refresh_snapshot(letter_id)
+    return public_response(snapshot, conditional.validators_from_row(letter_id, *columns))
+
+
+def public_response(
+    snapshot: Optional[str], validators: Optional[conditional.Validators] = None,
+) -> public_cache.CachedResponse:
+    """Build the cacheable public response for a snapshot, or a 404 when there is none."""
+    if snapshot is None:
+        return public_cache.CachedResponse(
+            status=status.HTTP_404_NOT_FOUND,
+            body=JSONRenderer().render({'error': 'Letter not found or not published'}),
+        )
+    return public_cache.CachedResponse(
+        status=status.HTTP_200_OK,
+        body=snapshot.encode('utf-8'),
+        etag=validators.etag if validators else '',
+        last_modified=validators.last_modified if validators else None,
+    )
+
+
+def public_http_response(request: HttpRequest, rendered: public_cache.CachedResponse) -> HttpResponse:
+    """Answer with a rendered public response, or 304 if the client's copy is current."""
+    validators = None
+    if rendered.etag and rendered.last_modified is not None:
+        validators = conditional.Validators(etag=rendered.etag, last_modified=rendered.last_modified)
+    response = conditional.not_modified(request, validators) or HttpResponse(
+        rendered.body, status=rendered.status, content_type='application/json',
+    )
+    return conditional.set_validators(response, validators, conditional.PUBLIC_CACHE_CONTROL)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
-def letter_public_view(request: Request, slug: str) -> Response:
-    """Public view for a letter by slug."""
-    try:
-        letter = Letter.objects.select_related('letter_type').prefetch_related('content_blocks').get(
-            slug=slug,
-            is_published=True
-        )
-        serializer = LetterPublicSerializer(letter)
-        return Response(serializer.data)
-    except Letter.DoesNotExist:
-        return Response(
-            {'error': 'Letter not found or not published'},
-            status=status.HTTP_404_NOT_FOUND
-        )
+def letter_public_view(request: Request, slug: str) -> HttpResponse:
+    """Public view for a letter by slug, served from the public response cache."""
+    rendered = public_cache.get_or_render(slug, lambda: render_public_letter(slug))
+    analytics.record_view(slug, rendered.status)
+    return public_http_response(request, rendered)
+
+
+@require_GET
+def letter_open_view(request: HttpRequest, slug: str) -> HttpResponse:
+    """Count an open of a letter served by nginx from its static files.
+
+    nginx mirrors each public letter request here with the shared
+    ``LETTERS_OPEN_TOKEN`` (see ``letters.analytics``); other requests are
+    refused, and the path is not proxied from outside.
+    """
+    if not analytics.is_mirrored(request):
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    analytics.record(slug)
+    return HttpResponse(status=status.HTTP_204_NO_CONTENT)
 
 
 @api_view(['GET'])
@@ -112,3 +278,29 @@ def health_check(request: Request) -> Response:
         status=status.HTTP_200_OK
     )
 
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def health_live(request: Request) -> Response:
+    """Liveness probe: the process is up and serving requests (no I/O)."""
+    return Response(health.liveness())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def health_ready(request: Request) -> Response:
+    """Readiness probe: database round trip, migration state and cache backend."""
+    report = health.readiness()
+    ready = report['status'] == 'ready'
+    return Response(report, status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@require_GET
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Prometheus metrics of every worker, in the text exposition format.
+
+    A plain Django view: DRF content negotiation would refuse scrapers'
+    ``Accept`` headers.
+    """
+    body, content_type = metrics.exposition()
+    return HttpResponse(body, content_type=content_type)
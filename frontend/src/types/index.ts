@@ -35,10 +35,18 @@ export interface TextBlockContent {
 export interface ImageBlockContent {
   url: string;
   caption?: string;
+  original_url?: string;
+  width?: number;
+  height?: number;
+  hash?: string;
+  srcset?: { webp: string; jpeg: string };
 }
 
 export interface RichTextBlockContent {
-  html: string;
+  html?: string;  // submitted source, admin API only
+  rendered?: string;  // sanitized HTML, safe to render as is
+  text?: string;
+  sanitizer_version?: number;
 }
 
 export interface Letter {
@@ -56,6 +64,13 @@ export interface Letter {
   created_at: string;
   updated_at: string;
   public_url?: string;
+  open_stats?: LetterOpenStats;
+}
+
+export interface LetterOpenStats {
+  total: number;
+  last_24_hours: number;
+  last_opened_at: string | null;
 }
 
 export interface LetterPublic {